@@ -98,7 +98,8 @@ def create_app():
         resources={r"/api/*": {
             "origins": allowed_origins,
             "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"],
+            "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"],
+            "expose_headers": ["Idempotent-Replayed"],
         }},
         supports_credentials=True,
     )
@@ -118,6 +119,12 @@ def create_app():
             driver_model,
             dispatch_model,
             dispatch_edit_model,
+            dispatch_change_model,
+            dispatch_view_model,
+            idempotency_key_model,
+            catalog_version_model,
+            stock_threshold_rule_model,
+            stock_alert_model,
             supplier_model,
             receipt_model,
             operator_model,
@@ -130,6 +137,40 @@ def create_app():
         if env != "production":
             db.create_all()
 
+        # Registro de cambios de despachos (sync incremental de choferes)
+        from .utils.dispatch_sync import register_change_tracking
+        register_change_tracking()
+
+        # Read model de despachos (dispatch_view): se rearma antes de cada commit
+        from .utils.dispatch_view import register_dispatch_view_tracking
+        register_dispatch_view_tracking()
+
+        # Versión de catálogos para ETag / 304 en los listados
+        from .utils.catalog_cache import register_catalog_versioning, seed_catalog_versions
+        register_catalog_versioning()
+        if env != "production":
+            seed_catalog_versions()
+
+        # Umbral de stock bajo precalculado (reorder_point) al escribir productos o reglas
+        from .utils.stock_rules import register_reorder_point_tracking
+        register_reorder_point_tracking()
+
+        # Cruces de umbral de stock -> stock_alert_state + aviso con debounce
+        from .utils.stock_alerts import register_stock_alert_tracking
+        register_stock_alert_tracking()
+
+        # PDFs de impresión en cache: se descartan al editar/borrar el documento
+        from .utils.render_cache import register_render_cache_invalidation
+        register_render_cache_invalidation()
+
+        # Idempotency-Key: la clave se marca confirmada en la transacción de la vista
+        from .utils.idempotency import register_idempotency_tracking
+        register_idempotency_tracking()
+
+        # Pre-render opcional del formato de impresión por defecto (PRINT_PRERENDER_FORMAT)
+        from .utils.print_prerender import register_print_prerender
+        register_print_prerender(app)
+
     # Blueprints
     from .routes.auth_routes import auth_bp
     from .routes.product_routes import product_bp
@@ -150,6 +191,8 @@ def create_app():
     from .routes.credit_note_routes import credit_note_bp
     from .routes.stock_movement_routes import stock_movement_bp
     from .routes.survey_routes import survey_api_bp, survey_public_bp
+    from .routes.sync_routes import sync_bp
+    from .routes.stock_rule_routes import stock_rule_bp
 
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(product_bp, url_prefix="/api")
@@ -169,11 +212,21 @@ def create_app():
     app.register_blueprint(user_performance_bp, url_prefix="/api")
     app.register_blueprint(credit_note_bp, url_prefix="/api")
     app.register_blueprint(stock_movement_bp, url_prefix="/api")
+    app.register_blueprint(sync_bp, url_prefix="/api")
+    app.register_blueprint(stock_rule_bp, url_prefix="/api")
     app.register_blueprint(survey_api_bp)        # → /api/survey/submit
     app.register_blueprint(survey_public_bp)     # → /encuesta/abcd1234
 
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=10)
 
+    # Logo y fuentes de impresión: se cargan una vez por proceso, al arrancar
+    from .utils.print_assets import warm_print_assets
+    warm_print_assets()
+
+    # Comandos CLI (flask bench ...)
+    from .cli import register_cli
+    register_cli(app)
+
     # Guard de billing
     @app.before_request
     def enforce_billing_guard():
@@ -348,6 +401,39 @@ def create_app():
                 timezone=ZoneInfo('UTC')
             )
 
+            # PDFs de impresión en disco más viejos que PRINT_CACHE_MAX_AGE_DAYS
+            def prune_print_cache():
+                from app.utils.render_cache import get_render_cache, PRINT_CACHE_MAX_AGE_DAYS
+                borrados = get_render_cache(app).prune(
+                    int(os.getenv("PRINT_CACHE_MAX_AGE_DAYS", PRINT_CACHE_MAX_AGE_DAYS))
+                )
+                app.logger.info(f"Limpieza cache de impresión: {borrados} PDFs")
+
+            scheduler.add_job(
+                prune_print_cache,
+                'cron',
+                hour=3, minute=15,
+                id='prune_print_cache',
+                replace_existing=True,
+                timezone=ZoneInfo('UTC')
+            )
+
+            # Idempotency-Key vencidas (IDEMPOTENCY_TTL_HOURS)
+            def prune_idempotency_keys():
+                from app.utils.idempotency import prune_idempotency_keys as prune
+                with app.app_context():
+                    borradas = prune()
+                app.logger.info(f"Limpieza Idempotency-Key: {borradas} vencidas")
+
+            scheduler.add_job(
+                prune_idempotency_keys,
+                'cron',
+                hour=3, minute=30,
+                id='prune_idempotency_keys',
+                replace_existing=True,
+                timezone=ZoneInfo('UTC')
+            )
+
             #PRUEBAS LOCALES
             # scheduler.add_job(
             #     delete_old_images,
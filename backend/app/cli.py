@@ -0,0 +1,157 @@
+import click
+from flask.cli import AppGroup
+from app import db
+
+bench_cli = AppGroup("bench", help="Datos sintéticos y benchmark de endpoints calientes.")
+
+
+@bench_cli.command("seed")
+@click.option("--clients", default=200, show_default=True)
+@click.option("--drivers", default=20, show_default=True)
+@click.option("--products", default=1000, show_default=True)
+@click.option("--operators", default=15, show_default=True)
+@click.option("--suppliers", default=30, show_default=True)
+@click.option("--months", default=6, show_default=True, help="Meses de movimientos hacia atrás desde hoy.")
+@click.option("--dispatches-per-day", default=40, show_default=True)
+@click.option("--seed", default=42, show_default=True, help="Semilla: misma semilla, mismos datos.")
+@click.option("--reset", is_flag=True, help="Borra y recrea TODAS las tablas antes de sembrar.")
+@click.option("--yes", is_flag=True, help="No pedir confirmación con --reset.")
+def bench_seed(clients, drivers, products, operators, suppliers, months, dispatches_per_day, seed, reset, yes):
+    """Genera un dataset sintético en la BD configurada (DATABASE_URL)."""
+    from app.utils.bench_seed import seed_dataset
+
+    if reset:
+        if not yes:
+            click.confirm(f"Se borrarán todas las tablas de {db.engine.url.render_as_string()}. ¿Continuar?", abort=True)
+        db.drop_all()
+    db.create_all()
+
+    seed_dataset(
+        clients=clients, drivers=drivers, products=products, operators=operators,
+        suppliers=suppliers, months=months, dispatches_per_day=dispatches_per_day,
+        seed=seed, log=click.echo,
+    )
+
+
+@bench_cli.command("run")
+@click.option("--iterations", default=20, show_default=True)
+@click.option("--warmup", default=2, show_default=True)
+@click.option("--only", multiple=True, help="Filtra escenarios por nombre (repetible).")
+@click.option("--baseline", "baseline_path", type=click.Path(dir_okay=False), default=None,
+              help="Archivo JSON de línea base (por defecto backend/bench/baseline.json).")
+@click.option("--update-baseline", is_flag=True, help="Guarda los resultados como nueva línea base.")
+@click.option("--tolerance", default=0.25, show_default=True, help="Margen permitido sobre el p95 base.")
+@click.option("--i-know", "i_know", is_flag=True,
+              help="Permite una BD no sembrada por `flask bench seed` (solo escenarios de lectura).")
+def bench_run(iterations, warmup, only, baseline_path, update_baseline, tolerance, i_know):
+    """Mide p50/p95 y queries por request de los endpoints calientes."""
+    from flask import current_app
+    from app.utils.bench_seed import get_bench_user
+    from app.utils.bench_runner import (
+        DEFAULT_BASELINE_PATH, run_benchmark, load_baseline, save_baseline, compare_with_baseline,
+    )
+
+    bench_db = get_bench_user() is not None
+    if not bench_db and not i_know:
+        click.echo(f"{db.engine.url.render_as_string()} no es una BD de benchmark (no la sembró `flask bench seed`). "
+                   "Use --i-know para medir solo los escenarios de lectura.")
+        raise SystemExit(1)
+
+    app = current_app._get_current_object()
+    path = baseline_path or DEFAULT_BASELINE_PATH
+    results = run_benchmark(app, iterations=iterations, warmup=warmup, only=only, log=click.echo,
+                            read_only=not bench_db)
+
+    if update_baseline:
+        save_baseline(path, results, iterations, db.engine.dialect.name)
+        click.echo(f"Línea base guardada en {path}")
+        return
+
+    baseline = load_baseline(path)
+    if baseline is None:
+        click.echo(f"Sin línea base en {path} (use --update-baseline para crearla).")
+        return
+
+    regresiones = compare_with_baseline(results, baseline, tolerance=tolerance)
+    if regresiones:
+        click.echo("Regresiones respecto a la línea base:")
+        for r in regresiones:
+            click.echo(f"  - {r}")
+        raise SystemExit(1)
+    click.echo("Sin regresiones respecto a la línea base.")
+
+
+@bench_cli.command("explain")
+@click.option("--only", multiple=True, help="Filtra consultas por nombre (repetible).")
+def bench_explain(only):
+    """EXPLAIN de las consultas calientes; falla si alguna recorre una tabla entera."""
+    from app.utils.query_plans import check_query_plans
+
+    fallas = check_query_plans(only=only, log=click.echo)
+    if fallas:
+        click.echo("Consultas sin índice:")
+        for f in fallas:
+            click.echo(f"  - {f}")
+        raise SystemExit(1)
+    click.echo("Todas las consultas calientes usan índices.")
+
+
+@bench_cli.command("print")
+@click.option("--iterations", default=50, show_default=True)
+@click.option("--warmup", default=3, show_default=True)
+@click.option("--backend", "backends", multiple=True, type=click.Choice(["vector", "raster"]),
+              help="Backend de código de barras (repetible; por defecto ambos).")
+@click.option("--only", multiple=True, help="Filtra documentos por nombre (repetible).")
+def bench_print(iterations, warmup, backends, only):
+    """Micro-benchmark de render de PDFs: tiempo y bytes por documento."""
+    from app.utils.bench_print import run_print_benchmark
+
+    run_print_benchmark(
+        iterations=iterations, warmup=warmup, backends=backends or ("vector", "raster"),
+        only=only, log=click.echo,
+    )
+
+
+catalog_cli = AppGroup("catalog", help="Mantenimiento de catálogos.")
+
+
+@catalog_cli.command("rebuild-usage")
+def catalog_rebuild_usage():
+    """Recalcula Product.usage desde el histórico de despachos."""
+    from app.utils.product_usage import rebuild_product_usage
+
+    n = rebuild_product_usage()
+    click.echo(f"usage recalculado para {n} productos")
+
+
+@catalog_cli.command("refresh-reorder-points")
+@click.option("--seed-defaults", is_flag=True, help="Carga las reglas por defecto si la tabla está vacía.")
+def catalog_refresh_reorder_points(seed_defaults):
+    """Recalcula Product.reorder_point desde stock_threshold_rule."""
+    from app.utils.stock_rules import seed_default_rules, refresh_reorder_points
+    from app.utils.catalog_cache import bump_catalog_versions
+
+    if seed_defaults:
+        click.echo(f"{seed_default_rules()} reglas por defecto cargadas")
+    n = refresh_reorder_points()
+    bump_catalog_versions(["products"])
+    db.session.commit()
+    click.echo(f"reorder_point recalculado para {n} productos")
+
+
+dispatch_cli = AppGroup("dispatch", help="Mantenimiento de despachos.")
+
+
+@dispatch_cli.command("rebuild-views")
+def dispatch_rebuild_views():
+    """Arma dispatch_view para todos los despachos (tras migrar o restaurar)."""
+    from app.utils.dispatch_view import rebuild_all_dispatch_views
+
+    n = rebuild_all_dispatch_views(log=click.echo)
+    click.echo(f"dispatch_view armado para {n} despachos")
+
+
+def register_cli(app):
+    app.cli.add_command(bench_cli)
+    app.cli.add_command(catalog_cli)
+    app.cli.add_command(dispatch_cli)
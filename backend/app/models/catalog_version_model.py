@@ -0,0 +1,18 @@
+from app import db
+
+class CatalogVersion(db.Model):
+    """
+    Contador de versión por catálogo (products, clients, drivers, operators,
+    suppliers). Se incrementa en cada escritura y alimenta el ETag de los
+    GET de listado.
+    """
+    __tablename__ = 'catalog_version'
+
+    entity = db.Column(db.String(30), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'entity': self.entity,
+            'version': self.version,
+        }
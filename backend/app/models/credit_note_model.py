@@ -8,11 +8,11 @@ class CreditNote(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey('client.id', ondelete="SET NULL"), nullable=True)
     client_name = db.Column(db.String(100), nullable=False)
-    order_number = db.Column(db.String(50), nullable=False)
-    invoice_number = db.Column(db.String(50), nullable=False)
-    credit_note_number = db.Column(db.String(50), nullable=False)
+    order_number = db.Column(db.String(50), nullable=False, index=True)
+    invoice_number = db.Column(db.String(50), nullable=False, index=True)
+    credit_note_number = db.Column(db.String(50), nullable=False, index=True)
     reason = db.Column(db.String(255), nullable=False)
-    fecha = db.Column(db.DateTime, default=utcnow)
+    fecha = db.Column(db.DateTime, default=utcnow, index=True)
     created_by = db.Column(db.String(50), nullable=False)
 
     productos = db.relationship('CreditNoteProduct', backref='credit_note', lazy=True)
@@ -35,8 +35,9 @@ class CreditNoteProduct(db.Model):
     __tablename__ = 'credit_note_product'
 
     id = db.Column(db.Integer, primary_key=True)
-    credit_note_id = db.Column(db.Integer, db.ForeignKey('credit_note.id'), nullable=False)
+    credit_note_id = db.Column(db.Integer, db.ForeignKey('credit_note.id'), nullable=False, index=True)
     nombre = db.Column(db.String(100), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='SET NULL'), nullable=True, index=True)
     cantidad = db.Column(db.Float, nullable=False)
     unidad = db.Column(db.String(20), nullable=False)
 
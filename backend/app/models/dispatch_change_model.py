@@ -0,0 +1,28 @@
+from app import db
+from app.utils.timezone import utcnow, to_local
+
+class DispatchChange(db.Model):
+    """
+    Registro de cambios de despachos para la sincronización incremental.
+    El id autoincremental es la "versión" de sync: cada alta, edición,
+    marca de entrega o borrado agrega una fila. Sin FK a dispatch para
+    que las filas de borrado (tombstones) sobrevivan al despacho.
+    """
+    __tablename__ = 'dispatch_change'
+
+    id = db.Column(db.Integer, primary_key=True)
+    dispatch_id = db.Column(db.Integer, nullable=False)
+    # Chofer al que afecta el cambio (el anterior en un borrado o reasignación)
+    chofer_id = db.Column(db.Integer, nullable=True, index=True)
+    # 'upsert' | 'delete'
+    op = db.Column(db.String(10), nullable=False, default='upsert')
+    changed_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    def to_dict(self):
+        return {
+            'version': self.id,
+            'dispatch_id': self.dispatch_id,
+            'chofer_id': self.chofer_id,
+            'op': self.op,
+            'changed_at': to_local(self.changed_at).isoformat(timespec="seconds"),
+        }
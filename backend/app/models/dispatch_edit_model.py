@@ -6,7 +6,7 @@ class DispatchEditLog(db.Model):
     __tablename__ = 'dispatch_edit_log'
 
     id = db.Column(db.Integer, primary_key=True)
-    dispatch_id = db.Column(db.Integer, db.ForeignKey('dispatch.id', ondelete='CASCADE'), nullable=False)
+    dispatch_id = db.Column(db.Integer, db.ForeignKey('dispatch.id', ondelete='CASCADE'), nullable=False, index=True)
     # Usuario que CREÓ el despacho originalmente — a él se le atribuye la
     # corrección para efectos de rendimiento, sin importar quién edita.
     created_by = db.Column(db.String(50), nullable=False)
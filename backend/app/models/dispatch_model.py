@@ -4,18 +4,30 @@ from app.utils.timezone import utcnow, to_local
 
 class Dispatch(db.Model):
     __tablename__ = 'dispatch'
+    __table_args__ = (
+        # Reporte de pendientes y ?pending=1: solo las filas no entregadas
+        db.Index(
+            'ix_dispatch_pending_fecha', 'fecha',
+            postgresql_where=db.text('delivered_client = false'),
+            sqlite_where=db.text('delivered_client = 0'),
+        ),
+        # Rendimiento de choferes / sincronización por chofer y rango de fechas
+        db.Index('ix_dispatch_chofer_fecha', 'chofer_id', 'fecha'),
+        # Rendimiento y estadísticas diarias por usuario creador
+        db.Index('ix_dispatch_created_by_fecha', 'created_by', 'fecha'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    orden = db.Column(db.String(50), nullable=False)
+    orden = db.Column(db.String(50), nullable=False, index=True)
     chofer_id = db.Column(db.Integer, db.ForeignKey('driver.id', ondelete="SET NULL"), nullable=True)
     chofer_name = db.Column(db.String(100), nullable=False)
     cliente_id = db.Column(db.Integer, db.ForeignKey('client.id', ondelete="SET NULL"), nullable=True)
     client_name = db.Column(db.String(100), nullable=False) 
-    fecha = db.Column(db.DateTime, nullable=False, default=utcnow)
+    fecha = db.Column(db.DateTime, nullable=False, default=utcnow, index=True)
     
     created_by = db.Column(db.String(50), nullable=False)
     paquete_numero = db.Column(db.String(50), nullable=True)
-    factura_numero = db.Column(db.String(50), nullable=True)
+    factura_numero = db.Column(db.String(50), nullable=True, index=True)
 
     status = db.Column(db.String(30), default='pendiente')
 
@@ -61,8 +73,9 @@ class DispatchProduct(db.Model):
     __tablename__ = 'dispatch_product'
 
     id = db.Column(db.Integer, primary_key=True)
-    dispatch_id = db.Column(db.Integer, db.ForeignKey('dispatch.id'), nullable=False)
+    dispatch_id = db.Column(db.Integer, db.ForeignKey('dispatch.id'), nullable=False, index=True)
     nombre = db.Column(db.String(100), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='SET NULL'), nullable=True, index=True)
     cantidad = db.Column(db.Float, nullable=False)
     unidad = db.Column(db.String(20), nullable=False)
 
@@ -78,7 +91,7 @@ class DispatchImage(db.Model):
     __tablename__ = 'dispatch_image'
 
     id = db.Column(db.Integer, primary_key=True)
-    dispatch_id = db.Column(db.Integer, db.ForeignKey('dispatch.id'), nullable=False)
+    dispatch_id = db.Column(db.Integer, db.ForeignKey('dispatch.id'), nullable=False, index=True)
     image_url = db.Column(db.String(255), nullable=False)
     uploaded_at = db.Column(db.DateTime, default=utcnow)
 
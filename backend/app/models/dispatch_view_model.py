@@ -0,0 +1,19 @@
+from app import db
+from app.utils.timezone import utcnow
+
+
+class DispatchView(db.Model):
+    """
+    Read model de un despacho: el JSON ya armado con sus productos,
+    imágenes y los nombres de cliente, chofer y creador, para responder
+    detalle, impresión y respuestas post-escritura con una sola fila.
+
+    Lo mantiene app/utils/dispatch_view.py en la misma transacción que
+    escribe el despacho. Si falta la fila (despachos anteriores, cliente o
+    chofer renombrado) se reconstruye al leer.
+    """
+    __tablename__ = 'dispatch_view'
+
+    dispatch_id = db.Column(db.Integer, db.ForeignKey('dispatch.id', ondelete='CASCADE'), primary_key=True)
+    snapshot = db.Column(db.JSON, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow)
@@ -0,0 +1,36 @@
+from app import db
+
+
+class IdempotencyKey(db.Model):
+    """
+    Respuesta guardada de un POST de creación por Idempotency-Key (por
+    usuario y endpoint). Mientras la solicitud original corre, status_code
+    es NULL; un reintento con la misma clave recibe la respuesta guardada
+    sin volver a ejecutarse. Se borra al vencer expires_at.
+
+    committed_at se marca en la misma transacción que los cambios de la
+    vista: una clave con commit nunca se vuelve a ejecutar. claim_token
+    identifica a la solicitud dueña de la clave; si otra la toma (la
+    original se dio por abandonada), la original ya no puede confirmar.
+    """
+    __tablename__ = 'idempotency_key'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'endpoint', 'key', name='uq_idempotency_key_user_endpoint_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(50), nullable=False)
+    endpoint = db.Column(db.String(200), nullable=False)
+    key = db.Column(db.String(100), nullable=False)
+    # sha256 del cuerpo (form + archivos o JSON): la misma clave con otro cuerpo es un error
+    request_hash = db.Column(db.String(64), nullable=False)
+
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    mimetype = db.Column(db.String(100), nullable=True)
+
+    claim_token = db.Column(db.String(32), nullable=True)
+    committed_at = db.Column(db.DateTime, nullable=True)
+
+    created_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
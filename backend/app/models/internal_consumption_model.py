@@ -9,7 +9,7 @@ class InternalConsumption(db.Model):
     nombre_retira = db.Column(db.String(100), nullable=False)
     area = db.Column(db.String(50), nullable=False)
     motivo = db.Column(db.String(255), nullable=False)
-    fecha = db.Column(db.DateTime, default=utcnow)
+    fecha = db.Column(db.DateTime, default=utcnow, index=True)
     created_by = db.Column(db.String(50), nullable=False)
 
     productos = db.relationship('InternalConsumptionProduct', backref='internal_consumption', lazy=True)
@@ -29,8 +29,9 @@ class InternalConsumptionProduct(db.Model):
     __tablename__ = 'internal_consumption_product'
 
     id = db.Column(db.Integer, primary_key=True)
-    internal_consumption_id = db.Column(db.Integer, db.ForeignKey('internal_consumption.id'), nullable=False)
+    internal_consumption_id = db.Column(db.Integer, db.ForeignKey('internal_consumption.id'), nullable=False, index=True)
     nombre = db.Column(db.String(100), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='SET NULL'), nullable=True, index=True)
     cantidad = db.Column(db.Float, nullable=False)
     unidad = db.Column(db.String(20), nullable=False)
 
@@ -2,18 +2,12 @@ from flask import current_app
 from flask_mail import Mail, Message
 from flask_jwt_extended import create_access_token
 from app.models.user_model import User
-from app.models.product_model import Product
-from app.models.dispatch_model import Dispatch
-from app.models.client_model import Client
-from app.models.driver_model import Driver
-from app.models.user_model import User as Creator
-from datetime import datetime, timedelta
-from sqlalchemy import and_
-from app.utils.timezone import CL_TZ
-from zoneinfo import ZoneInfo
+from datetime import timedelta
+from app.utils.stock_alerts import claim_pending_alerts, release_alerts, count_low_products
+from app.utils.pending_dispatches import get_pending_dispatches
 import logging
 import smtplib
-from app import mail 
+from app import mail, db
 from collections import defaultdict
 import os
 from flask import request
@@ -93,209 +87,169 @@ def generate_unsubscribe_link(user_id, app):
     app.logger.info(f"Usando producción: {api_url}")
     return f"{api_url}/api/auth/unsubscribe?token={token}"
 
-def is_low_stock(product):
-    stock = product.stock
-    if stock <= 0:
-        return True
-    
-    cat = product.category
-    name_lower = product.name.lower()
-    
-    # Categorías con umbrales simples
-    simple_thresholds = {
-        "Bolsas de Basura Negras": 400,
-        "Bolsas Transparente Recuperada": 400,
-        "Bolsas Camisetas": 10,
-        "Bolsas PEAD de Alta Densidad": 300,
-        "Bolsas Recuperada de Color": 200,
-        "Bolsas con Impresión": 500,
-        "Bolsas de Lavandería": 500,
-        "Bolsas de Cubierto": 30,
-        "Bolsas de Papel Kraft o Blancas": 5,
-        "Productos de limpieza, aseo, cocina y higiene": 20,
-        "Vasos plásticos": 2000,
-        "Vasos de Poli-papel": 5,
-        "Vasos Espumados": 3,
-        "Vasos PET": 3,
-        "Tapas": 3,
-        "Envases Bowl de Alimento": 4,
-        "Porta-colaciones o envases Plumavit": 4,
-        "Film": 8,
-        "Prepicados": 10,
-        "Brochetas": 60,
-        "Pocillos de Degustación": 4,
-        "Gorros y Cofias": 30,
-        "Productos de Protección y seguridad": 10,
-        "Envases contenedores de aluminio": 4,
-        "Blondas redondas, rectangulares y capsulas": 8,
-        "Servilletas": 5,
-        "Otros": 10,
-    }
-    
-    if cat in simple_thresholds:
-        return stock <= simple_thresholds[cat]
-    
-    # Bolsas Virgen Transparente
-    if cat == "Bolsas Virgen Transparente":
-        units_endings = ['und', 'un']
-        kilos_endings = ['kg', 'k']
-        if any(name_lower.endswith(end) for end in units_endings):
-            return stock <= 500
-        elif any(name_lower.endswith(end) for end in kilos_endings):
-            return stock <= 25
-        return False  # Si no termina en ninguno, no considerar bajo
-    
-    # Bolsas de Polipropileno
-    if cat == "Bolsas de Polipropileno":
-        units_endings = ['und', 'un']
-        kilos_endings = ['kg', 'k']
-        if any(name_lower.endswith(end) for end in units_endings):
-            return stock <= 1000
-        elif any(name_lower.endswith(end) for end in kilos_endings):
-            return stock <= 15
-        return False
-    
-    # Guantes
-    if cat == "Guantes":
-        guantes_10_keywords = ["nitrilo negro", "nitrilo azul", "vinilo", "latex", "jaspe rosado", "aloe vera"]
-        guantes_50_keywords = ["domésticos", "nitrilo verde industrial"]
-        guantes_1_keywords = ["guante anticorte"]
-        
-        if any(keyword in name_lower for keyword in guantes_10_keywords):
-            thresh = 10
-        elif any(keyword in name_lower for keyword in guantes_50_keywords):
-            thresh = 50
-        elif any(keyword in name_lower for keyword in guantes_1_keywords):
-            thresh = 1
-        else:
-            thresh = 10  # Default para otros guantes
-        
-        return stock <= thresh
-    
-    # Utensilios y platos
-    if cat == "Utensilios y platos":
-        special_20_names = ["cuchara plástica", "cuchara plástica/postre", "tenedor plástico", "cuchillo plástico"]
-        if name_lower in special_20_names:
-            thresh = 20
-        else:
-            thresh = 5
-        return stock <= thresh
-    
-    # Si categoría no reconocida, default a 10
-    return stock <= 10
-
-def get_low_stock_products():
-    all_products = Product.query.all()
-    return [p for p in all_products if is_low_stock(p)]
-
-def get_pending_dispatches():
-    now_local = datetime.now(CL_TZ)
-    one_week_ago_local = now_local - timedelta(days=7)
-    one_week_ago_utc = one_week_ago_local.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
-    return Dispatch.query.filter(
-        Dispatch.delivered_client == False, Dispatch.fecha < one_week_ago_utc
-    ).all()
+def get_low_stock_recipients(app):
+    """Usuarios suscritos que reciben avisos de stock (excluye listas de solo-pendientes)."""
+    users = User.query.filter_by(receive_notifications=True).all()
+    if not users:
+        app.logger.info("No hay usuarios suscritos a notificaciones")
+        return []
 
-def notify_low_stock(app):
-    try:
-        print("Ejecutando notify_low_stock")
-        app.logger.debug("Iniciando notify_low_stock")
-        products = get_low_stock_products()
-        if not products:
-            app.logger.info("No hay productos con stock bajo")
-            return
+    is_prod = os.getenv("FLASK_ENV", "development") == "production" or os.getenv("ENV", "development") == "production"
 
-        users = User.query.filter_by(receive_notifications=True).all()
-        if not users:
-            app.logger.info("No hay usuarios suscritos a notificaciones")
-            return
+    if is_prod:
+        no_notif_emails = set([
+            "claudiogarbarino1966@gmail.com".lower(),
+            "alfonsomachado64@gmail.com".lower(),
+            "jerrykalet@gmail.com".lower(),
+            "cocachaucono@gmail.com".lower()
+        ])
+        only_pending_emails = set([
+            "luceromendez13@hotmail.com".lower(),
+            "orozcop648@gmail.com".lower(),
+            "administracion@signoltda.com".lower()
+        ])
+        only_lowstock_emails = set([
+            "robinson67leon@gmail.com".lower()
+        ])
+        recipients = [u for u in users if u.email not in no_notif_emails and u.email not in only_pending_emails]
+    else:
+        recipients = users
 
-        is_prod = os.getenv("FLASK_ENV", "development") == "production" or os.getenv("ENV", "development") == "production"
+    if not recipients:
+        app.logger.info("No hay destinatarios para notificaciones de stock bajo")
+    return recipients
 
-        if is_prod:
-            no_notif_emails = set([
-                "claudiogarbarino1966@gmail.com".lower(),
-                "alfonsomachado64@gmail.com".lower(),
-                "jerrykalet@gmail.com".lower(),
-                "cocachaucono@gmail.com".lower()
-            ])
-            only_pending_emails = set([
-                "luceromendez13@hotmail.com".lower(),
-                "orozcop648@gmail.com".lower(),
-                "administracion@signoltda.com".lower()
-            ])
-            only_lowstock_emails = set([
-                "robinson67leon@gmail.com".lower()
-            ])
-            recipients = [u for u in users if u.email not in no_notif_emails and u.email not in only_pending_emails]
-        else:
-            recipients = users
+def _send_stock_email(app, subject, base_html, recipients):
+    """Un correo por destinatario. Devuelve cuántos se enviaron."""
+    enviados = 0
+    for u in recipients:
+        unsubscribe_link = generate_unsubscribe_link(u.id, app)
+        full_html = (
+            base_html
+            + f'<p style="text-align: center; font-size: 12px; color: #999;"><a href="{unsubscribe_link}" style="color: #007bff;">Cancelar suscripción a notificaciones</a></p>'
+            + """
+            </div>
+        </body>
+        </html>
+            """
+        )
+        try:
+            send_notification_email(subject, full_html, [u.email], app)
+            enviados += 1
+            app.logger.info(f"Email '{subject}' enviado a {u.email}")
+        except Exception as e:
+            app.logger.error(f"Error enviando '{subject}' a {u.email}: {str(e)}")
+    return enviados
 
-        if not recipients:
-            app.logger.info("No hay destinatarios para notificaciones de stock bajo")
-            return
+def _stock_changes_html(title, intro, rows, footer=""):
+    """HTML de cruces de umbral: productos que quedaron bajo el umbral y recuperados."""
+    bajos = [(st, p) for st, p in rows if st.is_low]
+    recuperados = [(st, p) for st, p in rows if not st.is_low]
 
-        # Agrupar por categoría
-        low_by_cat = defaultdict(list)
-        for p in products:
-            low_by_cat[p.category].append(p)
-        
-        base_html = """
+    html = f"""
         <html>
         <body style="font-family: Arial, sans-serif; background-color: #f4f4f4; padding: 20px;">
             <div style="max-width: 600px; margin: auto; background: white; padding: 20px; border-radius: 8px; box-shadow: 0 0 10px rgba(0,0,0,0.1);">
-                <h2 style="color: #333; text-align: center;">¡Alerta de Stock Bajo! 📉</h2>
-                <p style="color: #555;">Hola equipo, hemos detectado productos con stock bajo o negativo. Por favor, revisen lo antes posible para evitar problemas en los despachos.</p>
+                <h2 style="color: #333; text-align: center;">{title}</h2>
+                <p style="color: #555;">{intro}</p>
         """
-        
-        # Ordenar categorías alfabéticamente, con "Otros" al final si existe
+
+    if bajos:
+        low_by_cat = defaultdict(list)
+        for _, p in bajos:
+            low_by_cat[p.category].append(p)
         sorted_cats = sorted([c for c in low_by_cat if c != "Otros"]) + (["Otros"] if "Otros" in low_by_cat else [])
-        
+        html += '<h3 style="color: #d32f2f; margin-top: 20px;">Bajo el umbral</h3>'
         for cat in sorted_cats:
-            base_html += f'<h3 style="color: #333; margin-top: 20px;">{cat}</h3>'
-            base_html += '<ul style="list-style-type: none; padding: 0;">'
-            # Ordenar productos por nombre dentro de la categoría
-            sorted_products = sorted(low_by_cat[cat], key=lambda p: p.name)
-            for p in sorted_products:
-                status = "negativo" if p.stock < 0 else "bajo"
-                color = "#d32f2f" if p.stock < 0 else "#e67e22"  # rojo fuerte o naranja oscuro
-                base_html += f"""
-                    <li style="margin-bottom: 12px; padding: 12px; background: #fff3e0;
-                            border-left: 5px solid {color}; border-radius: 4px;">
-                        <div style="font-weight: bold; color: #333; margin-bottom: 6px;">
-                            {p.name}
-                        </div>
-                        <div style="color: {color}; font-weight: bold; margin-left: 5px;">
-                            Stock {p.stock} ({status})
-                        </div>
+            html += f'<h4 style="color: #333; margin: 12px 0 6px;">{cat}</h4>'
+            html += '<ul style="list-style-type: none; padding: 0;">'
+            for p in low_by_cat[cat]:
+                color = "#d32f2f" if p.stock < 0 else "#e67e22"
+                html += f"""
+                    <li style="margin-bottom: 8px; padding: 10px; background: #fff3e0; border-left: 5px solid {color}; border-radius: 4px;">
+                        <strong>{p.name}</strong><br>
+                        <span style="color: {color}; font-weight: bold;">Stock {p.stock} (umbral {p.reorder_point})</span>
                     </li>
                 """
-            base_html += '</ul>'
-        
-        base_html += """
-                <p style="color: #555; text-align: center;">¡Mantengamos el inventario al día! 😊</p>
-        """
+            html += '</ul>'
 
-        for u in recipients:
-            unsubscribe_link = generate_unsubscribe_link(u.id, app)
-            full_html = (
-                base_html
-                + f'<p style="text-align: center; font-size: 12px; color: #999;"><a href="{unsubscribe_link}" style="color: #007bff;">Cancelar suscripción a notificaciones</a></p>'
-                + """
-            </div>
-        </body>
-        </html>
+    if recuperados:
+        html += '<h3 style="color: #2e7d32; margin-top: 20px;">Recuperados</h3>'
+        html += '<ul style="list-style-type: none; padding: 0;">'
+        for _, p in recuperados:
+            html += f"""
+                    <li style="margin-bottom: 8px; padding: 10px; background: #e8f5e9; border-left: 5px solid #2e7d32; border-radius: 4px;">
+                        <strong>{p.name}</strong> ({p.category})<br>
+                        <span style="color: #2e7d32;">Stock {p.stock} (umbral {p.reorder_point})</span>
+                    </li>
             """
+        html += '</ul>'
+
+    if footer:
+        html += f'<p style="color: #555; text-align: center;">{footer}</p>'
+    return html
+
+def _release(app, claim):
+    try:
+        release_alerts(claim)
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"[STOCK ALERTS] No se pudo liberar el aviso: {e}")
+
+def notify_stock_crossings(app):
+    """
+    Alerta inmediata (con debounce, ver app/utils/stock_alerts.py): productos
+    que cruzaron su umbral desde el último aviso, en un solo correo. Si no
+    llega a nadie, los cruces vuelven a quedar pendientes.
+    """
+    claim = None
+    try:
+        rows, claim = claim_pending_alerts("notified")
+        if not rows:
+            return
+        recipients = get_low_stock_recipients(app)
+        if recipients:
+            html = _stock_changes_html(
+                "Cambios de Stock 📦",
+                "Estos productos cruzaron su umbral de stock bajo en las últimas horas.",
+                rows,
             )
-            try:
-                send_notification_email(
-                    "Alerta: Stock Bajo o Negativo en Productos", full_html, [u.email], app
-                )
-                app.logger.info(f"Email stock bajo enviado a {u.email}")
-            except Exception as e:
-                app.logger.error(f"Error enviando stock bajo a {u.email}: {str(e)}")
+            if not _send_stock_email(app, "Alerta: Productos que cruzaron el umbral de stock", html, recipients):
+                raise RuntimeError("no se envió a ningún destinatario")
+        app.logger.info(f"[STOCK ALERTS] {len(rows)} cruces avisados")
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error en notify_stock_crossings: {str(e)}")
+        _release(app, claim)
+
+def notify_stock_alert_digest(app):
+    """
+    Resumen diario: solo los cambios de estado desde el resumen anterior
+    (nuevos bajo el umbral y recuperados), sin recalcular el catálogo. Si
+    no llega a nadie, los cambios quedan para el próximo resumen.
+    """
+    claim = None
+    try:
+        current_app.logger.info("Ejecutando notify_stock_alert_digest")
+        rows, claim = claim_pending_alerts("digested")
+        if not rows:
+            app.logger.info("Sin cambios de stock bajo desde el último resumen")
+            return
+        recipients = get_low_stock_recipients(app)
+        if recipients:
+            total = count_low_products()
+            html = _stock_changes_html(
+                "Resumen Diario de Stock 📉",
+                "Hola equipo, estos son los cambios de stock bajo desde el último resumen. Por favor, revisen lo antes posible para evitar problemas en los despachos.",
+                rows,
+                footer=f"En total hay {total} productos bajo su umbral. ¡Mantengamos el inventario al día! 😊",
+            )
+            if not _send_stock_email(app, "Resumen: Cambios de Stock Bajo", html, recipients):
+                raise RuntimeError("no se envió a ningún destinatario")
     except Exception as e:
-        app.logger.error(f"Error en notify_low_stock: {str(e)}")
+        db.session.rollback()
+        app.logger.error(f"Error en notify_stock_alert_digest: {str(e)}")
+        _release(app, claim)
 
 def notify_pending_dispatches(app):
     try:
@@ -344,17 +298,15 @@ def notify_pending_dispatches(app):
                 <p style="color: #555;">Hola equipo, estos despachos tienen más de una semana sin ser marcados como "Pedido Entregado". Por favor, investiguen y tomen acción si es necesario.</p>
                 <ul style="list-style-type: none; padding: 0;">
         """
+        # Filas ya unidas con los nombres (una sola consulta)
         for d in dispatches:
-            client = Client.query.get(d.cliente_id)
-            driver = Driver.query.get(d.chofer_id)
-            creator = Creator.query.get(d.created_by)
             base_html += f"""
                     <li style="margin-bottom: 10px; padding: 10px; background: #fff3e0; border-left: 5px solid orange; border-radius: 4px;">
                         <strong>Orden:</strong> {d.orden}<br>
                         <strong>Factura:</strong> {d.factura_numero or 'N/A'}<br>
-                        <strong>Centro de Costo:</strong> {client.name if client else 'Desconocido'}<br>
-                        <strong>Chofer:</strong> {driver.name if driver else 'Desconocido'}<br>
-                        <strong>Despachado por:</strong> {creator.name if creator else 'Desconocido'}<br>
+                        <strong>Centro de Costo:</strong> {d.client_name or 'Desconocido'}<br>
+                        <strong>Chofer:</strong> {d.driver_name or 'Desconocido'}<br>
+                        <strong>Despachado por:</strong> {d.creator_name or 'Desconocido'}<br>
                         <strong>Fecha:</strong> {d.fecha.isoformat()}<br>
                         <em style="color: red;">Alerta: Posible retraso, contactar al chofer si no fue entregado.</em>
                     </li>
@@ -2,6 +2,10 @@ from app import db
 
 class OperatorActivity(db.Model):
     __tablename__ = 'operator_activity'
+    __table_args__ = (
+        # Horas de otras actividades del operador por día / mes
+        db.Index('ix_operator_activity_operator_fecha', 'operator_id', 'fecha'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     operator_id = db.Column(db.Integer, db.ForeignKey('operator.id'), nullable=False)
@@ -1,5 +1,15 @@
+import unicodedata
+from sqlalchemy.orm import validates
 from app import db
 
+
+def product_search_key(name: str) -> str:
+    """Nombre para búsqueda: minúsculas, sin acentos, espacios simples."""
+    nfkd = unicodedata.normalize("NFKD", name or "")
+    no_accents = "".join(c for c in nfkd if not unicodedata.combining(c))
+    return " ".join(no_accents.split()).lower()
+
+
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -9,6 +19,22 @@ class Product(db.Model):
     # stock global
     stock = db.Column(db.Float, nullable=False, default=0.0)
 
+    # total despachado (suma de DispatchProduct.cantidad), mantenido por las
+    # rutas de despacho; `flask catalog rebuild-usage` lo recalcula
+    usage = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
+
+    # nombre normalizado (product_search_key) para /products/search
+    search_name = db.Column(db.String(120), nullable=True, index=True)
+
+    # umbral de stock bajo precalculado desde stock_threshold_rule
+    # (app/utils/stock_rules.py); bajo si stock <= reorder_point
+    reorder_point = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
+
+    @validates("name")
+    def _sync_search_name(self, key, value):
+        self.search_name = product_search_key(value)
+        return value
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -16,4 +42,10 @@ class Product(db.Model):
             "category": self.category,
             "created_by": self.created_by,
             "stock": self.stock,
-        }
\ No newline at end of file
+            "usage": float(self.usage or 0),
+            "reorder_point": float(self.reorder_point or 0),
+        }
+
+
+# Reporte de stock bajo: `stock - reorder_point <= 0` usa este índice
+db.Index('ix_product_stock_margin', Product.stock - Product.reorder_point)
\ No newline at end of file
@@ -4,9 +4,13 @@ from app.utils.timezone import utcnow, to_local
 
 class Production(db.Model):
     __tablename__ = 'production'
+    __table_args__ = (
+        # Rendimiento de operadores: producción del operador en el mes
+        db.Index('ix_production_operator_fecha', 'operator_id', 'fecha'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    fecha = db.Column(db.DateTime, default=utcnow)
+    fecha = db.Column(db.DateTime, default=utcnow, index=True)
     operator_id = db.Column(db.Integer, db.ForeignKey('operator.id'), nullable=True)
     operator_name = db.Column(db.String(100), nullable=True)
     created_by = db.Column(db.String(50), nullable=False)
@@ -27,8 +31,9 @@ class ProductionProduct(db.Model):
     __tablename__ = 'production_product'
 
     id = db.Column(db.Integer, primary_key=True)
-    production_id = db.Column(db.Integer, db.ForeignKey('production.id'), nullable=False)
+    production_id = db.Column(db.Integer, db.ForeignKey('production.id'), nullable=False, index=True)
     nombre = db.Column(db.String(100), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='SET NULL'), nullable=True, index=True)
     cantidad = db.Column(db.Float, nullable=False)
     unidad = db.Column(db.String(20), nullable=False)
 
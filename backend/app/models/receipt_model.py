@@ -6,10 +6,10 @@ class Receipt(db.Model):
     __tablename__ = 'receipt'
 
     id = db.Column(db.Integer, primary_key=True)
-    orden = db.Column(db.String(50), nullable=False)
+    orden = db.Column(db.String(50), nullable=False, index=True)
     supplier_id = db.Column(db.Integer, db.ForeignKey('supplier.id'), nullable=True)
     supplier_name = db.Column(db.String(100), nullable=True)  # nombre guardado al momento de crear
-    fecha = db.Column(db.DateTime, default=utcnow)
+    fecha = db.Column(db.DateTime, default=utcnow, index=True)
     created_by = db.Column(db.String(50), nullable=False)
     status = db.Column(db.String(30), default='pendiente')
 
@@ -31,8 +31,9 @@ class ReceiptProduct(db.Model):
     __tablename__ = 'receipt_product'
 
     id = db.Column(db.Integer, primary_key=True)
-    receipt_id = db.Column(db.Integer, db.ForeignKey('receipt.id'), nullable=False)
+    receipt_id = db.Column(db.Integer, db.ForeignKey('receipt.id'), nullable=False, index=True)
     nombre = db.Column(db.String(100), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='SET NULL'), nullable=True, index=True)
     cantidad = db.Column(db.Float, nullable=False)
     unidad = db.Column(db.String(20), nullable=False)
 
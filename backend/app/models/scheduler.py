@@ -1,4 +1,4 @@
-from app.models.notifications import notify_low_stock, notify_pending_dispatches
+from app.models.notifications import notify_stock_alert_digest, notify_pending_dispatches
 from datetime import datetime, timedelta, timezone
 from app.models.user_model import User
 
@@ -6,7 +6,8 @@ def daily_notifications(app):
     with app.app_context():
         app.logger.info("Ejecutando daily_notifications - Inicio")
         app.logger.info(f"Usuarios suscritos: {User.query.filter_by(receive_notifications=True).count()}")
-        notify_low_stock(app)
+        # Solo los cruces de umbral desde el último resumen (ver stock_alert_state)
+        notify_stock_alert_digest(app)
         notify_pending_dispatches(app)
         app.logger.info("Ejecutando daily_notifications - Fin")
 
@@ -0,0 +1,37 @@
+from app import db
+from app.utils.timezone import utcnow, to_local
+
+
+class StockAlertState(db.Model):
+    """
+    Estado de alerta de stock por producto. Se actualiza solo cuando el
+    producto cruza su reorder_point (en cualquier dirección), al escribir
+    stock, nombre/categoría o reglas de umbral.
+
+    notified_low / digested_low guardan el último estado informado por la
+    alerta inmediata y por el resumen diario: hay algo que avisar cuando
+    difieren de is_low. Un producto que baja y se recupera antes del aviso
+    no genera correo (los cruces se coalescen).
+    """
+    __tablename__ = 'stock_alert_state'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    is_low = db.Column(db.Boolean, nullable=False, default=False)
+    # Valores al momento del último cruce
+    stock = db.Column(db.Float, nullable=False, default=0.0)
+    reorder_point = db.Column(db.Float, nullable=False, default=0.0)
+    changed_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    notified_low = db.Column(db.Boolean, nullable=True)
+    notified_at = db.Column(db.DateTime, nullable=True)
+    digested_low = db.Column(db.Boolean, nullable=True)
+    digested_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'is_low': self.is_low,
+            'stock': self.stock,
+            'reorder_point': self.reorder_point,
+            'changed_at': to_local(self.changed_at).isoformat(timespec="seconds"),
+        }
@@ -0,0 +1,38 @@
+from app import db
+
+# Tipos de coincidencia sobre el nombre del producto (en minúsculas)
+RULE_MATCH_TYPES = ("any", "suffix", "contains", "exact")
+
+
+class StockThresholdRule(db.Model):
+    """
+    Regla de umbral de stock bajo. Las reglas se compilan a una expresión
+    SQL que precalcula Product.reorder_point; un producto está bajo si
+    stock <= reorder_point.
+
+    Se evalúan primero las reglas de la categoría del producto (por
+    priority) y luego las globales (category NULL); gana la primera que
+    coincide. Sin coincidencia, reorder_point = 0 (solo stock <= 0).
+    """
+    __tablename__ = 'stock_threshold_rule'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # NULL = regla global (productos de categorías sin regla que coincida)
+    category = db.Column(db.String(100), nullable=True, index=True)
+    # 'any' | 'suffix' | 'contains' | 'exact'
+    match = db.Column(db.String(10), nullable=False, default='any')
+    # Texto en minúsculas a buscar en el nombre (no aplica a 'any')
+    pattern = db.Column(db.String(100), nullable=True)
+    threshold = db.Column(db.Float, nullable=False)
+    # Menor = se evalúa antes dentro de su categoría
+    priority = db.Column(db.Integer, nullable=False, default=100)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'category': self.category,
+            'match': self.match,
+            'pattern': self.pattern,
+            'threshold': self.threshold,
+            'priority': self.priority,
+        }
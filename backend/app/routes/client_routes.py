@@ -5,11 +5,13 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import func
 from app.routes.product_routes import normalize_search, normalize_db_column
+from app.utils.catalog_cache import catalog_etag
 
 client_bp = Blueprint('clients', __name__)
 
 @client_bp.route('/clients', methods=['GET'])
 @jwt_required()
+@catalog_etag("clients")
 def list_clients():
     clients = Client.query.all()
     return jsonify([client.to_dict() for client in clients]), 200
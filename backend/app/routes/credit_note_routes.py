@@ -4,7 +4,6 @@ from app import db
 from app.models.credit_note_model import CreditNote, CreditNoteProduct
 from app.models.client_model import Client
 from app.models.user_model import User
-from app.models.product_model import Product
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from sqlalchemy import func
@@ -12,7 +11,9 @@ from app.utils.timezone import to_local, to_utc_naive, CL_TZ
 from sqlalchemy.exc import IntegrityError
 from flask_cors import CORS
 from collections import defaultdict
-from app.routes.product_routes import normalize_product_name, normalize_search, normalize_db_column
+from app.routes.product_routes import normalize_search, normalize_db_column
+from app.utils.product_lines import ProductCatalog, qty_by_product
+from app.utils.idempotency import idempotent
 
 credit_note_bp = Blueprint("credit_notes", __name__)
 CORS(
@@ -23,6 +24,7 @@ CORS(
 
 @credit_note_bp.route("/credit-notes", methods=["POST"])
 @jwt_required()
+@idempotent
 def create_credit_note():
     try:
         data = request.get_json() or {}
@@ -85,32 +87,28 @@ def create_credit_note():
 
         db.session.add(new_credit_note)
 
+        catalog = ProductCatalog()
         for p in productos:
             if not all(k in p for k in ("nombre", "cantidad", "unidad")):
                 return jsonify({"error": "Faltan campos en productos"}), 400
 
             nombre = (p["nombre"] or "").strip()
-            nombre_key = normalize_product_name(nombre)
-            prod_row = next((p for p in Product.query.all() if normalize_product_name(p.name) == nombre_key), None)
-            if not prod_row:
-                db.session.add(Product(name=nombre, category="Otros", created_by=user_id, stock=0.0))
-                db.session.flush()
+            prod_row = catalog.resolve(nombre, user_id)
 
             db.session.add(
                 CreditNoteProduct(
                     nombre=nombre,
+                    product_id=prod_row.id,
                     cantidad=p["cantidad"],
                     unidad=p["unidad"],
                     credit_note=new_credit_note,
                 )
             )
 
-            prod_row = Product.query.filter(func.lower(Product.name) == nombre.lower()).first()
-            if prod_row:
-                try:
-                    prod_row.stock = float(prod_row.stock or 0) + float(p["cantidad"] or 0)
-                except Exception:
-                    pass
+            try:
+                prod_row.stock = float(prod_row.stock or 0) + float(p["cantidad"] or 0)
+            except Exception:
+                pass
 
         db.session.commit()
         return jsonify(new_credit_note.to_dict()), 201
@@ -226,13 +224,8 @@ def delete_credit_note(credit_note_id):
         credit_note = CreditNote.query.get_or_404(credit_note_id)
         
         # Revertir stock (resta porque se revierte el reingreso)
-        for product in credit_note.productos:
-            prod_row = Product.query.filter(func.lower(Product.name) == func.lower(product.nombre)).first()
-            if prod_row:
-                try:
-                    prod_row.stock = float(prod_row.stock or 0) - float(product.cantidad or 0)
-                except Exception:
-                    pass
+        for prod_row, cantidad in qty_by_product(credit_note.productos, ProductCatalog()).items():
+            prod_row.stock = float(prod_row.stock or 0) - cantidad
 
         for product in credit_note.productos:
             db.session.delete(product)
@@ -311,42 +304,31 @@ def update_credit_note(credit_note_id):
                 return jsonify({"error": "duplicate_credit", "msg": "El número de nota de crédito ya está registrado en otra nota de crédito. ¿Desea continuar?"}), 409
 
         # Stock: similar a update en production
-        old_qty_by_name = defaultdict(float)
-        for p in credit_note.productos:
-            old_qty_by_name[p.nombre] += float(p.cantidad or 0)
+        catalog = ProductCatalog()
+        old_qty = qty_by_product(credit_note.productos, catalog)
 
         for product in credit_note.productos:
             db.session.delete(product)
 
-        new_qty_by_name = defaultdict(float)
+        new_qty = defaultdict(float)
         for p in data["productos"]:
             if not all(k in p for k in ("nombre", "cantidad", "unidad")):
                 db.session.rollback()
                 return jsonify({"error": "Faltan campos en productos"}), 400
-            nombre = (p["nombre"] or "").strip()
-            nombre_key = normalize_product_name(nombre)
-            prod_row = next((p for p in Product.query.all() if normalize_product_name(p.name) == nombre_key), None)
-            if not prod_row:
-                db.session.add(Product(name=nombre, category="Otros", created_by=user_id, stock=0.0))
-            new_qty_by_name[nombre] += float(p["cantidad"] or 0)
-
-        db.session.flush()
-
-        all_names = set(old_qty_by_name.keys()) | set(new_qty_by_name.keys())
-        for nombre in all_names:
-            old_q = old_qty_by_name[nombre]
-            new_q = new_qty_by_name[nombre]
-            delta = new_q - old_q
+            prod_row = catalog.resolve((p["nombre"] or "").strip(), user_id)
+            new_qty[prod_row] += float(p["cantidad"] or 0)
+
+        for prod_row in set(old_qty) | set(new_qty):
+            delta = new_qty[prod_row] - old_qty[prod_row]
             if delta != 0:
-                prod_row = Product.query.filter(func.lower(Product.name) == nombre.lower()).first()
-                if prod_row:
-                    prod_row.stock = float(prod_row.stock or 0) + delta
+                prod_row.stock = float(prod_row.stock or 0) + delta
 
         for p in data["productos"]:
             nombre = (p["nombre"] or "").strip()
             db.session.add(
                 CreditNoteProduct(
                     nombre=nombre,
+                    product_id=catalog.find(nombre).id,
                     cantidad=p["cantidad"],
                     unidad=p["unidad"],
                     credit_note=credit_note,
@@ -1,16 +1,17 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response
 from app import db
 from app.models.dispatch_model import Dispatch, DispatchProduct, DispatchImage
 from app.models.dispatch_edit_model import DispatchEditLog
 from app.models.client_model import Client
 from app.models.driver_model import Driver
 from app.models.user_model import User
-from app.models.product_model import Product
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from sqlalchemy import cast, String, func, exists
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import selectinload
 import traceback
+import csv
+import io
 from app.utils.timezone import (
     to_local,
     month_start_local_now,
@@ -21,7 +22,13 @@ from app.utils.timezone import (
 import cloudinary 
 import cloudinary.uploader
 import json 
-from app.routes.product_routes import normalize_product_name, normalize_search, normalize_db_column
+from app.routes.product_routes import normalize_search, normalize_db_column
+from app.utils.dispatch_sync import record_dispatch_changes
+from app.utils.dispatch_view import get_dispatch_view, detail_payload, marked_payload, touch_dispatch_views
+from app.utils.product_lines import ProductCatalog, qty_by_product
+from app.utils.dispatch_events import get_broker, dispatch_event, publish_dispatch_events
+from app.utils.pending_dispatches import pending_filter, names_for_dispatches
+from app.utils.idempotency import idempotent
 
 # === FUNCIÓN AUXILIAR PARA OBTENER public_id DE CLOUDINARY ===
 def get_public_id(url):
@@ -70,6 +77,7 @@ CORS(
 # ----------------------------
 @dispatch_bp.route("/dispatches", methods=["POST"])
 @jwt_required()
+@idempotent
 def create_dispatch():
     user_id = get_jwt_identity()
     current_user = User.query.get(user_id)
@@ -156,29 +164,26 @@ def create_dispatch():
         db.session.add(new_dispatch)
         db.session.flush()
 
+        catalog = ProductCatalog()
         for p in productos:
             if not all(k in p for k in ("nombre", "cantidad", "unidad")):
                 return jsonify({"error": "Faltan campos en productos"}), 400
 
             nombre = (p["nombre"] or "").strip()
-            nombre_key = normalize_product_name(nombre)
-            prod_row = next((p for p in Product.query.all() if normalize_product_name(p.name) == nombre_key), None)
-            if not prod_row:
-                db.session.add(Product(name=nombre, category="Otros", created_by=user_id, stock=0.0))
-                db.session.flush()
-                
+            prod_row = catalog.resolve(nombre, user_id)
+
             db.session.add(
                 DispatchProduct(
                     nombre=nombre,
+                    product_id=prod_row.id,
                     cantidad=p["cantidad"],
                     unidad=p["unidad"],
                     dispatch_id=new_dispatch.id,
                 )
             )
 
-            prod_row = Product.query.filter(func.lower(Product.name) == nombre.lower()).first()
-            if prod_row:
-                prod_row.stock = float(prod_row.stock or 0) - float(p["cantidad"] or 0)
+            prod_row.stock = float(prod_row.stock or 0) - float(p["cantidad"] or 0)
+            prod_row.usage = float(prod_row.usage or 0) + float(p["cantidad"] or 0)
 
         images = request.files.getlist('images')
         for img in images:
@@ -191,7 +196,244 @@ def create_dispatch():
                 db.session.add(new_image)
 
         db.session.commit()
-        return jsonify(new_dispatch.to_dict()), 201
+        publish_dispatch_events([dispatch_event("created", new_dispatch)])
+        return jsonify(get_dispatch_view(new_dispatch.id)["dispatch"]), 201
+
+    except Exception as e:
+        db.session.rollback()
+        print(traceback.format_exc())
+        return jsonify({"error": "Error interno del servidor", "details": str(e)}), 500
+
+# ----------------------------
+# Crear despachos en lote
+# ----------------------------
+BULK_DUPLICATE_MSGS = {
+    "duplicate_both": "El número de orden de compra Y el número de factura ya están registrados en otros despachos.",
+    "duplicate_order": "El número de orden de compra ya está registrado en otro despacho.",
+    "duplicate_invoice": "El número de factura ya está registrado en otro despacho.",
+}
+
+
+def _truthy(value) -> bool:
+    """Flag de texto (CSV, form o query string): 1 / true / si / sí / yes."""
+    return str(value or "").strip().lower() in ("1", "true", "si", "sí", "yes")
+
+
+def _parse_bulk_csv(text: str) -> list[dict]:
+    """
+    CSV con una fila por línea de producto:
+      orden,cliente,chofer,paquete_numero,factura_numero,nombre,cantidad,unidad
+    Las filas consecutivas o no con la misma (orden, cliente, chofer,
+    factura_numero) se agrupan en un solo despacho, en orden de aparición.
+    `chofer` puede ser el ID o el nombre del chofer.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    grupos = {}
+    for row in reader:
+        row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+        key = (row.get("orden"), row.get("cliente"), row.get("chofer"), row.get("factura_numero"))
+        if key not in grupos:
+            grupos[key] = {
+                "orden": row.get("orden"),
+                "cliente": row.get("cliente"),
+                "chofer": row.get("chofer"),
+                "paquete_numero": row.get("paquete_numero"),
+                "factura_numero": row.get("factura_numero"),
+                "force": _truthy(row.get("force")),
+                "productos": [],
+            }
+        if row.get("nombre"):
+            grupos[key]["productos"].append({
+                "nombre": row.get("nombre"),
+                "cantidad": row.get("cantidad") or 0,
+                "unidad": row.get("unidad") or "",
+            })
+    return list(grupos.values())
+
+
+@dispatch_bp.route("/dispatches/bulk", methods=["POST"])
+@jwt_required()
+def create_dispatches_bulk():
+    """
+    Crea muchos despachos en una sola transacción (cierre de mes).
+
+    Acepta JSON ({"dispatches": [...], "force": bool} o directamente una
+    lista, con el mismo formato de `data` de POST /dispatches) o un CSV
+    (archivo `file` en multipart, o cuerpo text/csv). Clientes, choferes y
+    productos se resuelven con consultas en lote; los duplicados de orden o
+    factura (contra la BD y dentro del mismo lote) se informan por fila y
+    se omiten salvo `force`. Los descuentos de stock se aplican agregados
+    por producto.
+    """
+    user_id = get_jwt_identity()
+    current_user = User.query.get(user_id)
+    limited_emails = [
+        "claudiogarbarino1966@gmail.com",
+        "alfonsomachado64@gmail.com",
+        "jerrykalet@gmail.com",
+        "cocachaucono@gmail.com"
+    ]
+    if current_user.email.lower() in [email.lower() for email in limited_emails]:
+        return jsonify({"error": "No autorizado para crear despachos"}), 403
+
+    try:
+        force_all = False
+        csv_file = request.files.get("file")
+        if csv_file:
+            rows = _parse_bulk_csv(csv_file.read().decode("utf-8-sig"))
+            force_all = _truthy(request.form.get("force"))
+        elif request.mimetype == "text/csv":
+            rows = _parse_bulk_csv(request.get_data(as_text=True))
+            force_all = _truthy(request.args.get("force"))
+        else:
+            body = request.get_json(silent=True)
+            if isinstance(body, dict):
+                rows = body.get("dispatches") or []
+                force_all = bool(body.get("force", False))
+            else:
+                rows = body or []
+
+        if not isinstance(rows, list) or not rows:
+            return jsonify({"error": "Se requiere una lista de despachos"}), 400
+
+        results = [None] * len(rows)
+        validos = []  # (idx, row normalizada)
+
+        # ── 1. Validación por fila ──
+        for idx, data in enumerate(rows):
+            if not isinstance(data, dict) or not data.get("orden") or not data.get("cliente") or not data.get("chofer"):
+                results[idx] = {"index": idx, "status": "error", "error": "Faltan campos requeridos (orden, cliente, chofer)"}
+                continue
+            productos = data.get("productos") or []
+            if not all(isinstance(p, dict) and all(k in p for k in ("nombre", "cantidad", "unidad")) for p in productos):
+                results[idx] = {"index": idx, "status": "error", "error": "Faltan campos en productos"}
+                continue
+            try:
+                productos = [
+                    {"nombre": (p["nombre"] or "").strip(), "cantidad": float(p["cantidad"] or 0), "unidad": p["unidad"]}
+                    for p in productos
+                ]
+            except (TypeError, ValueError):
+                results[idx] = {"index": idx, "status": "error", "error": "Cantidad inválida en productos"}
+                continue
+            validos.append((idx, {
+                "orden": str(data["orden"]).strip(),
+                "cliente": " ".join(str(data["cliente"]).strip().split()),
+                "chofer": str(data["chofer"]).strip(),
+                "paquete_numero": (str(data.get("paquete_numero") or "")).strip() or None,
+                "factura_numero": (str(data.get("factura_numero") or "")).strip() or None,
+                "force": force_all or bool(data.get("force", False)),
+                "productos": productos,
+            }))
+
+        # ── 2. Choferes (por ID o por nombre) en una consulta cada uno ──
+        chofer_ids = {int(r["chofer"]) for _, r in validos if r["chofer"].isdigit()}
+        chofer_names = {r["chofer"].lower() for _, r in validos if not r["chofer"].isdigit()}
+        drivers_by_id = {d.id: d for d in Driver.query.filter(Driver.id.in_(chofer_ids)).all()} if chofer_ids else {}
+        drivers_by_name = {
+            d.name.lower(): d
+            for d in Driver.query.filter(func.lower(Driver.name).in_(chofer_names)).all()
+        } if chofer_names else {}
+
+        # ── 3. Duplicados existentes en la BD ──
+        ordenes = {r["orden"] for _, r in validos}
+        facturas = {r["factura_numero"] for _, r in validos if r["factura_numero"]}
+        ordenes_bd = {
+            o for (o,) in db.session.query(Dispatch.orden).filter(Dispatch.orden.in_(ordenes)).distinct()
+        } if ordenes else set()
+        facturas_bd = {
+            f for (f,) in db.session.query(Dispatch.factura_numero).filter(Dispatch.factura_numero.in_(facturas)).distinct()
+        } if facturas else set()
+
+        aceptados = []  # (idx, row, chofer)
+        for idx, r in validos:
+            chofer = drivers_by_id.get(int(r["chofer"])) if r["chofer"].isdigit() else drivers_by_name.get(r["chofer"].lower())
+            if not chofer:
+                results[idx] = {"index": idx, "status": "error", "error": f"Chofer {r['chofer']} no encontrado"}
+                continue
+
+            dup_orden = r["orden"] in ordenes_bd
+            dup_factura = bool(r["factura_numero"]) and r["factura_numero"] in facturas_bd
+            if not r["force"] and (dup_orden or dup_factura):
+                code = "duplicate_both" if dup_orden and dup_factura else "duplicate_order" if dup_orden else "duplicate_invoice"
+                results[idx] = {"index": idx, "status": "duplicate", "error": code, "msg": BULK_DUPLICATE_MSGS[code]}
+                continue
+
+            # Lo aceptado en este lote cuenta como existente para las filas siguientes
+            ordenes_bd.add(r["orden"])
+            if r["factura_numero"]:
+                facturas_bd.add(r["factura_numero"])
+            aceptados.append((idx, r, chofer))
+
+        # ── 4. Clientes: una consulta + alta de los que falten ──
+        cliente_keys = {r["cliente"].lower(): r["cliente"] for _, r, _ in aceptados}
+        clientes = {
+            c.name.lower(): c
+            for c in Client.query.filter(func.lower(Client.name).in_(list(cliente_keys))).all()
+        } if cliente_keys else {}
+        for key, nombre in cliente_keys.items():
+            if key not in clientes:
+                clientes[key] = Client(name=nombre, created_by=user_id)
+                db.session.add(clientes[key])
+
+        # ── 5. Productos: un solo recorrido del catálogo, altas en lote ──
+        catalog = ProductCatalog()
+        stock_delta = {}
+        for _, r, _ in aceptados:
+            for p in r["productos"]:
+                prod = catalog.resolve(p["nombre"], user_id)
+                stock_delta[prod] = stock_delta.get(prod, 0.0) + p["cantidad"]
+        db.session.flush()
+
+        # ── 6. Despachos y líneas ──
+        fecha = to_utc_naive(datetime.now(CL_TZ))
+        nuevos = []
+        for idx, r, chofer in aceptados:
+            cliente = clientes[r["cliente"].lower()]
+            d = Dispatch(
+                orden=r["orden"],
+                chofer_id=chofer.id,
+                cliente_id=cliente.id,
+                created_by=user_id,
+                paquete_numero=r["paquete_numero"],
+                factura_numero=r["factura_numero"],
+                chofer_name=chofer.name,
+                client_name=cliente.name,
+                fecha=fecha,
+            )
+            if is_auto_delivery_driver(chofer.name):
+                ahora = datetime.utcnow()
+                d.delivered_driver = True
+                d.delivered_driver_at = ahora
+                d.delivered_client = True
+                d.delivered_client_at = ahora
+                d.status = "entregado_cliente"
+                d.auto_delivered = True
+            for p in r["productos"]:
+                d.productos.append(DispatchProduct(
+                    nombre=p["nombre"], product_id=catalog.find(p["nombre"]).id,
+                    cantidad=p["cantidad"], unidad=p["unidad"],
+                ))
+            db.session.add(d)
+            nuevos.append((idx, d))
+
+        # ── 7. Stock agregado: una actualización por producto ──
+        for prod, cantidad in stock_delta.items():
+            prod.stock = float(prod.stock or 0) - cantidad
+            prod.usage = float(prod.usage or 0) + cantidad
+
+        db.session.commit()
+
+        for idx, d in nuevos:
+            results[idx] = {"index": idx, "status": "created", "id": d.id, "orden": d.orden}
+        publish_dispatch_events([dispatch_event("created", d) for _, d in nuevos])
+
+        created = len(nuevos)
+        return jsonify({
+            "created": created,
+            "skipped": len(rows) - created,
+            "results": results,
+        }), 201 if created else 200
 
     except Exception as e:
         db.session.rollback()
@@ -255,7 +497,7 @@ def get_dispatches():
             query = query.filter(subq)
 
         if pending_only:
-            query = query.filter(Dispatch.delivered_client == False)
+            query = query.filter(pending_filter())
 
         apply_local_window_check = False
         win_start_local = None
@@ -297,32 +539,30 @@ def get_dispatches():
             except ValueError:
                 return jsonify({"error": "Formato de fecha inválido"}), 400
 
-        query = query.order_by(Dispatch.fecha.asc())
+        # Productos e imágenes en una consulta por relación, no una por fila
+        query = query.order_by(Dispatch.fecha.asc()).options(
+            selectinload(Dispatch.productos),
+            selectinload(Dispatch.images),
+        )
 
         if all_param:
-            
-            dispatches = (
-                query
-                .options(joinedload(Dispatch.productos))
-                .all()
-            )
+            dispatches = query.all()
         else:
             dispatches = query.paginate(page=page, per_page=limit, error_out=False).items
 
         if apply_local_window_check:
             dispatches = [d for d in dispatches if win_start_local <= to_local(d.fecha) < win_end_local]
 
+        client_names, user_names = names_for_dispatches(dispatches)
         result = []
         for d in dispatches:
-            client = Client.query.get(d.cliente_id)
-            creator = User.query.get(d.created_by)
             derived_status = "entregado_cliente" if d.delivered_client else "entregado_chofer" if d.delivered_driver else (d.status or "pendiente")
             result.append({
                 "id": d.id,
                 "orden": d.orden,
-                "cliente": client.name if client else d.client_name, # CORRECCIÓN: client_name
+                "cliente": client_names.get(d.cliente_id, d.client_name), # CORRECCIÓN: client_name
                 "chofer": d.chofer_name,
-                "created_by": creator.name if creator else d.created_by,
+                "created_by": user_names.get(d.created_by, d.created_by),
                 "fecha": to_local(d.fecha).isoformat(timespec="seconds"),
                 "status": derived_status,
                 "delivered_driver": d.delivered_driver,
@@ -343,25 +583,11 @@ def get_dispatches():
 @jwt_required()
 def get_dispatch_details(dispatch_id):
     try:
-        d = Dispatch.query.get_or_404(dispatch_id)
-        client = Client.query.get(d.cliente_id)
-        creator = User.query.get(d.created_by)
-        derived_status = "entregado_cliente" if d.delivered_client else "entregado_chofer" if d.delivered_driver else (d.status or "pendiente")
-        return jsonify({
-            "id": d.id,
-            "orden": d.orden,
-            "cliente": client.name if client else d.client_name, # CORRECCIÓN: client_name
-            "chofer": d.chofer_name,
-            "created_by": creator.name if creator else d.created_by,
-            "fecha": to_local(d.fecha).isoformat(timespec="seconds"),
-            "status": derived_status,
-            "delivered_driver": d.delivered_driver,
-            "delivered_client": d.delivered_client,
-            "paquete_numero": d.paquete_numero,
-            "factura_numero": d.factura_numero,
-            "productos": [{"nombre": p.nombre, "cantidad": p.cantidad, "unidad": p.unidad} for p in d.productos],
-            "images": [i.to_dict() for i in d.images],
-        }), 200
+        # Una fila de dispatch_view: productos, imágenes y nombres ya resueltos
+        view = get_dispatch_view(dispatch_id)
+        if view is None:
+            return jsonify({"error": "Despacho no encontrado"}), 404
+        return jsonify(detail_payload(view)), 200
     except Exception as e:
         return jsonify({"error": "Error interno del servidor", "details": str(e)}), 500
 
@@ -502,25 +728,25 @@ def update_dispatch(dispatch_id):
                 d.auto_delivered = False
 
         if "productos" in data and isinstance(data["productos"], list):
-            old_qty = {item.nombre: float(item.cantidad or 0) for item in d.productos}
+            catalog = ProductCatalog()
+            old_qty = qty_by_product(d.productos, catalog)
             DispatchProduct.query.filter_by(dispatch_id=d.id).delete()
-            
+            # El DELETE masivo no pasa por el flush: rearmar dispatch_view igual
+            touch_dispatch_views([d.id])
+
             new_qty = {}
             for p in data["productos"]:
                 nombre = (p["nombre"] or "").strip()
                 cant, unid = float(p["cantidad"] or 0), p["unidad"]
-                db.session.add(DispatchProduct(dispatch_id=d.id, nombre=nombre, cantidad=cant, unidad=unid))
-                new_qty[nombre] = new_qty.get(nombre, 0.0) + cant
-                
-                nombre_key = normalize_product_name(nombre)
-                prod_row = next((p for p in Product.query.all() if normalize_product_name(p.name) == nombre_key), None)
-                if not prod_row:
-                    db.session.add(Product(name=nombre, category="Otros", created_by=user_id, stock=0.0))
-
-            for nombre in (set(old_qty.keys()) | set(new_qty.keys())):
-                delta = new_qty.get(nombre, 0.0) - old_qty.get(nombre, 0.0)
-                prod = Product.query.filter(func.lower(Product.name) == nombre.lower()).first()
-                if prod: prod.stock = float(prod.stock or 0) - delta
+                prod_row = catalog.resolve(nombre, user_id)
+                db.session.add(DispatchProduct(dispatch_id=d.id, nombre=nombre, product_id=prod_row.id, cantidad=cant, unidad=unid))
+                new_qty[prod_row] = new_qty.get(prod_row, 0.0) + cant
+
+            for prod in (set(old_qty.keys()) | set(new_qty.keys())):
+                delta = new_qty.get(prod, 0.0) - old_qty.get(prod, 0.0)
+                if delta:
+                    prod.stock = float(prod.stock or 0) - delta
+                    prod.usage = float(prod.usage or 0) + delta
 
         delete_image_ids = data.get("delete_image_ids", [])
         for img_id in delete_image_ids:
@@ -563,24 +789,9 @@ def update_dispatch(dispatch_id):
             )
 
         db.session.commit()
-        
-        client = Client.query.get(d.cliente_id)
-        creator = User.query.get(d.created_by)
-        return jsonify({
-            "id": d.id,
-            "orden": d.orden,
-            "cliente": client.name if client else d.client_name,
-            "chofer": d.chofer_name,
-            "created_by": creator.name if creator else d.created_by,
-            "fecha": to_local(d.fecha).isoformat(timespec="seconds"),
-            "status": d.status,
-            "delivered_driver": d.delivered_driver,
-            "delivered_client": d.delivered_client,
-            "factura_numero": d.factura_numero,
-            "paquete_numero": d.paquete_numero,
-            "productos": [{"nombre": p.nombre, "cantidad": p.cantidad, "unidad": p.unidad} for p in d.productos],
-            "images": [i.to_dict() for i in d.images],
-        }), 200
+        publish_dispatch_events([dispatch_event("updated", d)])
+
+        return jsonify(detail_payload(get_dispatch_view(dispatch_id), raw_status=True)), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Error al actualizar", "details": str(e)}), 500
@@ -607,6 +818,83 @@ def get_monthly_dispatches():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# ----------------------------
+# Feed de cambios (SSE / long-poll)
+# ----------------------------
+SSE_HEARTBEAT_SECONDS = 15
+
+@dispatch_bp.route("/dispatches/events", methods=["GET"])
+@jwt_required(locations=["headers", "query_string"])
+def dispatch_events_stream():
+    """
+    Server-Sent Events con los cambios de despachos (created, updated,
+    marked, deleted). EventSource no envía headers: el token puede ir en
+    ?jwt=. Con Last-Event-ID se reenvía lo pendiente del historial.
+    """
+    broker = get_broker()
+    try:
+        last_id = int(request.headers.get("Last-Event-ID") or request.args.get("after") or 0)
+    except ValueError:
+        last_id = 0
+    # Suscribir antes de leer el historial: lo que llegue entre medio sale por
+    # la cola y el filtro por seq descarta los repetidos
+    q = broker.subscribe()
+    pendientes, reset = broker.events_after(last_id, timeout=0) if last_id else ([], False)
+    # La conexión vuelve al pool: el stream puede durar horas
+    db.session.close()
+
+    def _format(e):
+        return f"id: {e['seq']}\nevent: {e['type']}\ndata: {json.dumps(e, ensure_ascii=False)}\n\n"
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            if reset:
+                yield "event: reset\ndata: {}\n\n"
+            enviado = last_id
+            for e in pendientes:
+                enviado = e["seq"]
+                yield _format(e)
+            while True:
+                try:
+                    e = q.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except Exception:
+                    yield ": ping\n\n"
+                    continue
+                if e["seq"] <= enviado:
+                    continue
+                enviado = e["seq"]
+                yield _format(e)
+        finally:
+            broker.unsubscribe(q)
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@dispatch_bp.route("/dispatches/events/poll", methods=["GET"])
+@jwt_required()
+def dispatch_events_poll():
+    """
+    Long-poll para clientes sin SSE: ?after=<seq>&timeout=<s> (máx 30).
+    Responde { events, last_seq, reset }; con reset=true hay que recargar
+    la lista completa (seq desconocido o fuera del historial).
+    """
+    try:
+        after = request.args.get("after", default=0, type=int) or 0
+        timeout = min(max(request.args.get("timeout", default=25, type=float) or 0, 0), 30)
+        broker = get_broker()
+        db.session.close()
+        events, reset = broker.events_after(after, timeout=timeout)
+        return jsonify({
+            "events": events,
+            "last_seq": events[-1]["seq"] if events else broker.last_seq if reset else after,
+            "reset": reset,
+        }), 200
+    except Exception as e:
+        return jsonify({"error": "Error al obtener eventos", "details": str(e)}), 500
+
 @dispatch_bp.route("/dispatches/<int:dispatch_id>/mark-driver", methods=["POST", "OPTIONS"])
 @cross_origin(supports_credentials=True)
 @jwt_required(optional=True)
@@ -620,10 +908,8 @@ def mark_driver_delivered(dispatch_id):
             d.status = "entregado_chofer"
             d.auto_delivered = False
             db.session.commit()
-        creator = User.query.get(d.created_by)
-        result = d.to_dict()
-        result["created_by"] = creator.name if creator else d.created_by
-        return jsonify(result), 200
+            publish_dispatch_events([dispatch_event("marked", d)])
+        return jsonify(marked_payload(get_dispatch_view(dispatch_id))), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -641,13 +927,114 @@ def mark_client_delivered(dispatch_id):
         d.delivered_driver_at = datetime.utcnow()
         d.auto_delivered = False
         db.session.commit()
-        creator = User.query.get(d.created_by)
-        result = d.to_dict()
-        result["created_by"] = creator.name if creator else d.created_by
-        return jsonify(result), 200
+        publish_dispatch_events([dispatch_event("marked", d)])
+        return jsonify(marked_payload(get_dispatch_view(dispatch_id))), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@dispatch_bp.route("/dispatches/mark-bulk", methods=["POST", "OPTIONS"])
+@cross_origin(supports_credentials=True)
+@jwt_required(optional=True)
+def mark_bulk_delivered():
+    """
+    Marca muchos despachos de una vez (cierre de ruta del chofer).
+    Body JSON: { "ids": [1, 2, 3], "status": "entregado_chofer" | "entregado_cliente" }
+
+    Mismas reglas que mark-driver / mark-client, aplicadas con un único
+    UPDATE por conjunto: "entregado_chofer" solo afecta a los que aún no
+    estaban entregados al chofer; "entregado_cliente" marca ambos hitos.
+    La respuesta es compacta (sin productos ni imágenes).
+    """
+    if request.method == "OPTIONS": return ("", 204)
+    try:
+        data = request.get_json() or {}
+        target = (data.get("status") or "").strip()
+        raw_ids = data.get("ids")
+        if not isinstance(raw_ids, list):
+            return jsonify({"error": "Se requiere una lista de ids"}), 400
+        try:
+            ids = sorted({int(i) for i in raw_ids})
+        except (TypeError, ValueError):
+            return jsonify({"error": "Los ids deben ser numéricos"}), 400
+        if not ids:
+            return jsonify({"error": "Se requiere una lista de ids"}), 400
+        if len(ids) > 500:
+            return jsonify({"error": "Máximo 500 despachos por solicitud"}), 400
+        if target not in ("entregado_chofer", "entregado_cliente"):
+            return jsonify({"error": "status debe ser 'entregado_chofer' o 'entregado_cliente'"}), 400
+
+        before = {
+            row.id: row
+            for row in db.session.query(
+                Dispatch.id, Dispatch.orden, Dispatch.chofer_id, Dispatch.status,
+                Dispatch.delivered_driver, Dispatch.delivered_client,
+            ).filter(Dispatch.id.in_(ids))
+        }
+
+        ahora = datetime.utcnow()
+        if target == "entregado_chofer":
+            updated_ids = {i for i, row in before.items() if not row.delivered_driver}
+            if updated_ids:
+                db.session.query(Dispatch).filter(
+                    Dispatch.id.in_(updated_ids), Dispatch.delivered_driver == False
+                ).update({
+                    Dispatch.delivered_driver: True,
+                    Dispatch.delivered_driver_at: ahora,
+                    Dispatch.status: "entregado_chofer",
+                    Dispatch.auto_delivered: False,
+                }, synchronize_session=False)
+        else:
+            updated_ids = set(before)
+            if updated_ids:
+                db.session.query(Dispatch).filter(Dispatch.id.in_(updated_ids)).update({
+                    Dispatch.delivered_client: True,
+                    Dispatch.delivered_client_at: ahora,
+                    Dispatch.status: "entregado_cliente",
+                    Dispatch.delivered_driver: True,
+                    Dispatch.delivered_driver_at: ahora,
+                    Dispatch.auto_delivered: False,
+                }, synchronize_session=False)
+        # El UPDATE masivo no pasa por el flush del ORM: registrar para sync
+        record_dispatch_changes(updated_ids)
+        touch_dispatch_views(updated_ids)
+        db.session.commit()
+
+        results = []
+        for i in ids:
+            row = before.get(i)
+            if row is None:
+                results.append({"id": i, "result": "not_found"})
+                continue
+            if i in updated_ids:
+                delivered_driver = True
+                delivered_client = row.delivered_client or target == "entregado_cliente"
+                status = target
+            else:
+                delivered_driver, delivered_client, status = row.delivered_driver, row.delivered_client, row.status
+            derived_status = "entregado_cliente" if delivered_client else "entregado_chofer" if delivered_driver else (status or "pendiente")
+            results.append({
+                "id": i,
+                "result": "updated" if i in updated_ids else "unchanged",
+                "status": derived_status,
+                "delivered_driver": delivered_driver,
+                "delivered_client": delivered_client,
+            })
+
+        publish_dispatch_events([
+            {"type": "marked", "id": r["id"], "orden": before[r["id"]].orden, "chofer_id": before[r["id"]].chofer_id,
+             "status": r["status"], "delivered_driver": r["delivered_driver"], "delivered_client": r["delivered_client"]}
+            for r in results if r["result"] == "updated"
+        ])
+
+        return jsonify({
+            "updated": len(updated_ids),
+            "not_found": len(ids) - len(before),
+            "results": results,
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
 @dispatch_bp.route("/dispatches/<int:dispatch_id>", methods=["DELETE", "OPTIONS"])
 @cross_origin(supports_credentials=True)
 @jwt_required(optional=True)
@@ -660,12 +1047,14 @@ def delete_dispatch(dispatch_id):
         for img in d.images:
             p_id = get_public_id(img.image_url)
             if p_id: cloudinary.uploader.destroy(p_id)
-        for item in d.productos:
-            prod = Product.query.filter(func.lower(Product.name) == item.nombre.lower()).first()
-            if prod: prod.stock = float(prod.stock or 0) + float(item.cantidad or 0)
+        for prod, cantidad in qty_by_product(d.productos, ProductCatalog()).items():
+            prod.stock = float(prod.stock or 0) + cantidad
+            prod.usage = float(prod.usage or 0) - cantidad
         DispatchProduct.query.filter_by(dispatch_id=d.id).delete()
+        evento = dispatch_event("deleted", d)
         db.session.delete(d)
         db.session.commit()
+        publish_dispatch_events([evento])
         return jsonify({"message": "Despacho eliminado"}), 200
     except Exception as e:
         db.session.rollback()
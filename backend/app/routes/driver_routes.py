@@ -4,11 +4,13 @@ from app.models.driver_model import Driver
 from app.models.dispatch_model import Dispatch  # ← para verificar referencias
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import IntegrityError
+from app.utils.catalog_cache import catalog_etag
 
 driver_bp = Blueprint('drivers', __name__)
 
 @driver_bp.route('/drivers', methods=['GET'])
 @jwt_required()
+@catalog_etag("drivers")
 def list_drivers():
     # Opcional: ordenar por nombre
     drivers = Driver.query.order_by(Driver.name.asc()).all()
@@ -2,13 +2,14 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models.internal_consumption_model import InternalConsumption, InternalConsumptionProduct
 from app.models.user_model import User
-from app.models.product_model import Product
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from sqlalchemy import func, cast, String
 from app.utils.timezone import to_utc_naive, to_local, CL_TZ
 from flask_cors import CORS
-from app.routes.product_routes import normalize_product_name, normalize_search, normalize_db_column
+from app.routes.product_routes import normalize_search, normalize_db_column
+from app.utils.product_lines import ProductCatalog, qty_by_product
+from app.utils.idempotency import idempotent
 
 internal_bp = Blueprint("internal_consumptions", __name__)
 CORS(internal_bp, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
@@ -16,6 +17,7 @@ CORS(internal_bp, resources={r"/*": {"origins": "*"}}, supports_credentials=True
 # Crear consumo interno
 @internal_bp.route("/internal-consumptions", methods=["POST"])
 @jwt_required()
+@idempotent
 def create_internal_consumption():
     try:
         data = request.get_json() or {}
@@ -38,32 +40,28 @@ def create_internal_consumption():
 
         db.session.add(new_consumption)
 
+        catalog = ProductCatalog()
         for p in productos:
             if not all(k in p for k in ("nombre", "cantidad", "unidad")):
                 return jsonify({"error": "Faltan campos en productos (nombre, cantidad, unidad)"}), 400
 
             nombre = (p["nombre"] or "").strip()
-            nombre_key = normalize_product_name(nombre)
-            prod_row = next((p for p in Product.query.all() if normalize_product_name(p.name) == nombre_key), None)
-            if not prod_row:
-                db.session.add(Product(name=nombre, category="Otros", created_by=user_id, stock=0.0))
-                db.session.flush()
+            prod_row = catalog.resolve(nombre, user_id)
 
             db.session.add(
                 InternalConsumptionProduct(
                     nombre=nombre,
+                    product_id=prod_row.id,
                     cantidad=p["cantidad"],
                     unidad=p["unidad"],
                     internal_consumption=new_consumption,
                 )
             )
 
-            prod_row = Product.query.filter(func.lower(Product.name) == nombre.lower()).first()
-            if prod_row:
-                try:
-                    prod_row.stock = float(prod_row.stock or 0) - float(p["cantidad"] or 0)
-                except Exception:
-                    pass
+            try:
+                prod_row.stock = float(prod_row.stock or 0) - float(p["cantidad"] or 0)
+            except Exception:
+                pass
 
         db.session.commit()
         return jsonify(new_consumption.to_dict()), 201
@@ -187,13 +185,12 @@ def update_internal_consumption(id):
 
         if "productos" in data and isinstance(data["productos"], list):
             # Lógica de deltas de stock similar a update_dispatch
-            old_qty_by_name = {}
-            for item in c.productos:
-                q = float(item.cantidad or 0)
-                old_qty_by_name[item.nombre] = old_qty_by_name.get(item.nombre, 0.0) + q
+            catalog = ProductCatalog()
+            old_qty = qty_by_product(c.productos, catalog)
 
             new_rows = []
-            new_qty_by_name = {}
+            new_qty = {}
+            current_user = get_jwt_identity()
 
             for p in data["productos"]:
                 if not all(k in p for k in ("nombre", "cantidad", "unidad")):
@@ -202,29 +199,17 @@ def update_internal_consumption(id):
                 nombre = (p["nombre"] or "").strip()
                 cantidad = float(p["cantidad"] or 0)
                 unidad = p["unidad"]
+                prod_row = catalog.resolve(nombre, current_user)
 
                 new_rows.append(
-                    InternalConsumptionProduct(internal_consumption_id=c.id, nombre=nombre, cantidad=cantidad, unidad=unidad)
+                    InternalConsumptionProduct(internal_consumption_id=c.id, nombre=nombre, product_id=prod_row.id, cantidad=cantidad, unidad=unidad)
                 )
-                new_qty_by_name[nombre] = new_qty_by_name.get(nombre, 0.0) + cantidad
+                new_qty[prod_row] = new_qty.get(prod_row, 0.0) + cantidad
 
-            current_user = get_jwt_identity()
-            for nombre in new_qty_by_name.keys():
-                nn = (nombre or "").strip()
-                nn_key = normalize_product_name(nn)
-                exists = next((p for p in Product.query.all() if normalize_product_name(p.name) == nn_key), None)
-                if not exists:
-                    db.session.add(Product(name=nn, category="Otros", created_by=current_user, stock=0.0))
-
-            all_names = set(old_qty_by_name.keys()) | set(new_qty_by_name.keys())
-            for nombre in all_names:
-                old_q = float(old_qty_by_name.get(nombre, 0.0))
-                new_q = float(new_qty_by_name.get(nombre, 0.0))
-                delta = new_q - old_q
+            for prod_row in set(old_qty) | set(new_qty):
+                delta = float(new_qty.get(prod_row, 0.0)) - float(old_qty.get(prod_row, 0.0))
                 if delta != 0:
-                    prod_row = Product.query.filter(func.lower(Product.name) == nombre.lower()).first()
-                    if prod_row:
-                        prod_row.stock = float(prod_row.stock or 0) - float(delta)
+                    prod_row.stock = float(prod_row.stock or 0) - float(delta)
 
             InternalConsumptionProduct.query.filter_by(internal_consumption_id=c.id).delete()
             for row in new_rows:
@@ -256,11 +241,8 @@ def delete_internal_consumption(id):
     try:
         c = InternalConsumption.query.get_or_404(id)
 
-        for item in c.productos:
-            nombre = (item.nombre or "").strip()
-            prod_row = Product.query.filter(func.lower(Product.name) == nombre.lower()).first()
-            if prod_row:
-                prod_row.stock = float(prod_row.stock or 0) + float(item.cantidad or 0)
+        for prod_row, cantidad in qty_by_product(c.productos, ProductCatalog()).items():
+            prod_row.stock = float(prod_row.stock or 0) + cantidad
 
         InternalConsumptionProduct.query.filter_by(internal_consumption_id=c.id).delete()
         db.session.delete(c)
@@ -4,15 +4,20 @@ from app import db
 from app.models.operator_model import Operator
 from app.models.operator_activity_model import OperatorActivity
 from app.models.user_model import User
+from app.utils.month_range import month_filter
 from app.utils.performance import (
     evaluar_operador,
     daily_detail_for_operator,
     get_operator_for_user_email,
+    operator_month_data,
+    clear_operator_month_data,
 )
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import cloudinary.uploader
 
 performance_bp = Blueprint("operator_performance", __name__)
+# Los datos del mes memoizados en g no sobreviven al request
+performance_bp.teardown_request(clear_operator_month_data)
 
 
 @performance_bp.route("/operators/performance", methods=["GET"])
@@ -67,14 +72,7 @@ def operator_performance_detail(operator_id):
         resumen = evaluar_operador(operator_id, year, month)
         diario, principal = daily_detail_for_operator(operator_id, year, month)
 
-        actividades = (
-            OperatorActivity.query
-            .filter(OperatorActivity.operator_id == operator_id)
-            .filter(db.extract('year', OperatorActivity.fecha) == year)
-            .filter(db.extract('month', OperatorActivity.fecha) == month)
-            .order_by(OperatorActivity.fecha.asc())
-            .all()
-        )
+        actividades = operator_month_data(operator_id, year, month).actividades
 
         return jsonify({
             "operator_id": operator.id,
@@ -125,14 +123,7 @@ def my_operator_performance_detail():
         resumen = evaluar_operador(operator.id, year, month)
         diario, principal = daily_detail_for_operator(operator.id, year, month)
 
-        actividades = (
-            OperatorActivity.query
-            .filter(OperatorActivity.operator_id == operator.id)
-            .filter(db.extract('year', OperatorActivity.fecha) == year)
-            .filter(db.extract('month', OperatorActivity.fecha) == month)
-            .order_by(OperatorActivity.fecha.asc())
-            .all()
-        )
+        actividades = operator_month_data(operator.id, year, month).actividades
 
         return jsonify({
             "operator_id": operator.id,
@@ -187,8 +178,7 @@ def list_operator_activities(operator_id):
         q = q.filter(OperatorActivity.fecha == date.fromisoformat(date_param))
     elif month_param:
         year, month = map(int, month_param.split("-"))
-        q = q.filter(db.extract("year", OperatorActivity.fecha) == year)
-        q = q.filter(db.extract("month", OperatorActivity.fecha) == month)
+        q = q.filter(month_filter(OperatorActivity.fecha, year, month))
     activities = q.order_by(OperatorActivity.fecha.desc()).all()
     return jsonify([a.to_dict() for a in activities]), 200
 
@@ -4,11 +4,13 @@ from app.models.operator_model import Operator
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import func
+from app.utils.catalog_cache import catalog_etag
 
 operator_bp = Blueprint('operators', __name__)
 
 @operator_bp.route('/operators', methods=['GET'])
 @jwt_required()
+@catalog_etag("operators")
 def list_operators():
     operators = Operator.query.all()
     return jsonify([operator.to_dict() for operator in operators]), 200
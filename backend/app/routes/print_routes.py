@@ -1,22 +1,41 @@
+from io import BytesIO
+from datetime import datetime
 from flask import Blueprint, send_file, request, jsonify
-from flask_jwt_extended import jwt_required
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models.dispatch_model import Dispatch
 from app.models.client_model import Client
-from app.models.driver_model import Driver
 from app.models.user_model import User
 from app.models.internal_consumption_model import InternalConsumption, InternalConsumptionProduct
-from app.utils.print_utils import (
-    generar_hoja_despacho,
-    generar_etiqueta_despacho,
-    generar_ticket_pos80,
-    _sanitize_barcode_text,
-)
+from app.utils.print_utils import _sanitize_barcode_text, normalize_label_size
+from app.utils.print_service import render_pdf, get_print_service, PrintServiceBusy, PrintServiceTimeout
 from app.utils.timezone import to_local
+from app.utils.render_cache import send_cached_pdf
+from app.utils.dispatch_view import get_dispatch_view, get_dispatch_views
+from app.utils.thermal_print import generar_etiqueta_zpl, generar_ticket_escpos
 from app.models.credit_note_model import CreditNote, CreditNoteProduct
 
 print_bp = Blueprint("print", __name__)
 
+# Máximo de despachos por impresión en lote
+BATCH_PRINT_MAX = 200
+
+# Salida nativa para impresoras térmicas: formato -> (extensión, mimetype)
+NATIVE_FORMATS = {
+    "zpl": ("zpl", "text/plain"),
+    "escpos": ("bin", "application/octet-stream"),
+}
+
+def _send_native(payload: bytes, fmt: str, name: str):
+    ext, mimetype = NATIVE_FORMATS[fmt]
+    inline = request.args.get("inline", "0") == "1"
+    return send_file(
+        BytesIO(payload),
+        as_attachment=not inline,
+        download_name=f"{name}.{ext}",
+        mimetype=mimetype,
+        max_age=0,
+    )
+
 def _barcode_payload(folio: int, orden: str, num_items: int, paquete_numero: int | None) -> str:
     """
     Payload corto y 100% escaneable por apps móviles (Code128).
@@ -29,61 +48,129 @@ def _barcode_payload(folio: int, orden: str, num_items: int, paquete_numero: int
     payload = "|".join(pieces)
     return _sanitize_barcode_text(payload, max_len=64)
 
-@print_bp.route("/print/<int:despacho_id>", methods=["GET"])
-@jwt_required()
-def print_despacho(despacho_id):
-    dispatch = Dispatch.query.get(despacho_id)
-    if not dispatch:
-        return jsonify({"error": "Despacho no encontrado"}), 404
+@print_bp.errorhandler(PrintServiceBusy)
+def _print_busy(e):
+    resp = jsonify({"error": "Hay muchas impresiones en curso, reintente en unos segundos"})
+    resp.headers["Retry-After"] = "5"
+    return resp, 503
 
-    client = Client.query.get(dispatch.cliente_id)
-    driver = Driver.query.get(dispatch.chofer_id)
-    creator = User.query.get(dispatch.created_by) if str(dispatch.created_by).isdigit() else None
+@print_bp.errorhandler(PrintServiceTimeout)
+def _print_timeout(e):
+    return jsonify({"error": "La impresión tardó demasiado, reintente"}), 504
 
-    productos = [f"{p.nombre} — {p.cantidad} {p.unidad}" for p in dispatch.productos]
+def _dispatch_print_data(view: dict) -> dict:
+    """Dict que reciben los generadores de PDF para un despacho (desde dispatch_view)."""
+    dispatch = view["dispatch"]
+    productos = [f"{p['nombre']} — {p['cantidad']} {p['unidad']}" for p in dispatch["productos"]]
 
-    # Campos nuevos (defensivo por si aún no hay migración en alguna instancia)
-    paquete_numero = getattr(dispatch, "paquete_numero", None)
-    factura_numero = getattr(dispatch, "factura_numero", None)
+    def name_or_id(name, fallback):
+        return name if name is not None else str(fallback)
 
     data = {
         "empresa": "Signo Representaciones Ltda.",
-        "fecha": to_local(dispatch.fecha).strftime("%Y-%m-%d %H:%M"),
-        "auxiliar": creator.name if creator else str(dispatch.created_by),
-        "chofer": driver.name if driver else str(dispatch.chofer_id),
-        "cliente": client.name if client else str(dispatch.cliente_id),
-        "orden": dispatch.orden,
+        # `fecha` ya viene en hora local (ISO)
+        "fecha": datetime.fromisoformat(dispatch["fecha"]).strftime("%Y-%m-%d %H:%M"),
+        "auxiliar": name_or_id(view["creador"], dispatch["created_by"]),
+        "chofer": name_or_id(view["chofer"], dispatch["chofer_id"]),
+        "cliente": name_or_id(view["cliente"], dispatch["cliente_id"]),
+        "orden": dispatch["orden"],
         "productos": productos,
-        "folio": dispatch.id,
+        "folio": dispatch["id"],
         # nuevos en layout
-        "paquete_numero": paquete_numero,
-        "factura_numero": factura_numero,
+        "paquete_numero": dispatch["paquete_numero"],
+        "factura_numero": dispatch["factura_numero"],
     }
 
     # Payload compacto (evita listas largas que vuelven ilegible el código)
     data["codigo_barras"] = _barcode_payload(
-        folio=dispatch.id,
-        orden=dispatch.orden,
+        folio=dispatch["id"],
+        orden=dispatch["orden"],
         num_items=len(productos),
-        paquete_numero=paquete_numero,
+        paquete_numero=dispatch["paquete_numero"],
     )
+    return data
+
+def load_dispatch_print_data(despacho_id: int) -> dict | None:
+    """Dict de impresión de un despacho (None si no existe)."""
+    view = get_dispatch_view(despacho_id)
+    return _dispatch_print_data(view) if view is not None else None
+
+@print_bp.route("/print/<int:despacho_id>", methods=["GET"])
+@jwt_required()
+def print_despacho(despacho_id):
+    data = load_dispatch_print_data(despacho_id)
+    if data is None:
+        return jsonify({"error": "Despacho no encontrado"}), 404
 
     # Soporte de formatos
     fmt = (request.args.get("format") or "").lower().strip()
-    size = request.args.get("size") or "4x6"
+    size = normalize_label_size(request.args.get("size"))
+
+    # Lenguaje de impresora: la térmica dibuja texto y código de barras
+    if fmt == "zpl":
+        return _send_native(generar_etiqueta_zpl(data, size=size), fmt, f"despacho_{despacho_id}")
+    if fmt == "escpos":
+        return _send_native(generar_ticket_escpos(data), fmt, f"despacho_{despacho_id}")
 
     if fmt == "pos80":
-        pdf_buffer = generar_ticket_pos80(data)
+        render = lambda: render_pdf("pos80", data)
     elif fmt == "label":
-        pdf_buffer = generar_etiqueta_despacho(data, size=size)
+        render = lambda: render_pdf("label", data, size=size)
     else:
-        pdf_buffer = generar_hoja_despacho(data)
+        fmt = "a4"
+        render = lambda: render_pdf("a4", data)
+
+    return send_cached_pdf(
+        "despacho", despacho_id, data, render,
+        download_name=f"despacho_{despacho_id}.pdf",
+        fmt=fmt,
+        size=size if fmt == "label" else "-",
+    )
+
+
+@print_bp.route("/print/batch", methods=["POST"])
+@jwt_required()
+def print_despachos_batch():
+    """
+    Varios despachos en un solo PDF, una página por despacho.
+    Body: {"ids": [..], "format": "label" | "pos80" | "a4" | "zpl" | "escpos", "size": "4x6"}
+    Los datos salen de dispatch_view en una consulta, sin importar cuántos ids.
+    """
+    body = request.get_json(silent=True) or {}
+    ids = body.get("ids")
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "Debe enviar 'ids' con al menos un despacho"}), 400
+    try:
+        ids = list(dict.fromkeys(int(i) for i in ids))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'ids' debe contener solo números"}), 400
+    if len(ids) > BATCH_PRINT_MAX:
+        return jsonify({"error": f"Máximo {BATCH_PRINT_MAX} despachos por impresión"}), 400
+
+    fmt = (body.get("format") or "").lower().strip()
+    if fmt not in ("pos80", "label", *NATIVE_FORMATS):
+        fmt = "a4"
+    size = normalize_label_size(body.get("size"))
+
+    views = get_dispatch_views(ids)
+    missing = [i for i in ids if i not in views]
+    if missing:
+        return jsonify({"error": "Despachos no encontrados", "ids": missing}), 404
+
+    docs = [_dispatch_print_data(views[i]) for i in ids]
+
+    if fmt == "zpl":
+        return _send_native(b"\n".join(generar_etiqueta_zpl(d, size=size) for d in docs), fmt, f"despachos_{len(ids)}")
+    if fmt == "escpos":
+        return _send_native(b"".join(generar_ticket_escpos(d) for d in docs), fmt, f"despachos_{len(ids)}")
+
+    pdf = render_pdf("lote", docs, fmt=fmt, size=size)
 
     inline = request.args.get("inline", "0") == "1"
     return send_file(
-        pdf_buffer,
+        BytesIO(pdf),
         as_attachment=not inline,
-        download_name=f"despacho_{dispatch.id}.pdf",
+        download_name=f"despachos_{fmt}_{len(ids)}.pdf",
         mimetype="application/pdf",
         max_age=0,
     )
@@ -112,16 +199,15 @@ def print_internal(id):
         # No incluir 'codigo_barras' para evitar intento de generación
     }
 
-    # Usa formato POS80 adaptado
-    pdf_buffer = generar_ticket_pos80(data)
+    if (request.args.get("format") or "").lower().strip() == "escpos":
+        return _send_native(generar_ticket_escpos(data), "escpos", f"consumo_interno_{consumption.id}")
 
-    inline = request.args.get("inline", "0") == "1"
-    return send_file(
-        pdf_buffer,
-        as_attachment=not inline,
+    # Usa formato POS80 adaptado
+    return send_cached_pdf(
+        "consumo_interno", consumption.id, data,
+        lambda: render_pdf("pos80", data),
         download_name=f"consumo_interno_{consumption.id}.pdf",
-        mimetype="application/pdf",
-        max_age=0,
+        fmt="pos80",
     )
 
 
@@ -150,13 +236,22 @@ def print_credit_note(credit_note_id):
         "folio": credit_note.id,
     }
 
-    pdf_buffer = generar_ticket_pos80(data)
+    if (request.args.get("format") or "").lower().strip() == "escpos":
+        return _send_native(generar_ticket_escpos(data), "escpos", f"nota_credito_{credit_note_id}")
 
-    inline = request.args.get("inline", "0") == "1"
-    return send_file(
-        pdf_buffer,
-        as_attachment=not inline,
+    return send_cached_pdf(
+        "nota_credito", credit_note.id, data,
+        lambda: render_pdf("pos80", data),
         download_name=f"nota_credito_{credit_note_id}.pdf",
-        mimetype="application/pdf",
-        max_age=0,
-    )
\ No newline at end of file
+        fmt="pos80",
+    )
+
+
+@print_bp.route("/print/stats", methods=["GET"])
+@jwt_required()
+def print_stats():
+    """Estado del servicio de impresión: cola, tiempos y rechazos (solo admin)."""
+    viewer = User.query.get(get_jwt_identity())
+    if not viewer or not viewer.is_admin:
+        return jsonify({"msg": "Solo administradores"}), 403
+    return jsonify(get_print_service().stats()), 200
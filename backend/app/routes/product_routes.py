@@ -1,10 +1,11 @@
 from flask import Blueprint, request, jsonify, current_app
-from app.models.product_model import Product
+from app.models.product_model import Product, product_search_key
 from app import db
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from jwt import decode
-from sqlalchemy import func
+from sqlalchemy import func, case, literal
 import unicodedata
+from app.utils.catalog_cache import catalog_etag
 
 def normalize_product_name(name: str) -> str:
     """Elimina acentos y espacios internos para comparar nombres de productos."""
@@ -66,6 +67,16 @@ def create_product():
 
         new_product = Product(name=name_norm, category=category, created_by=user, stock=stock)
         db.session.add(new_product)
+        db.session.flush()
+
+        # Si ya hubo movimientos con este nombre (producto borrado y recreado),
+        # se enlazan sus líneas y el contador parte desde ese histórico
+        from app.models.dispatch_model import DispatchProduct
+        from app.utils.product_lines import link_orphan_lines
+        link_orphan_lines(new_product)
+        new_product.usage = float(db.session.query(func.coalesce(func.sum(DispatchProduct.cantidad), 0.0)).filter(
+            DispatchProduct.product_id == new_product.id
+        ).scalar() or 0)
         db.session.commit()
         return jsonify(new_product.to_dict()), 201
     except Exception as e:
@@ -75,24 +86,13 @@ def create_product():
 
 @product_bp.route('/products', methods=['GET'])
 @jwt_required()
+@catalog_etag("products")
 def list_products():
     search = request.args.get('search', '').lower()
     products = Product.query.all()
 
-    # Calcular usage (suma de cantidades despachadas) por nombre lower
-    from app.models.dispatch_model import DispatchProduct
-    usages = db.session.query(
-        func.lower(DispatchProduct.nombre),
-        func.sum(DispatchProduct.cantidad)
-    ).group_by(func.lower(DispatchProduct.nombre)).all()
-
-    usage_dict = {lower_name: float(usage or 0) for lower_name, usage in usages}
-
-    result = []
-    for p in products:
-        dict_p = p.to_dict()
-        dict_p['usage'] = usage_dict.get(p.name.lower(), 0.0)
-        result.append(dict_p)
+    # usage viene precalculado en la columna Product.usage
+    result = [p.to_dict() for p in products]
 
     if search:
         search_norm = normalize_search(search)
@@ -101,15 +101,51 @@ def list_products():
     return jsonify(result), 200
 
 
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@product_bp.route('/products/search', methods=['GET'])
+@jwt_required()
+@catalog_etag("products")
+def search_products():
+    """
+    Autocompletado de productos: ?q=<texto>&limit=<n> (máx 50).
+    Busca sobre Product.search_name (sin acentos, minúsculas); todas las
+    palabras deben aparecer. Orden: empieza con el texto, alguna palabra
+    empieza con el texto, contiene; luego por uso (más despachado primero).
+    """
+    q = product_search_key(request.args.get('q', ''))
+    limit = min(max(request.args.get('limit', default=20, type=int) or 20, 1), 50)
+    if not q:
+        return jsonify([]), 200
+
+    col = Product.search_name
+    term = _like_escape(q)
+    filtros = [col.like(f"%{_like_escape(tok)}%", escape="\\") for tok in q.split()]
+    rank = case(
+        (col.like(f"{term}%", escape="\\"), literal(0)),
+        (col.like(f"% {term}%", escape="\\"), literal(1)),
+        else_=literal(2),
+    )
+    rows = (
+        db.session.query(Product.id, Product.name, Product.category, Product.stock, Product.usage)
+        .filter(*filtros)
+        .order_by(rank, Product.usage.desc(), Product.name)
+        .limit(limit)
+        .all()
+    )
+    return jsonify([
+        {"id": r.id, "name": r.name, "category": r.category, "stock": r.stock, "usage": float(r.usage or 0)}
+        for r in rows
+    ]), 200
+
+
 @product_bp.route('/products/<int:product_id>', methods=['PUT', 'PATCH'])
 @jwt_required()
 def update_product(product_id):
     try:
-        from app.models.dispatch_model import DispatchProduct
-        from app.models.receipt_model import ReceiptProduct
-        from app.models.production_model import ProductionProduct
-        from app.models.credit_note_model import CreditNoteProduct
-        from app.models.internal_consumption_model import InternalConsumptionProduct
+        from app.utils.product_lines import rename_product_lines
 
         data = request.get_json() or {}
         name = data.get("name")
@@ -141,27 +177,9 @@ def update_product(product_id):
             except Exception:
                 pass
 
-        # Propagar el nuevo nombre a todas las tablas relacionadas
-        if old_name.lower() != new_name.lower():
-            db.session.query(DispatchProduct).filter(
-                func.lower(DispatchProduct.nombre) == old_name.lower()
-            ).update({"nombre": new_name}, synchronize_session=False)
-
-            db.session.query(ReceiptProduct).filter(
-                func.lower(ReceiptProduct.nombre) == old_name.lower()
-            ).update({"nombre": new_name}, synchronize_session=False)
-
-            db.session.query(ProductionProduct).filter(
-                func.lower(ProductionProduct.nombre) == old_name.lower()
-            ).update({"nombre": new_name}, synchronize_session=False)
-
-            db.session.query(CreditNoteProduct).filter(
-                func.lower(CreditNoteProduct.nombre) == old_name.lower()
-            ).update({"nombre": new_name}, synchronize_session=False)
-
-            db.session.query(InternalConsumptionProduct).filter(
-                func.lower(InternalConsumptionProduct.nombre) == old_name.lower()
-            ).update({"nombre": new_name}, synchronize_session=False)
+        # Propagar el nuevo nombre (copia para mostrar) a las líneas del producto
+        if old_name != new_name:
+            rename_product_lines(product)
 
         db.session.commit()
         return jsonify(product.to_dict()), 200
@@ -206,6 +224,10 @@ def delete_product(product_id):
         if not product:
             return jsonify({"error": "Producto no encontrado"}), 404
 
+        # Las líneas conservan su nombre; se desenlazan (en SQLite la FK
+        # no aplica ON DELETE SET NULL)
+        from app.utils.product_lines import unlink_product_lines
+        unlink_product_lines(product)
         db.session.delete(product)
         db.session.commit()
         return jsonify({"message": "Producto eliminado"}), 200
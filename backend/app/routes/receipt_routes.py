@@ -3,7 +3,6 @@ from app import db
 from app.models.receipt_model import Receipt, ReceiptProduct
 from app.models.supplier_model import Supplier
 from app.models.user_model import User
-from app.models.product_model import Product
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from sqlalchemy import func
@@ -11,7 +10,9 @@ from app.utils.timezone import to_local, to_utc_naive, CL_TZ
 from sqlalchemy.exc import IntegrityError
 from flask_cors import CORS
 from collections import defaultdict
-from app.routes.product_routes import normalize_product_name, normalize_search, normalize_db_column
+from app.routes.product_routes import normalize_search, normalize_db_column
+from app.utils.product_lines import ProductCatalog, qty_by_product
+from app.utils.idempotency import idempotent
 
 receipt_bp = Blueprint("receipts", __name__)
 CORS(
@@ -22,6 +23,7 @@ CORS(
 
 @receipt_bp.route("/receipts", methods=["POST"])
 @jwt_required()
+@idempotent
 def create_receipt():
     try:
         data = request.get_json() or {}
@@ -56,32 +58,28 @@ def create_receipt():
 
         db.session.add(new_receipt)
 
+        catalog = ProductCatalog()
         for p in productos:
             if not all(k in p for k in ("nombre", "cantidad", "unidad")):
                 return jsonify({"error": "Faltan campos en productos (nombre, cantidad, unidad)"}), 400
 
             nombre = (p["nombre"] or "").strip()
-            nombre_key = normalize_product_name(nombre)
-            prod_row = next((p for p in Product.query.all() if normalize_product_name(p.name) == nombre_key), None)
-            if not prod_row:
-                db.session.add(Product(name=nombre, category="Otros", created_by=user_id, stock=0.0))
-                db.session.flush()
+            prod_row = catalog.resolve(nombre, user_id)
 
             db.session.add(
                 ReceiptProduct(
                     nombre=nombre,
+                    product_id=prod_row.id,
                     cantidad=p["cantidad"],
                     unidad=p["unidad"],
                     receipt=new_receipt,
                 )
             )
 
-            prod_row = Product.query.filter(func.lower(Product.name) == nombre.lower()).first()
-            if prod_row:
-                try:
-                    prod_row.stock = float(prod_row.stock or 0) + float(p["cantidad"] or 0)
-                except Exception:
-                    pass
+            try:
+                prod_row.stock = float(prod_row.stock or 0) + float(p["cantidad"] or 0)
+            except Exception:
+                pass
 
         db.session.commit()
         return jsonify(new_receipt.to_dict()), 201
@@ -186,13 +184,8 @@ def delete_receipt(receipt_id):
         receipt = Receipt.query.get_or_404(receipt_id)
         
         # Revertir el stock de los productos
-        for product in receipt.productos:
-            prod_row = Product.query.filter(func.lower(Product.name) == func.lower(product.nombre)).first()
-            if prod_row:
-                try:
-                    prod_row.stock = float(prod_row.stock or 0) - float(product.cantidad or 0)
-                except Exception:
-                    pass
+        for prod_row, cantidad in qty_by_product(receipt.productos, ProductCatalog()).items():
+            prod_row.stock = float(prod_row.stock or 0) - cantidad
 
         # Eliminar los productos de la recepción
         for product in receipt.productos:
@@ -244,40 +237,28 @@ def update_receipt(receipt_id):
         if "status" in data:
             receipt.status = data["status"]
 
-        # Calcular cantidades antiguas sumadas por nombre
-        old_qty_by_name = defaultdict(float)
-        for p in receipt.productos:
-            old_qty_by_name[p.nombre] += float(p.cantidad or 0)
+        # Calcular cantidades antiguas sumadas por producto
+        catalog = ProductCatalog()
+        old_qty = qty_by_product(receipt.productos, catalog)
 
         # Eliminar productos existentes
         for product in receipt.productos:
             db.session.delete(product)
 
         # Crear productos nuevos si no existen y preparar nuevas cantidades sumadas
-        new_qty_by_name = defaultdict(float)
+        new_qty = defaultdict(float)
         for p in data["productos"]:
             if not all(k in p for k in ("nombre", "cantidad", "unidad")):
                 db.session.rollback()
                 return jsonify({"error": "Faltan campos en productos (nombre, cantidad, unidad)"}), 400
-            nombre = (p["nombre"] or "").strip()
-            nombre_key = normalize_product_name(nombre)
-            prod_row = next((p for p in Product.query.all() if normalize_product_name(p.name) == nombre_key), None)
-            if not prod_row:
-                db.session.add(Product(name=nombre, category="Otros", created_by=user_id, stock=0.0))
-            new_qty_by_name[nombre] += float(p["cantidad"] or 0)
-
-        db.session.flush()  # Asegurar que nuevos productos estén en DB
-
-        # Ajustar stock para todos los nombres involucrados
-        all_names = set(old_qty_by_name.keys()) | set(new_qty_by_name.keys())
-        for nombre in all_names:
-            old_q = old_qty_by_name[nombre]
-            new_q = new_qty_by_name[nombre]
-            delta = new_q - old_q
+            prod_row = catalog.resolve((p["nombre"] or "").strip(), user_id)
+            new_qty[prod_row] += float(p["cantidad"] or 0)
+
+        # Ajustar stock para todos los productos involucrados
+        for prod_row in set(old_qty) | set(new_qty):
+            delta = new_qty[prod_row] - old_qty[prod_row]
             if delta != 0:
-                prod_row = Product.query.filter(func.lower(Product.name) == nombre.lower()).first()
-                if prod_row:
-                    prod_row.stock = float(prod_row.stock or 0) + delta
+                prod_row.stock = float(prod_row.stock or 0) + delta
 
         # Agregar nuevos productos al receipt
         for p in data["productos"]:
@@ -285,6 +266,7 @@ def update_receipt(receipt_id):
             db.session.add(
                 ReceiptProduct(
                     nombre=nombre,
+                    product_id=catalog.find(nombre).id,
                     cantidad=p["cantidad"],
                     unidad=p["unidad"],
                     receipt=receipt,
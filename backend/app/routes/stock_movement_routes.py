@@ -8,6 +8,7 @@ from app.models.internal_consumption_model import InternalConsumption, InternalC
 from app.models.supplier_model import Supplier
 from app.models.operator_model import Operator
 from app.models.user_model import User
+from app.models.product_model import Product, product_search_key
 from flask_jwt_extended import jwt_required
 from datetime import datetime, timedelta
 from sqlalchemy import func
@@ -23,7 +24,8 @@ CORS(stock_movement_bp, resources={r"/*": {"origins": "*"}}, supports_credential
 @jwt_required()
 def get_stock_movements():
     try:
-        product_name = normalize_search(request.args.get("product") or "")
+        product_raw = request.args.get("product") or ""
+        product_name = normalize_search(product_raw)
         client_name  = normalize_search(request.args.get("client") or "")
         date_from_str = (request.args.get("date_from") or "").strip()
         date_to_str = (request.args.get("date_to") or "").strip()
@@ -47,12 +49,25 @@ def get_stock_movements():
             except ValueError:
                 return jsonify({"error": "Formato de date_to inválido, use YYYY-MM-DD"}), 400
 
+        # Las líneas se filtran por product_id (índice); si el nombre no
+        # corresponde a un producto del catálogo (p. ej. ya borrado), se
+        # busca como antes por el nombre guardado en la línea.
+        product_ids = [
+            pid for (pid,) in db.session.query(Product.id)
+            .filter(Product.search_name == product_search_key(product_raw)).all()
+        ]
+
+        def line_filter(model):
+            if product_ids:
+                return model.product_id.in_(product_ids)
+            return normalize_db_column(model.nombre) == product_name
+
         movements = []
 
         # ── 1. DESPACHOS (salida) ──
         dispatch_q = db.session.query(DispatchProduct, Dispatch).join(
             Dispatch, DispatchProduct.dispatch_id == Dispatch.id
-        ).filter(normalize_db_column(DispatchProduct.nombre) == product_name)
+        ).filter(line_filter(DispatchProduct))
         if client_name:
             dispatch_q = dispatch_q.filter(normalize_db_column(Dispatch.client_name) == client_name)
         if date_from_utc:
@@ -78,7 +93,7 @@ def get_stock_movements():
         internal_q = db.session.query(InternalConsumptionProduct, InternalConsumption).join(
             InternalConsumption,
             InternalConsumptionProduct.internal_consumption_id == InternalConsumption.id
-        ).filter(normalize_db_column(InternalConsumptionProduct.nombre) == product_name)
+        ).filter(line_filter(InternalConsumptionProduct))
         if date_from_utc:
             internal_q = internal_q.filter(InternalConsumption.fecha >= date_from_utc)
         if date_to_utc:
@@ -104,7 +119,7 @@ def get_stock_movements():
         receipt_q = db.session.query(ReceiptProduct, Receipt, Supplier).join(
             Receipt, ReceiptProduct.receipt_id == Receipt.id
         ).join(Supplier, Receipt.supplier_id == Supplier.id).filter(
-            normalize_db_column(ReceiptProduct.nombre) == product_name
+            line_filter(ReceiptProduct)
         )
         if date_from_utc:
             receipt_q = receipt_q.filter(Receipt.fecha >= date_from_utc)
@@ -129,7 +144,7 @@ def get_stock_movements():
         production_q = db.session.query(ProductionProduct, Production, Operator).join(
             Production, ProductionProduct.production_id == Production.id
         ).join(Operator, Production.operator_id == Operator.id).filter(
-            normalize_db_column(ProductionProduct.nombre) == product_name
+            line_filter(ProductionProduct)
         )
         if date_from_utc:
             production_q = production_q.filter(Production.fecha >= date_from_utc)
@@ -152,7 +167,7 @@ def get_stock_movements():
         # ── 5. NOTA DE CRÉDITO (entrada) ──
         cn_q = db.session.query(CreditNoteProduct, CreditNote).join(
             CreditNote, CreditNoteProduct.credit_note_id == CreditNote.id
-        ).filter(normalize_db_column(CreditNoteProduct.nombre) == product_name)
+        ).filter(line_filter(CreditNoteProduct))
         if client_name:
             cn_q = cn_q.filter(normalize_db_column(CreditNote.client_name) == client_name)
         if date_from_utc:
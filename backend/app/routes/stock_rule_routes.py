@@ -0,0 +1,126 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app import db
+from app.models.user_model import User
+from app.models.stock_threshold_rule_model import StockThresholdRule, RULE_MATCH_TYPES
+from app.utils.stock_rules import get_low_stock_products
+
+stock_rule_bp = Blueprint("stock_rules", __name__)
+
+
+def _parse_rule(data, rule=None):
+    """
+    Valida el cuerpo de una regla y la crea/actualiza.
+    Devuelve (regla, error_response | None).
+    """
+    rule = rule or StockThresholdRule()
+
+    if "category" in data:
+        # Vacía o null = regla global
+        rule.category = (data.get("category") or "").strip() or None
+
+    match = (data.get("match", rule.match) or "any").strip().lower()
+    if match not in RULE_MATCH_TYPES:
+        return None, (jsonify({"error": f"'match' debe ser uno de: {', '.join(RULE_MATCH_TYPES)}"}), 400)
+    rule.match = match
+
+    pattern = data.get("pattern", rule.pattern)
+    pattern = " ".join((pattern or "").split()).lower() or None
+    if match != "any" and not pattern:
+        return None, (jsonify({"error": "El campo 'pattern' es requerido para este tipo de regla"}), 400)
+    rule.pattern = pattern if match != "any" else None
+
+    try:
+        threshold = float(data.get("threshold", rule.threshold))
+        priority = int(data.get("priority", rule.priority if rule.priority is not None else 100))
+    except (TypeError, ValueError):
+        return None, (jsonify({"error": "'threshold' y 'priority' deben ser numéricos"}), 400)
+    if threshold < 0:
+        return None, (jsonify({"error": "'threshold' no puede ser negativo"}), 400)
+    rule.threshold = threshold
+    rule.priority = priority
+    return rule, None
+
+
+def _require_admin():
+    viewer = User.query.get(get_jwt_identity())
+    if not viewer or not viewer.is_admin:
+        return jsonify({"msg": "Solo administradores"}), 403
+    return None
+
+
+@stock_rule_bp.route("/stock-threshold-rules", methods=["GET"])
+@jwt_required()
+def list_stock_rules():
+    rules = StockThresholdRule.query.order_by(
+        StockThresholdRule.category, StockThresholdRule.priority, StockThresholdRule.id
+    ).all()
+    return jsonify([r.to_dict() for r in rules]), 200
+
+
+@stock_rule_bp.route("/stock-threshold-rules", methods=["POST"])
+@jwt_required()
+def create_stock_rule():
+    denied = _require_admin()
+    if denied:
+        return denied
+    try:
+        rule, error = _parse_rule(request.get_json() or {})
+        if error:
+            return error
+        # Al hacer flush se recalcula reorder_point de todo el catálogo
+        db.session.add(rule)
+        db.session.commit()
+        return jsonify(rule.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Error creando regla", "details": str(e)}), 500
+
+
+@stock_rule_bp.route("/stock-threshold-rules/<int:rule_id>", methods=["PUT", "PATCH"])
+@jwt_required()
+def update_stock_rule(rule_id):
+    denied = _require_admin()
+    if denied:
+        return denied
+    try:
+        rule = StockThresholdRule.query.get(rule_id)
+        if not rule:
+            return jsonify({"error": "Regla no encontrada"}), 404
+        rule, error = _parse_rule(request.get_json() or {}, rule)
+        if error:
+            db.session.rollback()
+            return error
+        db.session.commit()
+        return jsonify(rule.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Error actualizando regla", "details": str(e)}), 500
+
+
+@stock_rule_bp.route("/stock-threshold-rules/<int:rule_id>", methods=["DELETE"])
+@jwt_required()
+def delete_stock_rule(rule_id):
+    denied = _require_admin()
+    if denied:
+        return denied
+    try:
+        rule = StockThresholdRule.query.get(rule_id)
+        if not rule:
+            return jsonify({"error": "Regla no encontrada"}), 404
+        db.session.delete(rule)
+        db.session.commit()
+        return jsonify({"message": "Regla eliminada"}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Error eliminando regla", "details": str(e)}), 500
+
+
+@stock_rule_bp.route("/products/low-stock", methods=["GET"])
+@jwt_required()
+def list_low_stock_products():
+    """Productos con stock <= reorder_point (una sola consulta indexada)."""
+    try:
+        return jsonify([p.to_dict() for p in get_low_stock_products()]), 200
+    except Exception as e:
+        return jsonify({"error": "Error obteniendo productos con stock bajo", "details": str(e)}), 500
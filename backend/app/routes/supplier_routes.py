@@ -4,11 +4,13 @@ from app.models.supplier_model import Supplier
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import func
+from app.utils.catalog_cache import catalog_etag
 
 supplier_bp = Blueprint('suppliers', __name__)
 
 @supplier_bp.route('/suppliers', methods=['GET'])
 @jwt_required()
+@catalog_etag("suppliers")
 def list_suppliers():
     suppliers = Supplier.query.all()
     return jsonify([supplier.to_dict() for supplier in suppliers]), 200
@@ -0,0 +1,126 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app import db
+from app.models.dispatch_model import Dispatch
+from app.models.user_model import User
+from app.utils.driver_performance import get_driver_for_user_email, LIMITED_USER_DRIVER_EMAIL_MAP
+from app.utils.dispatch_sync import (
+    changes_since,
+    snapshot,
+    parse_client_timestamp,
+    apply_offline_change,
+)
+from app.utils.dispatch_events import dispatch_event, publish_dispatch_events
+
+sync_bp = Blueprint("sync", __name__)
+
+MAX_SYNC_CHANGES = 500
+
+
+def _sync_scope():
+    """
+    Chofer al que se limita la sync. Un usuario mapeado en
+    LIMITED_USER_DRIVER_EMAIL_MAP solo ve sus despachos; el resto puede
+    pedir un chofer con ?chofer_id= o todos.
+    Devuelve (chofer_id | None, error_response | None).
+    """
+    user = User.query.get(get_jwt_identity())
+    if not user:
+        return None, (jsonify({"error": "Usuario no encontrado"}), 404)
+    if (user.email or "").strip().lower() in LIMITED_USER_DRIVER_EMAIL_MAP:
+        driver = get_driver_for_user_email(user.email)
+        if not driver:
+            return None, (jsonify({"error": "Este usuario no tiene un chofer asociado"}), 404)
+        return driver.id, None
+    return request.args.get("chofer_id", type=int), None
+
+
+@sync_bp.route("/sync/dispatches", methods=["GET"])
+@jwt_required()
+def sync_dispatches():
+    """
+    Delta de despachos para la app del chofer.
+    ?since=<version> (omitido = snapshot completo), ?limit= (máx 500).
+    Responde { version, full, has_more, upserts: [...], deletes: [ids] };
+    el cliente guarda `version` y la manda como `since` la próxima vez.
+    """
+    try:
+        chofer_id, error = _sync_scope()
+        if error:
+            return error
+        since = request.args.get("since", type=int)
+        limit = min(max(request.args.get("limit", default=MAX_SYNC_CHANGES, type=int) or 1, 1), MAX_SYNC_CHANGES)
+
+        if since is None or since < 0:
+            return jsonify(snapshot(chofer_id)), 200
+        return jsonify(changes_since(since, chofer_id, limit=limit)), 200
+    except Exception as e:
+        return jsonify({"error": "Error al sincronizar despachos", "details": str(e)}), 500
+
+
+@sync_bp.route("/sync/dispatches", methods=["POST"])
+@jwt_required()
+def sync_push_dispatches():
+    """
+    Marcas de entrega hechas sin conexión, en el orden en que se hicieron.
+    Body JSON: { "changes": [ { "id": 1, "status": "entregado_chofer" | "entregado_cliente",
+                                "at": "2026-10-19T15:04:00" } ] }
+
+    Resultado por cambio: applied | unchanged (el hito ya estaba) |
+    conflict (el despacho ya no es del chofer) | gone (fue eliminado) | invalid.
+    """
+    try:
+        chofer_id, error = _sync_scope()
+        if error:
+            return error
+        changes = (request.get_json() or {}).get("changes") or []
+        if not isinstance(changes, list) or not changes:
+            return jsonify({"error": "Se requiere una lista de cambios"}), 400
+        if len(changes) > MAX_SYNC_CHANGES:
+            return jsonify({"error": f"Máximo {MAX_SYNC_CHANGES} cambios por solicitud"}), 400
+
+        ids = set()
+        for ch in changes:
+            try:
+                ids.add(int((ch or {}).get("id")))
+            except (TypeError, ValueError):
+                pass
+        dispatches = {d.id: d for d in Dispatch.query.filter(Dispatch.id.in_(ids)).all()} if ids else {}
+
+        results = []
+        for ch in changes:
+            ch = ch or {}
+            target = (ch.get("status") or "").strip()
+            try:
+                did = int(ch.get("id"))
+            except (TypeError, ValueError):
+                results.append({"id": ch.get("id"), "result": "invalid", "error": "id inválido"})
+                continue
+            if target not in ("entregado_chofer", "entregado_cliente"):
+                results.append({"id": did, "result": "invalid", "error": "status inválido"})
+                continue
+            d = dispatches.get(did)
+            if d is None:
+                results.append({"id": did, "result": "gone"})
+                continue
+            if chofer_id is not None and d.chofer_id != chofer_id:
+                results.append({"id": did, "result": "conflict", "error": "El despacho fue reasignado a otro chofer"})
+                continue
+            results.append({"id": did, "result": apply_offline_change(d, target, parse_client_timestamp(ch.get("at")))})
+
+        db.session.commit()
+        publish_dispatch_events([
+            dispatch_event("marked", dispatches[r["id"]]) for r in results if r["result"] == "applied"
+        ])
+
+        for r in results:
+            d = dispatches.get(r["id"])
+            if d is not None and r["result"] in ("applied", "unchanged"):
+                r["status"] = "entregado_cliente" if d.delivered_client else "entregado_chofer" if d.delivered_driver else (d.status or "pendiente")
+                r["delivered_driver"] = d.delivered_driver
+                r["delivered_client"] = d.delivered_client
+
+        return jsonify({"results": results}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Error al aplicar cambios", "details": str(e)}), 500
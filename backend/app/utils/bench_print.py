@@ -0,0 +1,75 @@
+import statistics
+import time
+from app.utils.print_utils import (
+    generar_hoja_despacho,
+    generar_etiqueta_despacho,
+    generar_ticket_pos80,
+    _sanitize_barcode_text,
+)
+
+# Documentos de muestra con la forma de los dicts que arma print_routes.py
+_PRODUCTOS = [f"Bolsa de Basura Negra 80x110 Reforzada — {n} und" for n in range(10, 130, 10)]
+
+SAMPLE_DISPATCH = {
+    "empresa": "Signo Representaciones Ltda.",
+    "fecha": "2026-10-19 09:15",
+    "auxiliar": "Usuario Benchmark",
+    "chofer": "Chofer 000",
+    "cliente": "Cliente de Prueba con Nombre Largo S.A.",
+    "orden": "OC-884512",
+    "productos": _PRODUCTOS,
+    "folio": 12345,
+    "paquete_numero": "3",
+    "factura_numero": "F-99812",
+    "codigo_barras": _sanitize_barcode_text(f"DESP-12345|OC:OC-884512|N:{len(_PRODUCTOS)}|P:3"),
+}
+
+SAMPLE_CREDIT_NOTE = {
+    "empresa": "Signo Representaciones Ltda.",
+    "fecha": "2026-10-19 09:15",
+    "auxiliar": "Usuario Benchmark",
+    "cliente": "Cliente de Prueba con Nombre Largo S.A.",
+    "orden": "OC-884512",
+    "factura_numero": "F-99812",
+    "credit_note_number": "NC-1201",
+    "motivo": "Producto dañado en el transporte",
+    "productos": _PRODUCTOS[:4],
+    "folio": 1201,
+}
+
+# (nombre, función que genera el PDF con el backend de código de barras dado)
+PRINT_SCENARIOS = [
+    ("despacho.a4", lambda b: generar_hoja_despacho(SAMPLE_DISPATCH, barcode_backend=b)),
+    ("despacho.label", lambda b: generar_etiqueta_despacho(SAMPLE_DISPATCH, size="4x6", barcode_backend=b)),
+    ("despacho.pos80", lambda b: generar_ticket_pos80(SAMPLE_DISPATCH, barcode_backend=b)),
+    ("nota_credito.pos80", lambda b: generar_ticket_pos80(SAMPLE_CREDIT_NOTE, barcode_backend=b)),
+]
+
+
+def run_print_benchmark(iterations=50, warmup=3, backends=("vector", "raster"), only=(), log=print):
+    """
+    Tiempo de render (p50/p95, ms) y tamaño del PDF por documento, para
+    cada formato y backend de código de barras. No toca la BD.
+    """
+    results = {}
+    for name, render in PRINT_SCENARIOS:
+        if only and not any(o in name for o in only):
+            continue
+        for backend in backends:
+            for _ in range(warmup):
+                render(backend)
+            tiempos, size = [], 0
+            for _ in range(iterations):
+                t0 = time.perf_counter()
+                size = len(render(backend).getvalue())
+                tiempos.append((time.perf_counter() - t0) * 1000)
+            tiempos.sort()
+            key = f"{name}[{backend}]"
+            results[key] = {
+                "p50_ms": round(statistics.median(tiempos), 2),
+                "p95_ms": round(tiempos[max(0, int(len(tiempos) * 0.95) - 1)], 2),
+                "bytes": size,
+            }
+            r = results[key]
+            log(f"{key:34s} p50={r['p50_ms']:8.2f}ms  p95={r['p95_ms']:8.2f}ms  pdf={r['bytes']:8d} B")
+    return results
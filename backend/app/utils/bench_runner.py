@@ -0,0 +1,239 @@
+import json
+import math
+import smtplib
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import cloudinary.uploader
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import db
+from app.models.dispatch_model import Dispatch, DispatchProduct
+from app.models.client_model import Client
+from app.models.driver_model import Driver
+from app.models.user_model import User
+from app.utils.bench_seed import ensure_bench_user
+
+DEFAULT_BASELINE_PATH = Path(__file__).resolve().parent.parent.parent / "bench" / "baseline.json"
+
+
+# ---------- Servicios externos simulados ----------
+
+class _FakeSMTP:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def starttls(self, *args, **kwargs):
+        pass
+
+    def login(self, *args, **kwargs):
+        pass
+
+    def sendmail(self, *args, **kwargs):
+        return {}
+
+    def quit(self):
+        pass
+
+
+@contextmanager
+def stub_external_services(app):
+    """
+    Reemplaza Cloudinary y SMTP por dobles locales mientras dura el bloque,
+    para que el benchmark mida solo el trabajo de la app (sin red).
+    """
+    originals = (
+        cloudinary.uploader.upload,
+        cloudinary.uploader.destroy,
+        smtplib.SMTP,
+        smtplib.SMTP_SSL,
+        app.config.get("MAIL_SUPPRESS_SEND"),
+    )
+    cloudinary.uploader.upload = lambda *a, **k: {
+        "secure_url": "https://res.cloudinary.com/bench/image/upload/v1/dispatches/bench.jpg"
+    }
+    cloudinary.uploader.destroy = lambda *a, **k: {"result": "ok"}
+    smtplib.SMTP = _FakeSMTP
+    smtplib.SMTP_SSL = _FakeSMTP
+    app.config["MAIL_SUPPRESS_SEND"] = True
+    try:
+        yield
+    finally:
+        (
+            cloudinary.uploader.upload,
+            cloudinary.uploader.destroy,
+            smtplib.SMTP,
+            smtplib.SMTP_SSL,
+            app.config["MAIL_SUPPRESS_SEND"],
+        ) = originals
+
+
+# ---------- Conteo de queries ----------
+
+class QueryCounter:
+    """Cuenta las sentencias SQL que llegan al engine dentro del bloque."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+        return False
+
+
+def percentile(values, pct: float) -> float:
+    """Percentil por rango más cercano (suficiente para p50/p95)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[k]
+
+
+# ---------- Escenarios ----------
+
+def _scenarios():
+    """
+    Endpoints calientes a medir. Cada escenario es (nombre, método, ruta,
+    kwargs para el test client); los valores dependen de los datos
+    sembrados, así que se resuelven contra la BD actual.
+    """
+    sample = Dispatch.query.order_by(Dispatch.id.desc()).first()
+    if not sample:
+        raise RuntimeError("No hay despachos en la base de datos. Ejecute primero `flask bench seed`.")
+
+    producto = (
+        db.session.query(DispatchProduct.nombre)
+        .filter(DispatchProduct.dispatch_id == sample.id)
+        .first()
+    )
+    cliente = Client.query.get(sample.cliente_id)
+    chofer = Driver.query.get(sample.chofer_id) or Driver.query.first()
+    # Valores planos: el commit del POST expira las instancias de la sesión
+    base = {
+        "orden": sample.orden,
+        "cliente": cliente.name if cliente else sample.client_name,
+        "chofer": chofer.id,
+        "force": True,
+        "productos": [{"nombre": producto[0], "cantidad": 1, "unidad": "und"}] if producto else [],
+    }
+    sample_id = sample.id
+
+    def _nuevo_despacho():
+        payload = dict(base)
+        return {"data": {"data": json.dumps(payload)}, "content_type": "multipart/form-data"}
+
+    return [
+        ("GET /dispatches", "get", "/api/dispatches?page=1&limit=10", dict),
+        ("GET /dispatches?pending=1", "get", "/api/dispatches?page=1&limit=10&pending=1", dict),
+        ("POST /dispatches", "post", "/api/dispatches", _nuevo_despacho),
+        ("GET /stock-movements", "get", f"/api/stock-movements?product={producto[0] if producto else ''}", dict),
+        ("GET /operators/performance", "get", "/api/operators/performance", dict),
+        ("GET /products", "get", "/api/products", dict),
+        ("GET /print/<id>", "get", f"/api/print/{sample_id}?format=label", dict),
+    ]
+
+
+def run_benchmark(app, iterations: int = 20, warmup: int = 2, only=None, log=print, read_only=False):
+    """
+    Ejecuta cada escenario `iterations` veces con el test client de Flask y
+    devuelve, por escenario, p50/p95 de latencia (ms) y la mediana de
+    queries SQL por request.
+
+    Los escenarios que escriben (despachos reales, stock) solo corren en una
+    BD sembrada con `flask bench seed`. Con read_only se omiten y el JWT se
+    firma en memoria para el primer admin existente, sin crear ni tocar
+    usuarios.
+    """
+    results = {}
+    with app.app_context(), stub_external_services(app):
+        if read_only:
+            user = User.query.filter_by(is_admin=True).order_by(User.id).first()
+            if user is None:
+                raise RuntimeError("No hay un usuario admin con el que firmar el JWT del benchmark.")
+        else:
+            user = ensure_bench_user()
+        token = create_access_token(identity=str(user.id))
+        headers = {"Authorization": f"Bearer {token}"}
+        engine = db.engine
+        client = app.test_client()
+
+        for name, method, path, make_kwargs in _scenarios():
+            if only and not any(o.lower() in name.lower() for o in only):
+                continue
+            if read_only and method != "get":
+                log(f"{name:<32} omitido (escribe; solo en una BD de `flask bench seed`)")
+                continue
+            call = getattr(client, method)
+            timings, queries, statuses = [], [], set()
+            for i in range(warmup + iterations):
+                with QueryCounter(engine) as qc:
+                    t0 = time.perf_counter()
+                    resp = call(path, headers=headers, **make_kwargs())
+                    elapsed = (time.perf_counter() - t0) * 1000.0
+                resp.close()
+                statuses.add(resp.status_code)
+                if i >= warmup:
+                    timings.append(elapsed)
+                    queries.append(qc.count)
+                db.session.remove()
+
+            results[name] = {
+                "p50_ms": round(percentile(timings, 50), 2),
+                "p95_ms": round(percentile(timings, 95), 2),
+                "queries": int(percentile(queries, 50)),
+                "status": sorted(statuses),
+            }
+            log(f"{name:<32} p50={results[name]['p50_ms']:>9.2f}ms  p95={results[name]['p95_ms']:>9.2f}ms  "
+                f"queries={results[name]['queries']:>5}  status={results[name]['status']}")
+    return results
+
+
+# ---------- Línea base ----------
+
+def load_baseline(path: Path):
+    path = Path(path)
+    if not path.exists():
+        return None
+    with path.open(encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def save_baseline(path: Path, results: dict, iterations: int, dialect: str):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as fh:
+        json.dump({
+            "generated_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "dialect": dialect,
+            "iterations": iterations,
+            "results": results,
+        }, fh, indent=2, ensure_ascii=False, sort_keys=True)
+
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float = 0.25):
+    """
+    Lista de regresiones respecto a la línea base: p95 más de `tolerance`
+    por sobre el valor guardado, o más queries por request que antes.
+    """
+    regresiones = []
+    base_results = (baseline or {}).get("results", {})
+    for name, cur in results.items():
+        base = base_results.get(name)
+        if not base:
+            continue
+        if base.get("p95_ms") and cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regresiones.append(f"{name}: p95 {base['p95_ms']}ms -> {cur['p95_ms']}ms")
+        if cur["queries"] > base.get("queries", cur["queries"]):
+            regresiones.append(f"{name}: queries {base['queries']} -> {cur['queries']}")
+    return regresiones
@@ -0,0 +1,229 @@
+import random
+from datetime import datetime, timedelta
+from app import db
+from app.models.user_model import User
+from app.models.client_model import Client
+from app.models.driver_model import Driver
+from app.models.product_model import Product
+from app.models.operator_model import Operator
+from app.models.operator_activity_model import OperatorActivity
+from app.models.supplier_model import Supplier
+from app.models.dispatch_model import Dispatch, DispatchProduct
+from app.models.production_model import Production, ProductionProduct
+from app.models.receipt_model import Receipt, ReceiptProduct
+from app.models.credit_note_model import CreditNote, CreditNoteProduct
+from app.models.internal_consumption_model import InternalConsumption, InternalConsumptionProduct
+from app.utils.stock_rules import seed_default_rules
+
+# Usuario con el que se generan los datos sintéticos y con el que el
+# benchmark firma sus JWT. No está en ninguna lista de acceso limitado.
+# Su existencia marca la BD como "de benchmark" (ver `flask bench run`).
+BENCH_USER_EMAIL = "bench@signo.local"
+BENCH_USER_NAME = "Usuario Benchmark"
+# No es un hash de werkzeug: check_password siempre da False, así que
+# nadie puede iniciar sesión con el usuario de benchmark
+UNUSABLE_PASSWORD_HASH = "!"
+
+# Categorías reales (las mismas de los umbrales de stock bajo) para que el
+# dataset ejercite también las reglas de notificaciones.
+_CATEGORIAS = [
+    "Bolsas de Basura Negras",
+    "Bolsas Virgen Transparente",
+    "Bolsas de Polipropileno",
+    "Guantes",
+    "Utensilios y platos",
+    "Vasos plásticos",
+    "Film",
+    "Servilletas",
+    "Otros",
+]
+_BASES_PRODUCTO = [
+    "Bolsa Negra", "Bolsa Transparente", "Bolsa PP", "Guante Nitrilo Azul",
+    "Cuchara Plástica", "Vaso Plástico", "Film Alusa", "Servilleta Cóctel",
+    "Bandeja Aluminio", "Pocillo Degustación",
+]
+_MEDIDAS = ["50x70", "70x90", "80x110", "20x30", "35x45", "S", "M", "L", "XL", "200cc", "300cc"]
+_SUFIJOS = ["kg", "und", "pqt"]
+_AREAS = ["Bodega", "Producción", "Administración", "Aseo"]
+
+
+def _fecha_aleatoria(rng: random.Random, desde: datetime, hasta: datetime) -> datetime:
+    span = (hasta - desde).total_seconds()
+    return desde + timedelta(seconds=rng.random() * span)
+
+
+def _lineas(rng: random.Random, productos, min_n=1, max_n=5):
+    elegidos = rng.sample(productos, k=min(len(productos), rng.randint(min_n, max_n)))
+    return [(p, round(rng.uniform(1, 50), 2), p.name.rsplit(" ", 1)[-1]) for p in elegidos]
+
+
+def get_bench_user():
+    return User.query.filter_by(email=BENCH_USER_EMAIL).first()
+
+
+def ensure_bench_user():
+    """Usuario de benchmark, sin contraseña utilizable (el JWT se firma en memoria)."""
+    user = get_bench_user()
+    if not user:
+        user = User(
+            name=BENCH_USER_NAME, email=BENCH_USER_EMAIL, is_admin=True, can_edit_stock=True,
+            password_hash=UNUSABLE_PASSWORD_HASH,
+        )
+        db.session.add(user)
+        db.session.commit()
+    elif user.password_hash != UNUSABLE_PASSWORD_HASH:
+        # Sembrado por una versión anterior con contraseña fija
+        user.password_hash = UNUSABLE_PASSWORD_HASH
+        db.session.commit()
+    return user
+
+
+def seed_dataset(
+    clients: int = 200,
+    drivers: int = 20,
+    products: int = 1000,
+    operators: int = 15,
+    suppliers: int = 30,
+    months: int = 6,
+    dispatches_per_day: int = 40,
+    seed: int = 42,
+    log=print,
+):
+    """
+    Genera un dataset sintético reproducible (misma semilla -> mismos datos)
+    con catálogos y `months` meses de movimientos hacia atrás desde hoy:
+    despachos, producciones (con actividades de operario), recepciones,
+    notas de crédito y consumos internos. El stock final de cada producto
+    se calcula a partir de los movimientos generados.
+    """
+    rng = random.Random(seed)
+    user = ensure_bench_user()
+    uid = str(user.id)
+
+    # ── Catálogos ──
+    # Reglas de umbral antes que los productos: reorder_point se calcula al insertar
+    seed_default_rules()
+    client_rows = [Client(name=f"Centro de Costo {i:05d}", created_by=uid) for i in range(clients)]
+    driver_rows = [Driver(name=f"Chofer {i:03d}", created_by=uid) for i in range(drivers)]
+    # Un chofer de entrega automática para cubrir esa rama de create_dispatch
+    driver_rows.append(Driver(name="Retira Cliente Bench", created_by=uid))
+    operator_rows = [Operator(name=f"Operario {i:03d}", created_by=uid) for i in range(operators)]
+    supplier_rows = [Supplier(name=f"Proveedor {i:03d}", created_by=uid) for i in range(suppliers)]
+    product_rows = []
+    for i in range(products):
+        base = rng.choice(_BASES_PRODUCTO)
+        nombre = f"{base} {rng.choice(_MEDIDAS)} {i:05d} {rng.choice(_SUFIJOS)}"
+        product_rows.append(Product(name=nombre, category=rng.choice(_CATEGORIAS), created_by=uid, stock=0.0))
+
+    db.session.add_all(client_rows + driver_rows + operator_rows + supplier_rows + product_rows)
+    db.session.commit()
+    log(f"Catálogos: {clients} clientes, {len(driver_rows)} choferes, {products} productos, "
+        f"{operators} operarios, {suppliers} proveedores")
+
+    stock = {p.name: 0.0 for p in product_rows}
+    usage = {p.name: 0.0 for p in product_rows}
+    hasta = datetime.utcnow()
+    desde = hasta - timedelta(days=30 * months)
+    dias = max(1, (hasta - desde).days)
+
+    # ── Movimientos, día por día (commit por día para acotar memoria) ──
+    n_disp = n_prod = n_rec = n_cn = n_ic = 0
+    for offset in range(dias):
+        dia_ini = desde + timedelta(days=offset)
+        dia_fin = dia_ini + timedelta(days=1)
+
+        for _ in range(dispatches_per_day):
+            cliente = rng.choice(client_rows)
+            chofer = rng.choice(driver_rows)
+            fecha = _fecha_aleatoria(rng, dia_ini, dia_fin)
+            entregado = fecha < hasta - timedelta(days=rng.randint(1, 14))
+            d = Dispatch(
+                orden=str(rng.randint(10000, 999999)),
+                chofer_id=chofer.id,
+                chofer_name=chofer.name,
+                cliente_id=cliente.id,
+                client_name=cliente.name,
+                fecha=fecha,
+                created_by=uid,
+                factura_numero=str(rng.randint(1000, 99999)) if rng.random() < 0.7 else None,
+                paquete_numero=str(rng.randint(1, 9)) if rng.random() < 0.3 else None,
+                delivered_driver=entregado,
+                delivered_client=entregado,
+                delivered_driver_at=fecha + timedelta(hours=4) if entregado else None,
+                delivered_client_at=fecha + timedelta(hours=8) if entregado else None,
+                status="entregado_cliente" if entregado else "pendiente",
+            )
+            for prod_row, cantidad, unidad in _lineas(rng, product_rows):
+                d.productos.append(DispatchProduct(nombre=prod_row.name, product_id=prod_row.id, cantidad=cantidad, unidad=unidad))
+                stock[prod_row.name] -= cantidad
+                usage[prod_row.name] += cantidad
+            db.session.add(d)
+            n_disp += 1
+
+        if dia_ini.weekday() < 5:
+            for op in operator_rows:
+                fecha = _fecha_aleatoria(rng, dia_ini, dia_fin)
+                prod = Production(operator_id=op.id, operator_name=op.name, created_by=uid, fecha=fecha)
+                for prod_row, cantidad, unidad in _lineas(rng, product_rows, 1, 3):
+                    prod.productos.append(ProductionProduct(nombre=prod_row.name, product_id=prod_row.id, cantidad=cantidad * 10, unidad=unidad))
+                    stock[prod_row.name] += cantidad * 10
+                db.session.add(prod)
+                n_prod += 1
+                if rng.random() < 0.2:
+                    db.session.add(OperatorActivity(
+                        operator_id=op.id, fecha=fecha.date(), horas=round(rng.uniform(0.5, 3), 1),
+                        nota="Limpieza de máquina", created_by=uid,
+                    ))
+
+        for _ in range(rng.randint(0, 3)):
+            sup = rng.choice(supplier_rows)
+            r = Receipt(
+                orden=str(rng.randint(10000, 999999)), supplier_id=sup.id, supplier_name=sup.name,
+                created_by=uid, fecha=_fecha_aleatoria(rng, dia_ini, dia_fin),
+            )
+            for prod_row, cantidad, unidad in _lineas(rng, product_rows, 2, 8):
+                r.productos.append(ReceiptProduct(nombre=prod_row.name, product_id=prod_row.id, cantidad=cantidad * 20, unidad=unidad))
+                stock[prod_row.name] += cantidad * 20
+            db.session.add(r)
+            n_rec += 1
+
+        if rng.random() < 0.3:
+            cliente = rng.choice(client_rows)
+            cn = CreditNote(
+                client_id=cliente.id, client_name=cliente.name,
+                order_number=str(rng.randint(10000, 999999)),
+                invoice_number=str(rng.randint(1000, 99999)),
+                credit_note_number=str(rng.randint(100, 9999)),
+                reason="Producto defectuoso", created_by=uid,
+                fecha=_fecha_aleatoria(rng, dia_ini, dia_fin),
+            )
+            for prod_row, cantidad, unidad in _lineas(rng, product_rows, 1, 2):
+                cn.productos.append(CreditNoteProduct(nombre=prod_row.name, product_id=prod_row.id, cantidad=cantidad, unidad=unidad))
+                stock[prod_row.name] += cantidad
+            db.session.add(cn)
+            n_cn += 1
+
+        if rng.random() < 0.5:
+            ic = InternalConsumption(
+                nombre_retira=f"Trabajador {rng.randint(1, 40)}", area=rng.choice(_AREAS),
+                motivo="Uso interno", created_by=uid, fecha=_fecha_aleatoria(rng, dia_ini, dia_fin),
+            )
+            for prod_row, cantidad, unidad in _lineas(rng, product_rows, 1, 3):
+                ic.productos.append(InternalConsumptionProduct(nombre=prod_row.name, product_id=prod_row.id, cantidad=cantidad, unidad=unidad))
+                stock[prod_row.name] -= cantidad
+            db.session.add(ic)
+            n_ic += 1
+
+        db.session.commit()
+
+    for p in product_rows:
+        p.stock = round(stock[p.name], 2)
+        p.usage = round(usage[p.name], 2)
+    db.session.commit()
+
+    log(f"Movimientos ({dias} días): {n_disp} despachos, {n_prod} producciones, {n_rec} recepciones, "
+        f"{n_cn} notas de crédito, {n_ic} consumos internos")
+    return {
+        "dispatches": n_disp, "productions": n_prod, "receipts": n_rec,
+        "credit_notes": n_cn, "internal_consumptions": n_ic,
+    }
@@ -0,0 +1,132 @@
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from sqlalchemy import event, update, insert, select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.catalog_version_model import CatalogVersion
+from app.models.product_model import Product
+from app.models.client_model import Client
+from app.models.driver_model import Driver
+from app.models.operator_model import Operator
+from app.models.supplier_model import Supplier
+from app.models.dispatch_model import DispatchProduct
+from app.models.stock_threshold_rule_model import StockThresholdRule
+
+# Modelo -> catálogo cuyo listado cambia cuando se escribe ese modelo.
+# DispatchProduct mueve el `usage` y las reglas de umbral el `reorder_point`
+# que devuelve GET /products.
+CATALOG_ENTITIES = {
+    Product: "products",
+    DispatchProduct: "products",
+    StockThresholdRule: "products",
+    Client: "clients",
+    Driver: "drivers",
+    Operator: "operators",
+    Supplier: "suppliers",
+}
+
+
+def bump_catalog_versions(entities, connection=None):
+    """
+    Incrementa la versión de los catálogos dados con un solo UPDATE atómico
+    (las filas las crea la migración o seed_catalog_versions).
+
+    Las escrituras del ORM ya la llaman al confirmar (hook de sesión). Los
+    writers masivos que no pasan por el flush (query.update / delete con
+    synchronize_session=False, Core) deben llamarla ellos mismos en la
+    misma transacción, o los GET de catálogo siguen respondiendo 304.
+    """
+    entities = sorted(set(entities or []))
+    if not entities:
+        return
+    conn = connection if connection is not None else db.session.connection()
+    table = CatalogVersion.__table__
+    conn.execute(
+        update(table)
+        .where(table.c.entity.in_(entities))
+        .values(version=table.c.version + 1)
+    )
+
+
+def seed_catalog_versions():
+    """Crea las filas que falten (BD creada con create_all, sin migraciones)."""
+    table = CatalogVersion.__table__
+    existentes = set(db.session.execute(select(table.c.entity)).scalars())
+    faltantes = sorted(set(CATALOG_ENTITIES.values()) - existentes)
+    if not faltantes:
+        return
+    try:
+        db.session.execute(insert(table), [{"entity": e, "version": 1} for e in faltantes])
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()  # otro worker las creó al mismo tiempo
+
+
+def _after_flush(session, flush_context):
+    entities = session.info.setdefault("catalog_entities", set())
+    for obj in list(session.new) + list(session.deleted):
+        entity = CATALOG_ENTITIES.get(type(obj))
+        if entity:
+            entities.add(entity)
+    for obj in session.dirty:
+        entity = CATALOG_ENTITIES.get(type(obj))
+        if entity and entity not in entities and session.is_modified(obj):
+            entities.add(entity)
+    if not entities:
+        session.info.pop("catalog_entities", None)
+
+
+def _before_commit(session):
+    # Un solo incremento por catálogo y transacción, lo más tarde posible:
+    # el lock de la fila de catalog_version dura solo hasta el commit
+    session.flush()
+    entities = session.info.pop("catalog_entities", None)
+    if entities:
+        bump_catalog_versions(entities, connection=session.connection())
+
+
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop("catalog_entities", None)
+
+
+def register_catalog_versioning():
+    """Engancha el contador de versiones a la sesión (una sola vez)."""
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("before_commit", _before_commit),
+        ("after_soft_rollback", _after_soft_rollback),
+    ):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
+
+
+def catalog_version(entity: str) -> int:
+    return db.session.query(CatalogVersion.version).filter(CatalogVersion.entity == entity).scalar() or 0
+
+
+def catalog_etag(entity: str):
+    """
+    Decorador para GET de catálogo: ETag fuerte a partir de la versión del
+    catálogo (+ query string). Si coincide con If-None-Match responde 304
+    sin ejecutar la vista; si no, ejecuta la vista y agrega el ETag.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            qs = request.query_string or b""
+            sufijo = hashlib.sha1(qs).hexdigest()[:8] if qs else "all"
+            etag = f"{entity}-{catalog_version(entity)}-{sufijo}"
+
+            if request.if_none_match.contains(etag):
+                resp = make_response("", 304)
+            else:
+                resp = make_response(fn(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag)
+            # El navegador guarda la respuesta pero revalida siempre
+            resp.headers["Cache-Control"] = "private, no-cache"
+            return resp
+        return wrapper
+    return decorator
@@ -0,0 +1,267 @@
+import itertools
+import json
+import queue
+import select
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import text
+from app import db
+from app.utils.timezone import to_local
+
+DISPATCH_EVENTS_CHANNEL = "dispatch_events"
+# Secuencia de PostgreSQL que numera los eventos (migración c7f1a9e3b285)
+DISPATCH_EVENTS_SEQUENCE = "dispatch_event_seq"
+# Advisory lock que ordena nextval + pg_notify entre procesos
+DISPATCH_EVENTS_LOCK_KEY = 730300
+
+# Eventos recientes guardados para long-poll / reconexión SSE (por proceso)
+EVENT_HISTORY_SIZE = 1000
+# Cola por suscriptor SSE; si el cliente no consume, se descartan eventos
+SUBSCRIBER_QUEUE_SIZE = 500
+
+
+# ---------- Backends ----------
+
+class MemoryEventBackend:
+    """
+    Stand-in en memoria: entrega directo al broker del mismo proceso y
+    numera con un contador propio. Para tests, SQLite y servidores de un
+    solo proceso.
+    """
+
+    def __init__(self):
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, deliver, reset=None):
+        self._deliver = deliver
+
+    def send(self, events):
+        with self._lock:
+            for e in events:
+                self._deliver(json.dumps({**e, "seq": next(self._seq)}, ensure_ascii=False))
+
+
+class PostgresEventBackend:
+    """
+    Reparte los eventos entre procesos (workers de gunicorn) con
+    LISTEN/NOTIFY: `send` hace pg_notify y un hilo por proceso escucha el
+    canal y entrega al broker local, incluido el proceso que publicó.
+
+    El `seq` de cada evento sale de una secuencia de la BD y viaja en el
+    payload, así que es el mismo en todos los workers. nextval y pg_notify
+    van bajo un advisory lock hasta el commit: los NOTIFY llegan en orden
+    de seq.
+    """
+
+    def __init__(self, engine, channel=DISPATCH_EVENTS_CHANNEL, logger=None):
+        self.engine = engine
+        self.channel = channel
+        self.logger = logger
+        self._deliver = None
+        self._reset = None
+        self._thread = None
+
+    def start(self, deliver, reset=None):
+        self._deliver = deliver
+        self._reset = reset
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen_forever, name="dispatch-events-listen", daemon=True)
+            self._thread.start()
+
+    def send(self, events):
+        if not events:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": DISPATCH_EVENTS_LOCK_KEY})
+            for e in events:
+                seq = conn.execute(text(f"SELECT nextval('{DISPATCH_EVENTS_SEQUENCE}')")).scalar()
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"), {
+                    "channel": self.channel,
+                    "payload": json.dumps({**e, "seq": seq}, ensure_ascii=False),
+                })
+
+    def _listen_forever(self):
+        espera = 1
+        conectado_antes = False
+        while True:
+            raw = None
+            try:
+                # Conexión dedicada, fuera del pool (queda tomada indefinidamente)
+                raw = self.engine.raw_connection()
+                raw.detach()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN "{self.channel}"')
+                # Lo publicado mientras no se escuchaba se perdió: el historial
+                # queda con un hueco y los clientes deben recargar
+                if conectado_antes and self._reset:
+                    self._reset()
+                conectado_antes = True
+                espera = 1
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._deliver(conn.notifies.pop(0).payload)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"[DISPATCH EVENTS] LISTEN caído, reintentando en {espera}s: {e}")
+                # Fuera del pool nadie más la cierra: sin esto cada reconexión
+                # deja un socket y un backend de PostgreSQL abiertos
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+                time.sleep(espera)
+                espera = min(espera * 2, 60)
+
+
+# ---------- Broker ----------
+
+class DispatchEventBroker:
+    """
+    Reparte eventos de despachos a los suscriptores SSE del proceso y
+    guarda un historial corto para long-poll. Cada evento trae el `seq`
+    global que le asignó el backend; el cliente lo usa (Last-Event-ID /
+    ?after=) para pedir lo siguiente en cualquier worker.
+    """
+
+    def __init__(self, backend, history_size=EVENT_HISTORY_SIZE):
+        self.backend = backend
+        self._cond = threading.Condition()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._started = False
+
+    def _ensure_started(self):
+        if not self._started:
+            with self._cond:
+                if not self._started:
+                    self.backend.start(self._deliver, self._reset)
+                    self._started = True
+
+    def publish(self, events):
+        self._ensure_started()
+        self.backend.send(list(events))
+
+    def _reset(self):
+        # Historial vacío: todo seq pendiente pide recargar (ver events_after)
+        with self._cond:
+            self._history.clear()
+
+    def _deliver(self, payload):
+        try:
+            event = json.loads(payload)
+            seq = int(event["seq"])
+        except (TypeError, ValueError, KeyError):
+            return
+        with self._cond:
+            if self._history and seq <= self._history[-1]["seq"]:
+                return
+            self._history.append(event)
+            for q in list(self._subscribers):
+                try:
+                    q.put_nowait(event)
+                except queue.Full:
+                    pass
+            self._cond.notify_all()
+
+    @property
+    def last_seq(self):
+        with self._cond:
+            return self._history[-1]["seq"] if self._history else 0
+
+    def subscribe(self):
+        self._ensure_started()
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._cond:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._cond:
+            self._subscribers.discard(q)
+
+    def events_after(self, seq, timeout=25):
+        """
+        Long-poll: eventos con seq > `seq`, esperando hasta `timeout`
+        segundos si aún no hay. Devuelve (eventos, reset); reset=True si
+        `seq` no está cubierto por el historial (muy viejo, anterior a una
+        reconexión del canal o mayor que lo recibido) y el cliente debe
+        recargar la lista completa.
+        """
+        self._ensure_started()
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                ultimo = self._history[-1]["seq"] if self._history else 0
+                if seq > ultimo:
+                    return [], True
+                if self._history and seq < self._history[0]["seq"] - 1:
+                    return [], True
+                nuevos = [e for e in self._history if e["seq"] > seq]
+                restante = limite - time.monotonic()
+                if nuevos or restante <= 0:
+                    return nuevos, False
+                self._cond.wait(restante)
+
+
+def get_broker(app=None):
+    """Broker del proceso (uno por app), con backend según la BD o DISPATCH_EVENTS_BACKEND."""
+    app = app or current_app._get_current_object()
+    broker = app.extensions.get("dispatch_events")
+    if broker is None:
+        kind = app.config.get("DISPATCH_EVENTS_BACKEND")
+        if not kind:
+            kind = "postgres" if db.engine.dialect.name == "postgresql" else "memory"
+        if kind == "postgres":
+            backend = PostgresEventBackend(db.engine, logger=app.logger)
+        else:
+            backend = MemoryEventBackend()
+        broker = app.extensions.setdefault("dispatch_events", DispatchEventBroker(backend))
+    return broker
+
+
+# ---------- Publicación desde las rutas ----------
+
+def dispatch_event(kind: str, d) -> dict:
+    """Evento compacto: el frontend decide si recargar el despacho."""
+    if kind == "deleted":
+        return {"type": kind, "id": d.id, "chofer_id": d.chofer_id}
+    return {
+        "type": kind,
+        "id": d.id,
+        "orden": d.orden,
+        "chofer_id": d.chofer_id,
+        "status": (
+            "entregado_cliente" if d.delivered_client else
+            "entregado_chofer" if d.delivered_driver else
+            (d.status or "pendiente")
+        ),
+        "delivered_driver": d.delivered_driver,
+        "delivered_client": d.delivered_client,
+    }
+
+
+def publish_dispatch_events(events):
+    """
+    Publica después del commit. Un fallo del canal nunca rompe la request:
+    el cambio ya quedó guardado y los clientes se ponen al día al reconectar.
+    """
+    events = [e for e in (events or []) if e]
+    if not events:
+        return
+    ahora = to_local(datetime.utcnow()).isoformat(timespec="seconds")
+    for e in events:
+        e.setdefault("at", ahora)
+    try:
+        get_broker().publish(events)
+    except Exception as e:
+        current_app.logger.error(f"[DISPATCH EVENTS] No se pudo publicar: {e}")
@@ -0,0 +1,233 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, inspect, insert, select, literal, or_, text
+from sqlalchemy.orm import selectinload
+from app import db
+from app.models.dispatch_model import Dispatch, DispatchProduct, DispatchImage
+from app.models.dispatch_change_model import DispatchChange
+from app.utils.timezone import to_utc_naive
+
+# Los ids de dispatch_change son la versión de sync: deben quedar visibles en
+# el mismo orden en que se asignan, o un cliente que ya avanzó su versión se
+# salta el id menor que se confirma después. Por eso las filas se escriben
+# en before_commit y, en PostgreSQL, con este advisory lock tomado hasta el
+# commit (SQLite ya serializa las transacciones de escritura).
+SYNC_LOCK_KEY = 730290
+
+# Snapshot inicial: despachos aún no entregados al cliente o de los últimos días
+SYNC_SNAPSHOT_DAYS = 7
+
+
+# ---------- Registro de cambios ----------
+
+def record_dispatch_changes(ids, session=None):
+    """
+    Encola una fila 'upsert' por cada despacho de `ids`; se escriben al
+    confirmar la transacción (INSERT ... SELECT, con el chofer de ese
+    momento). Para updates masivos que no pasan por el flush del ORM.
+    """
+    session = session or db.session
+    session.info.setdefault("dispatch_sync_upserts", set()).update(i for i in ids or () if i is not None)
+
+
+def _after_flush(session, flush_context):
+    touched, deletes = set(), []
+
+    for obj in session.new:
+        if isinstance(obj, Dispatch):
+            touched.add(obj.id)
+        elif isinstance(obj, (DispatchProduct, DispatchImage)):
+            touched.add(obj.dispatch_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Dispatch):
+            if not session.is_modified(obj):
+                continue
+            touched.add(obj.id)
+            # Reasignado: el chofer anterior debe recibir un tombstone
+            hist = inspect(obj).attrs.chofer_id.history
+            for old in hist.deleted or ():
+                if old is not None and old != obj.chofer_id:
+                    deletes.append((obj.id, old))
+        elif isinstance(obj, (DispatchProduct, DispatchImage)) and session.is_modified(obj):
+            touched.add(obj.dispatch_id)
+
+    deleted_ids = set()
+    for obj in session.deleted:
+        if isinstance(obj, Dispatch):
+            deleted_ids.add(obj.id)
+            deletes.append((obj.id, obj.chofer_id))
+        elif isinstance(obj, (DispatchProduct, DispatchImage)):
+            touched.add(obj.dispatch_id)
+
+    record_dispatch_changes(touched, session)
+    if deletes:
+        session.info.setdefault("dispatch_sync_deletes", []).extend(deletes)
+        session.info.setdefault("dispatch_sync_deleted", set()).update(deleted_ids)
+
+
+def _before_commit(session):
+    # Lo pendiente se escribe ahora para que after_flush junte sus cambios
+    session.flush()
+    upserts = session.info.pop("dispatch_sync_upserts", None) or set()
+    deletes = session.info.pop("dispatch_sync_deletes", None) or []
+    upserts -= session.info.pop("dispatch_sync_deleted", None) or set()
+    if not upserts and not deletes:
+        return
+
+    conn = session.connection()
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SYNC_LOCK_KEY})
+    ahora = datetime.utcnow()
+    if deletes:
+        conn.execute(insert(DispatchChange.__table__), [
+            {"dispatch_id": did, "chofer_id": cid, "op": "delete", "changed_at": ahora}
+            for did, cid in deletes
+        ])
+    if upserts:
+        conn.execute(
+            insert(DispatchChange.__table__).from_select(
+                ["dispatch_id", "chofer_id", "op", "changed_at"],
+                select(Dispatch.id, Dispatch.chofer_id, literal("upsert"), literal(ahora))
+                .where(Dispatch.id.in_(upserts)),
+            )
+        )
+
+
+def _after_soft_rollback(session, previous_transaction):
+    for key in ("dispatch_sync_upserts", "dispatch_sync_deletes", "dispatch_sync_deleted"):
+        session.info.pop(key, None)
+
+
+def register_change_tracking():
+    """Engancha el registro de cambios a la sesión (una sola vez)."""
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("before_commit", _before_commit),
+        ("after_soft_rollback", _after_soft_rollback),
+    ):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
+
+
+# ---------- Lectura ----------
+
+def current_version() -> int:
+    return db.session.query(func.coalesce(func.max(DispatchChange.id), 0)).scalar() or 0
+
+
+def _load_dispatches(query):
+    return query.options(
+        selectinload(Dispatch.productos),
+        selectinload(Dispatch.images),
+    ).all()
+
+
+def snapshot(chofer_id=None):
+    """Estado completo acotado (primera sincronización o versión inválida)."""
+    version = current_version()
+    desde = datetime.utcnow() - timedelta(days=SYNC_SNAPSHOT_DAYS)
+    q = Dispatch.query.filter(or_(Dispatch.delivered_client == False, Dispatch.fecha >= desde))
+    if chofer_id is not None:
+        q = q.filter(Dispatch.chofer_id == chofer_id)
+    dispatches = _load_dispatches(q.order_by(Dispatch.id))
+    return {
+        "version": version,
+        "full": True,
+        "has_more": False,
+        "upserts": [d.to_dict() for d in dispatches],
+        "deletes": [],
+    }
+
+
+def changes_since(since: int, chofer_id=None, limit: int = 500):
+    """
+    Delta desde `since`: despachos creados/actualizados (estado actual) e
+    ids borrados o que dejaron de pertenecer al chofer.
+    """
+    tope = current_version()
+    if since > tope:
+        # Versión desconocida (BD restaurada, etc.): volver a empezar
+        return snapshot(chofer_id)
+
+    q = DispatchChange.query.filter(DispatchChange.id > since, DispatchChange.id <= tope)
+    if chofer_id is not None:
+        q = q.filter(DispatchChange.chofer_id == chofer_id)
+    rows = q.order_by(DispatchChange.id).limit(limit).all()
+    if not rows:
+        return {"version": max(since, tope), "full": False, "has_more": False, "upserts": [], "deletes": []}
+
+    # Solo importa la última operación por despacho dentro de la ventana
+    last_op = {}
+    for r in rows:
+        last_op[r.dispatch_id] = r.op
+
+    upsert_ids = [i for i, op in last_op.items() if op == "upsert"]
+    vigentes = {}
+    if upsert_ids:
+        q = Dispatch.query.filter(Dispatch.id.in_(upsert_ids))
+        if chofer_id is not None:
+            q = q.filter(Dispatch.chofer_id == chofer_id)
+        vigentes = {d.id: d for d in _load_dispatches(q)}
+
+    # Lo que ya no existe o ya no es del chofer viaja como tombstone
+    deletes = sorted(i for i in last_op if i not in vigentes)
+    return {
+        "version": rows[-1].id,
+        "full": False,
+        "has_more": len(rows) == limit,
+        "upserts": [vigentes[i].to_dict() for i in sorted(vigentes)],
+        "deletes": deletes,
+    }
+
+
+# ---------- Cambios encolados offline ----------
+
+def parse_client_timestamp(value):
+    """
+    Hora en que el chofer marcó la entrega sin conexión. Naive = hora local.
+    Nunca en el futuro; si no viene o es inválida, ahora.
+    """
+    ahora = datetime.utcnow()
+    if not value:
+        return ahora
+    try:
+        ts = to_utc_naive(datetime.fromisoformat(str(value).replace("Z", "+00:00")))
+    except (TypeError, ValueError):
+        return ahora
+    return min(ts, ahora)
+
+
+def apply_offline_change(d: Dispatch, target: str, at: datetime) -> str:
+    """
+    Aplica una marca de entrega encolada con las reglas de mark-driver /
+    mark-client. Los hitos son irreversibles: lo ya entregado no se toca.
+    Una marca manual sobre un despacho auto-entregado solo lo confirma
+    (auto_delivered=False), así una edición posterior del chofer ya no lo
+    revierte a pendiente.
+
+    Devuelve 'applied' o 'unchanged'.
+    """
+    if target == "entregado_chofer":
+        if d.delivered_driver:
+            return "unchanged"
+        d.delivered_driver = True
+        d.delivered_driver_at = at
+        if not d.delivered_client:
+            d.status = "entregado_chofer"
+        d.auto_delivered = False
+        return "applied"
+
+    # entregado_cliente
+    if d.delivered_client:
+        if d.auto_delivered:
+            d.auto_delivered = False
+            return "applied"
+        return "unchanged"
+    d.delivered_client = True
+    d.delivered_client_at = at
+    if not d.delivered_driver:
+        d.delivered_driver = True
+        d.delivered_driver_at = at
+    d.status = "entregado_cliente"
+    d.auto_delivered = False
+    return "applied"
@@ -0,0 +1,269 @@
+from datetime import datetime
+from sqlalchemy import event, inspect, select, delete, insert, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
+from flask import current_app
+from app import db
+from app.models.dispatch_model import Dispatch, DispatchProduct, DispatchImage
+from app.models.dispatch_view_model import DispatchView
+from app.models.client_model import Client
+from app.models.driver_model import Driver
+from app.models.user_model import User
+
+# Despachos por lote al reconstruir todo (CLI)
+REBUILD_BATCH = 500
+
+# Nombre que va en el snapshot -> columna de Dispatch que lo referencia
+NAME_SOURCES = {
+    Client: Dispatch.cliente_id,
+    Driver: Dispatch.chofer_id,
+    User: Dispatch.created_by,
+}
+
+
+# ---------- Armado del snapshot ----------
+
+def _creator_id(created_by):
+    return int(created_by) if str(created_by).isdigit() else None
+
+
+def _names(session, model, keys) -> dict:
+    keys = {k for k in keys if k is not None}
+    if not keys:
+        return {}
+    return dict(session.execute(select(model.id, model.name).where(model.id.in_(keys))).all())
+
+
+def build_dispatch_views(ids, session=None) -> dict:
+    """
+    Snapshot de cada despacho de `ids` que exista: {id: dict}. Lee el
+    estado de la BD (populate_existing), no el de las colecciones en
+    memoria, que un DELETE masivo de productos deja desactualizadas.
+    """
+    session = session or db.session
+    ids = [i for i in set(ids or []) if i is not None]
+    if not ids:
+        return {}
+    dispatches = (
+        session.query(Dispatch)
+        .options(selectinload(Dispatch.productos), selectinload(Dispatch.images))
+        .populate_existing()
+        .filter(Dispatch.id.in_(ids))
+        .all()
+    )
+    clients = _names(session, Client, (d.cliente_id for d in dispatches))
+    drivers = _names(session, Driver, (d.chofer_id for d in dispatches))
+    creators = _names(session, User, (_creator_id(d.created_by) for d in dispatches))
+
+    return {
+        d.id: {
+            "dispatch": d.to_dict(),
+            # Status tal como está guardado (la respuesta del PUT lo devuelve así)
+            "status": d.status,
+            # None = el cliente / chofer / usuario ya no existe
+            "cliente": clients.get(d.cliente_id),
+            "chofer": drivers.get(d.chofer_id),
+            "creador": creators.get(_creator_id(d.created_by)),
+        }
+        for d in dispatches
+    }
+
+
+def _upsert(conn, rows):
+    table = DispatchView.__table__
+    dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(conn.dialect.name)
+    if dialect is None:
+        conn.execute(delete(table).where(table.c.dispatch_id.in_([r["dispatch_id"] for r in rows])))
+        conn.execute(insert(table), rows)
+        return
+    stmt = dialect.insert(table)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.dispatch_id],
+            set_={"snapshot": stmt.excluded.snapshot, "updated_at": stmt.excluded.updated_at},
+        ),
+        rows,
+    )
+
+
+def refresh_dispatch_views(ids, session=None) -> dict:
+    """
+    Rearma y guarda el snapshot de `ids` en la transacción actual; los que
+    ya no existen se borran. Devuelve los snapshots armados.
+    """
+    session = session or db.session
+    ids = {i for i in (ids or []) if i is not None}
+    if not ids:
+        return {}
+    # El upsert pisa la fila entera: sin este lock (hasta el commit), dos
+    # transacciones que editan el mismo despacho pueden dejar guardado el
+    # snapshot armado antes de la otra. En orden de id para no cruzarse;
+    # SQLite no tiene FOR UPDATE y ya serializa las escrituras.
+    session.execute(
+        select(Dispatch.id).where(Dispatch.id.in_(ids)).order_by(Dispatch.id).with_for_update()
+    )
+    views = build_dispatch_views(ids, session)
+    conn = session.connection()
+    gone = ids - set(views)
+    if gone:
+        conn.execute(delete(DispatchView.__table__).where(DispatchView.dispatch_id.in_(gone)))
+    if views:
+        ahora = datetime.utcnow()
+        _upsert(conn, [
+            {"dispatch_id": i, "snapshot": snap, "updated_at": ahora}
+            for i, snap in views.items()
+        ])
+    return views
+
+
+def rebuild_all_dispatch_views(log=None) -> int:
+    """Arma el snapshot de todos los despachos (en lotes). Devuelve cuántos."""
+    total = 0
+    last_id = 0
+    while True:
+        ids = [
+            r[0] for r in db.session.execute(
+                select(Dispatch.id).where(Dispatch.id > last_id).order_by(Dispatch.id).limit(REBUILD_BATCH)
+            )
+        ]
+        if not ids:
+            break
+        refresh_dispatch_views(ids)
+        db.session.commit()
+        # Sin esto el identity map crece con todos los despachos
+        db.session.expunge_all()
+        total += len(ids)
+        last_id = ids[-1]
+        if log:
+            log(f"{total} despachos")
+    return total
+
+
+# ---------- Lectura ----------
+
+def get_dispatch_views(ids) -> dict:
+    """
+    {id: snapshot} en una consulta. Los que no tienen fila se arman y se
+    guardan al vuelo; los ids que no existen no vienen en el resultado.
+    """
+    ids = [i for i in dict.fromkeys(ids or []) if i is not None]
+    if not ids:
+        return {}
+    views = dict(db.session.execute(
+        select(DispatchView.dispatch_id, DispatchView.snapshot).where(DispatchView.dispatch_id.in_(ids))
+    ).all())
+    missing = [i for i in ids if i not in views]
+    if missing:
+        try:
+            views.update(refresh_dispatch_views(missing))
+            db.session.commit()
+        except SQLAlchemyError as e:
+            # Otra escritura en paralelo: se responde igual, la fila se arma en la próxima
+            db.session.rollback()
+            current_app.logger.warning(f"[DISPATCH VIEW] No se pudo guardar {missing}: {e}")
+            views.update(build_dispatch_views(missing))
+    return views
+
+
+def get_dispatch_view(dispatch_id: int) -> dict | None:
+    return get_dispatch_views([dispatch_id]).get(dispatch_id)
+
+
+def detail_payload(view: dict, raw_status: bool = False) -> dict:
+    """Respuesta de GET /dispatches/<id> (y del PUT con raw_status=True)."""
+    d = view["dispatch"]
+    return {
+        "id": d["id"],
+        "orden": d["orden"],
+        "cliente": view["cliente"] if view["cliente"] is not None else d["cliente"],
+        "chofer": d["chofer_name"],
+        "created_by": view["creador"] if view["creador"] is not None else d["created_by"],
+        "fecha": d["fecha"],
+        "status": view["status"] if raw_status else d["status"],
+        "delivered_driver": d["delivered_driver"],
+        "delivered_client": d["delivered_client"],
+        "paquete_numero": d["paquete_numero"],
+        "factura_numero": d["factura_numero"],
+        "productos": [{"nombre": p["nombre"], "cantidad": p["cantidad"], "unidad": p["unidad"]} for p in d["productos"]],
+        "images": d["images"],
+    }
+
+
+def marked_payload(view: dict) -> dict:
+    """Dispatch.to_dict() con el nombre del creador (mark-driver / mark-client)."""
+    d = dict(view["dispatch"])
+    if view["creador"] is not None:
+        d["created_by"] = view["creador"]
+    return d
+
+
+# ---------- Hooks de sesión ----------
+
+def _before_flush(session, flush_context, instances):
+    # Cliente / chofer / usuario renombrado o borrado: sus despachos pueden
+    # ser muchos, así que se descartan los snapshots y se rearman al leerlos
+    stale = []
+    renamed = [obj for obj in session.dirty
+               if type(obj) in NAME_SOURCES and inspect(obj).attrs.name.history.has_changes()]
+    for obj in renamed + list(session.deleted):
+        column = NAME_SOURCES.get(type(obj))
+        if column is not None and obj.id is not None:
+            stale.append(column == (str(obj.id) if type(obj) is User else obj.id))
+    if stale:
+        session.connection().execute(
+            delete(DispatchView.__table__).where(
+                DispatchView.dispatch_id.in_(select(Dispatch.id).where(or_(*stale)))
+            )
+        )
+
+
+def touch_dispatch_views(ids, session=None):
+    """
+    Marca despachos para rearmar al confirmar la transacción. Para lo que
+    no pasa por el flush del ORM (UPDATE / DELETE masivos).
+    """
+    session = session or db.session
+    session.info.setdefault("dispatch_view_ids", set()).update(i for i in ids or () if i is not None)
+
+
+def _touched_id(obj):
+    if isinstance(obj, Dispatch):
+        return obj.id
+    if isinstance(obj, (DispatchProduct, DispatchImage)):
+        return obj.dispatch_id
+    return None
+
+
+def _after_flush(session, flush_context):
+    ids = {_touched_id(obj) for obj in session.new}
+    ids.update(_touched_id(obj) for obj in session.deleted)
+    ids.update(_touched_id(obj) for obj in session.dirty if session.is_modified(obj))
+    touch_dispatch_views(ids, session)
+
+
+def _before_commit(session):
+    # Lo pendiente se escribe ahora para que after_flush junte sus ids
+    session.flush()
+    ids = session.info.pop("dispatch_view_ids", None)
+    if ids:
+        refresh_dispatch_views(ids, session)
+
+
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop("dispatch_view_ids", None)
+
+
+def register_dispatch_view_tracking():
+    """
+    Mantiene dispatch_view al día: los despachos tocados en la transacción
+    (despacho, productos o imágenes) se rearman una vez, antes del commit.
+    """
+    for name, fn in (
+        ("before_flush", _before_flush),
+        ("after_flush", _after_flush),
+        ("before_commit", _before_commit),
+        ("after_soft_rollback", _after_soft_rollback),
+    ):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
@@ -1,10 +1,10 @@
-from datetime import date, datetime, timedelta
-from calendar import monthrange
+from datetime import date
 from collections import defaultdict
 from sqlalchemy import func
 from app.models.dispatch_model import Dispatch
 from app.models.driver_model import Driver
-from app.utils.timezone import to_utc_naive, to_local, CL_TZ
+from app.utils.timezone import to_local
+from app.utils.month_range import month_utc_bounds
 
 # Choferes que NO se evalúan (retiros de cliente, encomiendas, transportistas
 # externos, etc. — no siguen una ruta propia de la empresa que se pueda medir).
@@ -49,13 +49,6 @@ def get_driver_for_user_email(email: str):
     return Driver.query.filter(func.lower(Driver.name) == driver_name.lower()).first()
 
 
-def _month_utc_bounds(year: int, month: int):
-    first_local = datetime(year, month, 1, 0, 0, 0, tzinfo=CL_TZ)
-    last_day = monthrange(year, month)[1]
-    next_month_local = datetime(year, month, last_day, 0, 0, 0, tzinfo=CL_TZ) + timedelta(days=1)
-    return to_utc_naive(first_local), to_utc_naive(next_month_local)
-
-
 # Umbrales de la tasa de cumplimiento (entregados / total asignado).
 UMBRALES = [
     (0.95, "excelente"),
@@ -76,7 +69,7 @@ def clasificar(ratio):
 
 
 def evaluar_chofer(driver_id: int, year: int, month: int):
-    start_utc, end_utc = _month_utc_bounds(year, month)
+    start_utc, end_utc = month_utc_bounds(year, month)
     dispatches = (
         Dispatch.query
         .filter(Dispatch.chofer_id == driver_id)
@@ -110,7 +103,7 @@ def daily_detail_for_driver(driver_id: int, year: int, month: int):
     mostrar los picos de despachos por fecha, distinguiendo marcados de
     sin marcar.
     """
-    start_utc, end_utc = _month_utc_bounds(year, month)
+    start_utc, end_utc = month_utc_bounds(year, month)
     dispatches = (
         Dispatch.query
         .filter(Dispatch.chofer_id == driver_id)
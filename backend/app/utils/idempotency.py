@@ -0,0 +1,224 @@
+import hashlib
+import os
+import re
+import secrets
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, make_response, current_app, g, has_app_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.idempotency_key_model import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# Horas que se guarda la respuesta de una clave (config o env; limpieza diaria)
+IDEMPOTENCY_TTL_HOURS = 24
+# Una clave "en curso" más vieja que esto y sin ningún commit se da por
+# abandonada (proceso caído a mitad de la solicitud) y el reintento se
+# ejecuta de nuevo. Si la original seguía viva, su commit falla (ver
+# _before_commit): nunca confirman las dos.
+IDEMPOTENCY_LOCK_SECONDS = 120
+
+_KEY_RE = re.compile(r"^[\x21-\x7e]{1,100}$")
+
+
+def _request_hash() -> str:
+    """
+    sha256 del cuerpo. Los multipart se resumen por campos y contenido de
+    archivos: el boundary cambia en cada reintento del navegador.
+    """
+    h = hashlib.sha256(f"{request.method} {request.path}\n".encode("utf-8"))
+    if request.mimetype in ("multipart/form-data", "application/x-www-form-urlencoded"):
+        for name, values in sorted(request.form.lists()):
+            for value in values:
+                h.update(f"f:{name}={value}\n".encode("utf-8"))
+        for name, storage in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            content = storage.stream.read()
+            storage.stream.seek(0)
+            h.update(f"a:{name}:{storage.filename}:{hashlib.sha256(content).hexdigest()}\n".encode("utf-8"))
+    else:
+        # cache=True: la vista vuelve a leer el cuerpo con get_json()
+        h.update(request.get_data(cache=True))
+    return h.hexdigest()
+
+
+def _ttl() -> timedelta:
+    hours = current_app.config.get("IDEMPOTENCY_TTL_HOURS", os.getenv("IDEMPOTENCY_TTL_HOURS", IDEMPOTENCY_TTL_HOURS))
+    return timedelta(hours=int(hours))
+
+
+class IdempotencyClaimLost(RuntimeError):
+    """Otra solicitud tomó la Idempotency-Key: esta ya no puede confirmar."""
+
+
+def _claim(user_id, endpoint, key, request_hash):
+    """
+    Reserva la clave (fila con status_code NULL). Devuelve ((id, token), None)
+    o (None, fila existente) si otra solicitud ya la tomó.
+    """
+    for _ in range(2):
+        ahora = datetime.utcnow()
+        token = secrets.token_hex(16)
+        row = IdempotencyKey(
+            user_id=user_id, endpoint=endpoint, key=key, request_hash=request_hash,
+            claim_token=token, created_at=ahora, expires_at=ahora + _ttl(),
+        )
+        db.session.add(row)
+        try:
+            db.session.commit()
+            return (row.id, token), None
+        except IntegrityError:
+            db.session.rollback()
+
+        existing = IdempotencyKey.query.filter_by(user_id=user_id, endpoint=endpoint, key=key).first()
+        if existing is None:
+            continue  # se borró entre medio
+        if existing.expires_at <= ahora:
+            # Vencida: se borra y se vuelve a intentar
+            db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.id == existing.id))
+            db.session.commit()
+            continue
+        abandonada = (
+            existing.status_code is None
+            and existing.committed_at is None
+            and existing.created_at < ahora - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+        )
+        if not abandonada:
+            return None, existing
+        # Abandonada: se toma cambiando el token, solo si sigue sin commit
+        row_id, old_token = existing.id, existing.claim_token
+        result = db.session.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.id == row_id,
+                IdempotencyKey.claim_token.is_not_distinct_from(old_token),
+                IdempotencyKey.committed_at.is_(None),
+                IdempotencyKey.status_code.is_(None),
+            )
+            .values(claim_token=token, request_hash=request_hash, created_at=ahora)
+        )
+        db.session.commit()
+        if result.rowcount:
+            return (row_id, token), None
+    return None, None
+
+
+def _owned(row_id, token):
+    return (IdempotencyKey.id == row_id) & (IdempotencyKey.claim_token == token)
+
+
+def _release(row_id, token):
+    """Libera la clave, salvo que la vista haya confirmado algo con ella."""
+    db.session.rollback()
+    db.session.execute(
+        delete(IdempotencyKey).where(_owned(row_id, token), IdempotencyKey.committed_at.is_(None))
+    )
+    db.session.commit()
+
+
+def _before_commit(session):
+    # Marca la clave en la misma transacción que los cambios de la vista:
+    # si el proceso cae antes de guardar la respuesta, el reintento no los repite
+    claim = g.get("idempotency_claim") if has_app_context() else None
+    if claim is None:
+        return
+    result = session.connection().execute(
+        update(IdempotencyKey).where(_owned(*claim)).values(committed_at=datetime.utcnow())
+    )
+    if result.rowcount != 1:
+        raise IdempotencyClaimLost(f"{IDEMPOTENCY_HEADER} tomada por otra solicitud")
+
+
+def register_idempotency_tracking():
+    """Engancha la marca de commit de las Idempotency-Key a la sesión (una sola vez)."""
+    if not event.contains(db.session, "before_commit", _before_commit):
+        event.listen(db.session, "before_commit", _before_commit)
+
+
+def idempotent(fn):
+    """
+    Decorador para POST de creación (va debajo de @jwt_required). Con el
+    header Idempotency-Key, la primera solicitud se ejecuta y su respuesta
+    2xx se guarda; un reintento con la misma clave y el mismo cuerpo recibe
+    esa respuesta (header Idempotent-Replayed: true) sin repetir subidas ni
+    movimientos de stock. Otro cuerpo con la misma clave -> 422; la
+    original aún en curso -> 409. Las respuestas 4xx / 5xx sin commit no
+    se guardan: la clave queda libre para reintentar, p. ej. con
+    "force": true tras un aviso de duplicado. Si la vista confirmó algo, la
+    respuesta se guarda sea cual sea, y si no se pudo guardar la clave
+    queda tomada (409) hasta vencer.
+    Sin el header, la vista se ejecuta igual que siempre.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+        if not key:
+            return fn(*args, **kwargs)
+        if not _KEY_RE.match(key):
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} inválida (1 a 100 caracteres ASCII visibles)"}), 400
+
+        request_hash = _request_hash()
+        claim, existing = _claim(str(get_jwt_identity()), f"{request.method} {request.path}", key, request_hash)
+
+        if claim is None:
+            if existing is None:
+                resp = jsonify({"error": "No se pudo reservar la Idempotency-Key, reintente"})
+                resp.headers["Retry-After"] = "1"
+                return resp, 409
+            if existing.request_hash != request_hash:
+                return jsonify({"error": f"La {IDEMPOTENCY_HEADER} ya se usó con otra solicitud"}), 422
+            if existing.status_code is None and existing.committed_at is not None:
+                # Confirmó sus cambios pero no alcanzó a guardar la respuesta
+                return jsonify({"error": "La solicitud original ya se procesó; revise el listado"}), 409
+            if existing.status_code is None:
+                resp = jsonify({"error": "La solicitud original aún está en curso"})
+                resp.headers["Retry-After"] = "1"
+                return resp, 409
+            resp = current_app.response_class(
+                existing.response_body, status=existing.status_code, mimetype=existing.mimetype,
+            )
+            resp.headers["Idempotent-Replayed"] = "true"
+            return resp
+
+        # Desde aquí cada commit de la vista marca la clave (_before_commit)
+        g.idempotency_claim = claim
+        try:
+            resp = make_response(fn(*args, **kwargs))
+        except Exception:
+            g.pop("idempotency_claim", None)
+            _release(*claim)
+            raise
+        g.pop("idempotency_claim", None)
+
+        try:
+            db.session.rollback()
+            committed = db.session.execute(
+                select(IdempotencyKey.committed_at).where(_owned(*claim))
+            ).scalar_one_or_none() is not None
+            if 200 <= resp.status_code < 300 or committed:
+                db.session.execute(
+                    update(IdempotencyKey)
+                    .where(_owned(*claim))
+                    .values(
+                        status_code=resp.status_code,
+                        response_body=resp.get_data(as_text=True),
+                        mimetype=resp.mimetype,
+                    )
+                )
+                db.session.commit()
+            else:
+                _release(*claim)
+        except Exception as e:
+            # La vista ya respondió: no se pierde su respuesta por esto
+            db.session.rollback()
+            current_app.logger.error(f"[IDEMPOTENCY] No se pudo guardar la clave {key}: {e}")
+        return resp
+    return wrapper
+
+
+def prune_idempotency_keys() -> int:
+    """Borra las claves vencidas. Devuelve cuántas."""
+    result = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow()))
+    db.session.commit()
+    return result.rowcount or 0
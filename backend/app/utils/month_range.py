@@ -0,0 +1,36 @@
+from datetime import date, datetime
+from sqlalchemy import and_, Date
+from app.utils.timezone import to_utc_naive, CL_TZ
+
+
+def month_bounds(year: int, month: int):
+    """(primer día del mes, primer día del mes siguiente) como date."""
+    first = date(year, month, 1)
+    next_first = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return first, next_first
+
+
+def month_utc_bounds(year: int, month: int):
+    """Límites del mes (hora de Chile) convertidos a UTC naive, para filtrar en la BD."""
+    first, next_first = month_bounds(year, month)
+    return (
+        to_utc_naive(datetime(first.year, first.month, 1, tzinfo=CL_TZ)),
+        to_utc_naive(datetime(next_first.year, next_first.month, 1, tzinfo=CL_TZ)),
+    )
+
+
+def month_filter(column, year: int, month: int):
+    """
+    `column >= inicio AND column < inicio del mes siguiente`. A diferencia de
+    extract('year'/'month', ...), el rango puede usar un índice sobre la
+    columna (o uno compuesto que la tenga al final, como (operator_id, fecha)).
+
+    Columnas Date (p. ej. OperatorActivity.fecha) se comparan contra fechas
+    calendario; DateTime se asume UTC naive y se usa el mes de Chile.
+    """
+    col_type = getattr(column, "type", None)
+    if isinstance(col_type, Date):
+        start, end = month_bounds(year, month)
+    else:
+        start, end = month_utc_bounds(year, month)
+    return and_(column >= start, column < end)
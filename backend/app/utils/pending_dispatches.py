@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+from sqlalchemy import cast, String
+from app import db
+from app.models.dispatch_model import Dispatch
+from app.models.client_model import Client
+from app.models.driver_model import Driver
+from app.models.user_model import User
+
+# Antigüedad a partir de la cual un despacho no entregado se avisa por correo
+PENDING_ALERT_DAYS = 7
+
+
+def pending_filter():
+    """
+    Despachos no entregados al cliente. Escrito igual que el WHERE de
+    ix_dispatch_pending_fecha para que el planificador use el índice parcial.
+    """
+    return Dispatch.delivered_client == False
+
+
+def get_pending_dispatches(older_than_days=PENDING_ALERT_DAYS, limit=None):
+    """
+    Despachos pendientes con más de `older_than_days` días, ya unidos con
+    los nombres de cliente, chofer y creador (una sola consulta). Cada fila
+    tiene id, orden, factura_numero, fecha, chofer_id, client_name,
+    driver_name y creator_name (None si la entidad ya no existe).
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    q = (
+        db.session.query(
+            Dispatch.id,
+            Dispatch.orden,
+            Dispatch.factura_numero,
+            Dispatch.fecha,
+            Dispatch.chofer_id,
+            Client.name.label("client_name"),
+            Driver.name.label("driver_name"),
+            User.name.label("creator_name"),
+        )
+        .outerjoin(Client, Client.id == Dispatch.cliente_id)
+        .outerjoin(Driver, Driver.id == Dispatch.chofer_id)
+        .outerjoin(User, cast(User.id, String) == Dispatch.created_by)
+        .filter(pending_filter(), Dispatch.fecha < cutoff)
+        .order_by(Dispatch.fecha)
+    )
+    if limit:
+        q = q.limit(limit)
+    return q.all()
+
+
+def names_for_dispatches(dispatches):
+    """
+    Nombres de cliente y creador para un listado de despachos, con una
+    consulta por tabla en vez de una por fila.
+    Devuelve ({cliente_id: nombre}, {created_by: nombre}).
+    """
+    client_ids = {d.cliente_id for d in dispatches if d.cliente_id is not None}
+    user_ids = {int(d.created_by) for d in dispatches if str(d.created_by or "").isdigit()}
+    clients = dict(
+        db.session.query(Client.id, Client.name).filter(Client.id.in_(client_ids)).all()
+    ) if client_ids else {}
+    users = {
+        str(uid): name
+        for uid, name in db.session.query(User.id, User.name).filter(User.id.in_(user_ids)).all()
+    } if user_ids else {}
+    return clients, users
@@ -1,14 +1,15 @@
-from datetime import date, datetime, timedelta
-from calendar import monthrange
+from datetime import date
 from collections import defaultdict
 from functools import lru_cache
-from sqlalchemy import extract, func
+from flask import g, has_app_context
+from sqlalchemy import func
 from sqlalchemy.orm import joinedload
 from app import db
 from app.models.production_model import Production, ProductionProduct
 from app.models.operator_activity_model import OperatorActivity
 from app.models.operator_model import Operator
-from app.utils.timezone import to_local, to_utc_naive, CL_TZ
+from app.utils.timezone import to_local
+from app.utils.month_range import month_filter, month_utc_bounds
 
 # ── Horario laboral efectivo (ya descontada 1h de colación) ─────────────────
 def horas_programadas(d: date) -> float:
@@ -65,72 +66,105 @@ def get_operator_for_user_email(email: str):
     return Operator.query.filter(func.lower(Operator.name) == operator_name.lower()).first()
 
 
-def _otras_horas_por_dia(operator_id: int, year: int, month: int):
-    acts = (
-        OperatorActivity.query
-        .filter(OperatorActivity.operator_id == operator_id)
-        .filter(extract('year', OperatorActivity.fecha) == year)
-        .filter(extract('month', OperatorActivity.fecha) == month)
-        .all()
-    )
-    horas_otras = defaultdict(float)
-    for a in acts:
-        horas_otras[a.fecha] += float(a.horas or 0)
-    return horas_otras
-
-
-def _month_utc_bounds(year: int, month: int):
-    """Límites del mes (hora de Chile) convertidos a UTC naive, para filtrar en la BD."""
-    first_local = datetime(year, month, 1, 0, 0, 0, tzinfo=CL_TZ)
-    last_day = monthrange(year, month)[1]
-    next_month_local = datetime(year, month, last_day, 0, 0, 0, tzinfo=CL_TZ) + timedelta(days=1)
-    return to_utc_naive(first_local), to_utc_naive(next_month_local)
-
-
-def _entries_por_dia_y_producto(operator_id: int, year: int, month: int):
+class OperatorMonthData:
     """
-    Recorre las producciones del mes de UN operario y arma, por día, cuántas
-    líneas de producto hay por NOMBRE EXACTO de producto (para repartir las
-    horas proporcionalmente), más la cantidad total, la unidad y los días
-    trabajados por cada producto.
+    Producciones y actividades de UN operario en UN mes, leídas una sola vez
+    (una consulta por tabla). Expone lo que necesitan la evaluación y el
+    detalle diario:
+
+    - entries_por_dia[d][nombre]: líneas de producto por día (para repartir
+      las horas proporcionalmente).
+    - qty_por_producto / dias_por_producto / unidad_por_producto.
+    - qty_por_dia_producto[d][nombre]: cantidad producida por día.
+    - horas_otras_por_dia[d]: horas registradas en otras actividades.
+    - actividades: las OperatorActivity del mes, por fecha ascendente.
 
     Se agrupa por nombre exacto de producto (no solo por unidad genérica
     kg/unidades/pqt), porque dos productos distintos en la misma unidad
     pueden tener velocidades de fabricación muy distintas (ej. bolsas
     pequeñas vs. bolsas grandes, ambas en "kg").
     """
-    start_utc, end_utc = _month_utc_bounds(year, month)
-    productions = (
-        Production.query
-        .options(joinedload(Production.productos))
-        .filter(Production.operator_id == operator_id)
-        .filter(Production.fecha >= start_utc, Production.fecha < end_utc)
-        .all()
-    )
-    entries_por_dia = defaultdict(lambda: defaultdict(int))
-    qty_por_producto = defaultdict(float)
-    dias_por_producto = defaultdict(set)
-    unidad_por_producto = {}
-    for p in productions:
-        local_dt = to_local(p.fecha)
-        d = local_dt.date()
-        for prod in p.productos:
-            nombre = normalizar_nombre(prod.nombre)
-            entries_por_dia[d][nombre] += 1
-            qty_por_producto[nombre] += float(prod.cantidad or 0)
-            dias_por_producto[nombre].add(d)
-            unidad_por_producto[nombre] = normalizar_unidad(prod.unidad)
-    return entries_por_dia, qty_por_producto, dias_por_producto, unidad_por_producto
+
+    def __init__(self, operator_id: int, year: int, month: int):
+        self.operator_id = operator_id
+        self.year = year
+        self.month = month
+        self.entries_por_dia = defaultdict(lambda: defaultdict(int))
+        self.qty_por_producto = defaultdict(float)
+        self.dias_por_producto = defaultdict(set)
+        self.unidad_por_producto = {}
+        self.qty_por_dia_producto = defaultdict(lambda: defaultdict(float))
+        self.horas_otras_por_dia = defaultdict(float)
+        self._load()
+
+    def _load(self):
+        start_utc, end_utc = month_utc_bounds(self.year, self.month)
+        productions = (
+            Production.query
+            .options(joinedload(Production.productos))
+            .filter(Production.operator_id == self.operator_id)
+            .filter(Production.fecha >= start_utc, Production.fecha < end_utc)
+            .all()
+        )
+        for p in productions:
+            d = to_local(p.fecha).date()
+            for prod in p.productos:
+                nombre = normalizar_nombre(prod.nombre)
+                cantidad = float(prod.cantidad or 0)
+                self.entries_por_dia[d][nombre] += 1
+                self.qty_por_producto[nombre] += cantidad
+                self.qty_por_dia_producto[d][nombre] += cantidad
+                self.dias_por_producto[nombre].add(d)
+                self.unidad_por_producto[nombre] = normalizar_unidad(prod.unidad)
+
+        self.actividades = (
+            OperatorActivity.query
+            .filter(OperatorActivity.operator_id == self.operator_id)
+            .filter(month_filter(OperatorActivity.fecha, self.year, self.month))
+            .order_by(OperatorActivity.fecha.asc())
+            .all()
+        )
+        for a in self.actividades:
+            self.horas_otras_por_dia[a.fecha] += float(a.horas or 0)
+
+    @property
+    def dias_trabajados(self):
+        dias = set()
+        for dias_p in self.dias_por_producto.values():
+            dias |= dias_p
+        return dias
+
+
+def operator_month_data(operator_id: int, year: int, month: int) -> OperatorMonthData:
+    """
+    OperatorMonthData memoizado durante el request (en flask.g): la
+    evaluación, las líneas base y el detalle diario del mismo mes comparten
+    una sola lectura. Fuera de un contexto de app se carga sin memoizar.
+    El blueprint lo descarta al terminar cada request
+    (clear_operator_month_data), aunque el contexto de app siga vivo.
+    """
+    if not has_app_context():
+        return OperatorMonthData(operator_id, year, month)
+    cache = g.setdefault("_operator_month_data", {})
+    key = (operator_id, year, month)
+    data = cache.get(key)
+    if data is None:
+        data = cache[key] = OperatorMonthData(operator_id, year, month)
+    return data
+
+
+def clear_operator_month_data(exc=None):
+    g.pop("_operator_month_data", None)
 
 
 def _compute_rate_by_product_for_month(operator_id: int, year: int, month: int):
-    entries_por_dia, qty_por_producto, dias_por_producto, unidad_por_producto = _entries_por_dia_y_producto(
-        operator_id, year, month
-    )
-    if not entries_por_dia:
+    mes = operator_month_data(operator_id, year, month)
+    if not mes.entries_por_dia:
         return {}
 
-    horas_otras_por_dia = _otras_horas_por_dia(operator_id, year, month)
+    entries_por_dia, qty_por_producto = mes.entries_por_dia, mes.qty_por_producto
+    dias_por_producto, unidad_por_producto = mes.dias_por_producto, mes.unidad_por_producto
+    horas_otras_por_dia = mes.horas_otras_por_dia
 
     horas_por_producto = defaultdict(float)
     for d, productos_dia in entries_por_dia.items():
@@ -354,10 +388,7 @@ def evaluar_operador(operator_id: int, year: int, month: int):
 
         horas_totales += data["horas"]
 
-    _, _, dias_por_producto, _ = _entries_por_dia_y_producto(operator_id, year, month)
-    dias_totales = set()
-    for dias_p in dias_por_producto.values():
-        dias_totales |= dias_p
+    dias_totales = operator_month_data(operator_id, year, month).dias_trabajados
 
     ratio = (suma_ratio_ponderada / peso_total) if peso_total > 0 else None
 
@@ -401,29 +432,9 @@ def daily_detail_for_operator(operator_id: int, year: int, month: int):
     resultantes. Usado por la sección de detalle del operario (picos de
     producción por fecha).
     """
-    entries_por_dia, qty_por_producto, dias_por_producto, unidad_por_producto = _entries_por_dia_y_producto(
-        operator_id, year, month
-    )
-
-    qty_por_dia_producto = defaultdict(lambda: defaultdict(float))
-    for d, productos_dia in entries_por_dia.items():
-        pass  # entries_por_dia solo cuenta líneas, no cantidad; se recalcula abajo
-
-    start_utc, end_utc = _month_utc_bounds(year, month)
-    productions = (
-        Production.query
-        .options(joinedload(Production.productos))
-        .filter(Production.operator_id == operator_id)
-        .filter(Production.fecha >= start_utc, Production.fecha < end_utc)
-        .all()
-    )
-    for p in productions:
-        d = to_local(p.fecha).date()
-        for prod in p.productos:
-            nombre = normalizar_nombre(prod.nombre)
-            qty_por_dia_producto[d][nombre] += float(prod.cantidad or 0)
-
-    horas_otras_por_dia = _otras_horas_por_dia(operator_id, year, month)
+    mes = operator_month_data(operator_id, year, month)
+    qty_por_dia_producto = mes.qty_por_dia_producto
+    horas_otras_por_dia = mes.horas_otras_por_dia
     por_producto = rate_by_product_for_month(operator_id, year, month)
     principal = max(por_producto.items(), key=lambda kv: kv[1]["horas"])[0] if por_producto else None
 
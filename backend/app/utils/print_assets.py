@@ -0,0 +1,77 @@
+import threading
+from io import BytesIO
+from pathlib import Path
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+
+LOGO_PATH = Path(__file__).resolve().parent.parent / "static" / "logo.jpg"
+
+# Fuentes estándar que usan los documentos (métricas AFM de ReportLab)
+PRINT_FONTS = ("Helvetica", "Helvetica-Bold", "Helvetica-Oblique")
+
+# Rótulos fijos de la etiqueta 4x6 cuyo ancho se usa para alinear el valor
+LABEL_FONT = ("Helvetica", 10.5)
+LABEL_TEXTS = ("Fecha: ", "Chofer: ", "Centro de Costo: ")
+
+
+class _MemoryImage(ImageReader):
+    """
+    ImageReader sobre bytes en memoria, decodificado una sola vez.
+    Se comparte entre documentos e hilos: getRGBData() devuelve los datos
+    ya decodificados (ReportLab los usa para la firma del XObject) y cada
+    PDF que incrusta el JPEG recibe su propio BytesIO, sin carreras sobre
+    la posición de un archivo compartido.
+    """
+
+    def __init__(self, data: bytes):
+        super().__init__(BytesIO(data))
+        self._bytes = data
+        self.getSize()
+        self.getRGBData()
+
+    def _jpeg_fh(self):
+        return BytesIO(self._bytes)
+
+
+class PrintAssets:
+    """
+    Recursos estáticos de impresión cargados una vez por proceso: el logo
+    (None si falta o no se puede leer), las métricas de las fuentes y los
+    anchos de los rótulos fijos.
+    """
+
+    def __init__(self, logo_path: Path = LOGO_PATH):
+        self.logo = None
+        try:
+            self.logo = _MemoryImage(logo_path.read_bytes())
+        except Exception:
+            self.logo = None
+
+        for font in PRINT_FONTS:
+            pdfmetrics.getFont(font)
+
+        font, size = LABEL_FONT
+        self.label_widths = {text: pdfmetrics.stringWidth(text, font, size) for text in LABEL_TEXTS}
+
+    def label_width(self, text: str, font: str = LABEL_FONT[0], size: float = LABEL_FONT[1]) -> float:
+        if (font, size) == LABEL_FONT and text in self.label_widths:
+            return self.label_widths[text]
+        return pdfmetrics.stringWidth(text, font, size)
+
+
+_assets = None
+_lock = threading.Lock()
+
+
+def get_print_assets() -> PrintAssets:
+    global _assets
+    if _assets is None:
+        with _lock:
+            if _assets is None:
+                _assets = PrintAssets()
+    return _assets
+
+
+def warm_print_assets() -> PrintAssets:
+    """Carga los recursos al arrancar, para que el primer PDF no pague la lectura."""
+    return get_print_assets()
@@ -0,0 +1,120 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import event
+from app import db
+from app.models.dispatch_model import Dispatch, DispatchProduct
+from app.utils.render_cache import get_render_cache, cache_key
+from app.utils.print_service import get_print_service
+from app.utils.print_utils import normalize_label_size
+
+# Formatos que se pueden pre-generar (los mismos de GET /print/<id>)
+PRERENDER_FORMATS = ("pos80", "label", "a4")
+# Despachos esperando pre-render; sobre esto se descartan (es solo una ayuda)
+PRERENDER_QUEUE_MAX = 100
+
+
+class PrintPrerenderer:
+    """
+    Genera en segundo plano el PDF del formato por defecto de los despachos
+    recién creados o editados y lo deja en la cache de impresión, con la
+    misma clave que usará GET /print/<id>. Un solo hilo; los ids repetidos
+    mientras esperan se procesan una vez.
+    """
+
+    def __init__(self, app, fmt: str, size: str = "4x6"):
+        self.app = app
+        self.fmt = fmt
+        self.size = normalize_label_size(size) if fmt == "label" else "-"
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="print-prerender")
+
+    def _slot(self, dispatch_id):
+        return ("despacho", dispatch_id, self.fmt, self.size)
+
+    def enqueue(self, dispatch_ids):
+        cache = get_render_cache(self.app)
+        for dispatch_id in dispatch_ids:
+            with self._lock:
+                if dispatch_id in self._queued or len(self._queued) >= PRERENDER_QUEUE_MAX:
+                    continue
+                self._queued.add(dispatch_id)
+            # Desde ya: un "Imprimir" inmediato espera este render en vez de repetirlo
+            cache.begin_pending(self._slot(dispatch_id))
+            self._executor.submit(self._run, dispatch_id)
+
+    def _run(self, dispatch_id):
+        from app.routes.print_routes import load_dispatch_print_data
+
+        with self._lock:
+            self._queued.discard(dispatch_id)
+        cache = get_render_cache(self.app)
+        try:
+            with self.app.app_context():
+                data = load_dispatch_print_data(dispatch_id)
+                if data is None:
+                    return
+                key = cache_key("despacho", dispatch_id, data, self.fmt, self.size)
+                if cache.get(key) is None:
+                    options = {"size": self.size} if self.fmt == "label" else {}
+                    cache.put(key, get_print_service(self.app).render(self.fmt, data, **options))
+        except Exception as e:
+            self.app.logger.warning(f"[PRINT PRERENDER] Despacho {dispatch_id}: {e}")
+        finally:
+            cache.end_pending(self._slot(dispatch_id))
+
+
+# ---------- Hook de sesión ----------
+
+def _after_flush(session, flush_context):
+    ids = session.info.setdefault("print_prerender_ids", set())
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Dispatch) and (obj in session.new or session.is_modified(obj)):
+            ids.add(obj.id)
+        elif isinstance(obj, DispatchProduct) and (obj in session.new or session.is_modified(obj)):
+            ids.add(obj.dispatch_id)
+    # Un despacho borrado en la misma transacción ya no se imprime
+    for obj in session.deleted:
+        if isinstance(obj, Dispatch):
+            ids.discard(obj.id)
+    if not ids:
+        session.info.pop("print_prerender_ids", None)
+
+
+def _after_commit(session):
+    ids = session.info.pop("print_prerender_ids", None)
+    if not ids:
+        return
+    try:
+        prerenderer = current_app.extensions.get("print_prerender")
+    except RuntimeError:
+        return  # sin app (scripts)
+    if prerenderer is not None:
+        prerenderer.enqueue(sorted(i for i in ids if i is not None))
+
+
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop("print_prerender_ids", None)
+
+
+def register_print_prerender(app):
+    """
+    Opcional: con PRINT_PRERENDER_FORMAT (config o env) = pos80 | label | a4,
+    cada commit que crea o edita despachos deja su PDF listo en la cache.
+    PRINT_PRERENDER_SIZE es el tamaño de la etiqueta (4x6 por defecto).
+    """
+    fmt = str(app.config.get("PRINT_PRERENDER_FORMAT", os.getenv("PRINT_PRERENDER_FORMAT", ""))).lower().strip()
+    if fmt not in PRERENDER_FORMATS:
+        return
+    size = app.config.get("PRINT_PRERENDER_SIZE", os.getenv("PRINT_PRERENDER_SIZE", "4x6"))
+    app.extensions.setdefault("print_prerender", PrintPrerenderer(app, fmt, size))
+
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("after_commit", _after_commit),
+        ("after_soft_rollback", _after_soft_rollback),
+    ):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
@@ -0,0 +1,188 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+
+# "process": los PDF se generan en un pool de procesos (no toman el GIL de
+# los hilos que atienden la API); "inline": en el hilo del request
+PRINT_RENDER_MODE = "process"
+PRINT_WORKERS = 2
+# Trabajos en curso + en espera; sobre esto se responde 503 de inmediato
+PRINT_QUEUE_MAX = 16
+# Segundos que un request espera su PDF antes de responder 504
+PRINT_TIMEOUT = 20.0
+
+# Tipo de render -> generador de print_utils (se resuelve en el worker)
+RENDERERS = {
+    "a4": "generar_hoja_despacho",
+    "label": "generar_etiqueta_despacho",
+    "pos80": "generar_ticket_pos80",
+    "lote": "generar_lote_despachos",
+}
+
+
+class PrintServiceBusy(Exception):
+    """La cola de impresión está llena."""
+
+
+class PrintServiceTimeout(Exception):
+    """El PDF no estuvo listo dentro de PRINT_TIMEOUT."""
+
+
+def _worker_init():
+    from app.utils.print_assets import warm_print_assets
+    warm_print_assets()
+
+
+def _render_job(kind: str, payload, options: dict) -> bytes:
+    from app.utils import print_utils
+    return getattr(print_utils, RENDERERS[kind])(payload, **options).getvalue()
+
+
+def _timed_render_job(kind: str, payload, options: dict):
+    """Corre en el worker: (pdf, ms de render)."""
+    t0 = time.perf_counter()
+    pdf = _render_job(kind, payload, options)
+    return pdf, (time.perf_counter() - t0) * 1000
+
+
+class PrintService:
+    """
+    Genera los PDF de print_utils fuera del hilo del request, en un
+    ProcessPoolExecutor acotado: como máximo `queue_max` trabajos entre en
+    curso y en espera (más allá, PrintServiceBusy) y cada request espera
+    hasta `timeout` segundos (PrintServiceTimeout). Lleva contadores para
+    GET /api/print/stats.
+    """
+
+    def __init__(self, mode=PRINT_RENDER_MODE, workers=PRINT_WORKERS,
+                 queue_max=PRINT_QUEUE_MAX, timeout=PRINT_TIMEOUT):
+        self.mode = mode
+        self.workers = workers
+        self.queue_max = queue_max
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {
+            "submitted": 0, "completed": 0, "failed": 0,
+            "timeouts": 0, "rejected": 0, "max_in_flight": 0,
+        }
+        self._render_ms_total = 0.0
+        self._wait_ms_total = 0.0
+        self._waited = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: no hereda hilos (scheduler, pool de BD) del proceso web
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_worker_init,
+                )
+            return self._pool
+
+    def _reset_pool(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                return
+            if future.exception() is None:
+                self._counters["completed"] += 1
+                self._render_ms_total += future.result()[1]
+            else:
+                self._counters["failed"] += 1
+
+    def render(self, kind: str, payload, **options) -> bytes:
+        """PDF (bytes) de `RENDERERS[kind](payload, **options)`."""
+        if self.mode != "process":
+            return _render_job(kind, payload, options)
+
+        with self._lock:
+            if self._in_flight >= self.queue_max:
+                self._counters["rejected"] += 1
+                raise PrintServiceBusy()
+            self._in_flight += 1
+            self._counters["submitted"] += 1
+            self._counters["max_in_flight"] = max(self._counters["max_in_flight"], self._in_flight)
+
+        started = time.perf_counter()
+        try:
+            future = self._executor().submit(_timed_render_job, kind, payload, options)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        # El cupo se libera cuando el worker termina, no cuando el request deja de esperar
+        future.add_done_callback(self._done)
+
+        try:
+            pdf, _ = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise PrintServiceTimeout()
+        except BrokenProcessPool:
+            # Un worker murió (OOM, kill): se recrea el pool y este PDF se hace aquí
+            current_app.logger.error("[PRINT] Pool de impresión roto, se recrea")
+            self._reset_pool()
+            return _render_job(kind, payload, options)
+
+        with self._lock:
+            self._waited += 1
+            self._wait_ms_total += (time.perf_counter() - started) * 1000
+        return pdf
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            in_flight = self._in_flight
+            render_ms, wait_ms, waited = self._render_ms_total, self._wait_ms_total, self._waited
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "queue_max": self.queue_max,
+            "timeout_s": self.timeout,
+            "in_flight": in_flight,
+            # Trabajos esperando un worker libre (profundidad de cola)
+            "queued": max(0, in_flight - self.workers),
+            **counters,
+            # Render en el worker vs. lo que esperó el request (cola + render + IPC)
+            "avg_render_ms": round(render_ms / (counters["completed"] or 1), 2),
+            "avg_wait_ms": round(wait_ms / (waited or 1), 2),
+        }
+
+
+def get_print_service(app=None) -> PrintService:
+    """
+    Servicio del proceso (uno por app). PRINT_RENDER_MODE, PRINT_WORKERS,
+    PRINT_QUEUE_MAX y PRINT_TIMEOUT se leen de la config o del entorno.
+    """
+    app = app or current_app._get_current_object()
+    service = app.extensions.get("print_service")
+    if service is None:
+        def setting(name, default, cast):
+            return cast(app.config.get(name, os.getenv(name, default)))
+
+        service = app.extensions.setdefault("print_service", PrintService(
+            mode=setting("PRINT_RENDER_MODE", PRINT_RENDER_MODE, str).lower(),
+            workers=setting("PRINT_WORKERS", PRINT_WORKERS, int),
+            queue_max=setting("PRINT_QUEUE_MAX", PRINT_QUEUE_MAX, int),
+            timeout=setting("PRINT_TIMEOUT", PRINT_TIMEOUT, float),
+        ))
+    return service
+
+
+def render_pdf(kind: str, payload, **options) -> bytes:
+    return get_print_service().render(kind, payload, **options)
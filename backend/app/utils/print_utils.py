@@ -3,13 +3,21 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.lib import colors
 from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
 from barcode import Code128
 from barcode.writer import ImageWriter
 from io import BytesIO
-from pathlib import Path
+import os
 import re
+from app.utils.print_assets import get_print_assets
 
-LOGO_PATH = Path(__file__).resolve().parent.parent / "static" / "logo.jpg"
+# Cómo se dibuja el Code128: "vector" (barras como rectángulos del PDF) o
+# "raster" (PNG de python-barcode incrustado; se deja para comparar)
+BARCODE_BACKEND = os.getenv("PRINT_BARCODE_BACKEND", "vector").lower()
+# Ancho máximo de una barra mínima (mismo module_width del raster) y
+# zona de silencio a cada lado, en módulos (10 según la norma Code128)
+BARCODE_MODULE_MAX_W = 0.40 * mm
+BARCODE_QUIET_MODULES = 10
 
 # ---------- Helpers de código de barras ----------
 
@@ -39,11 +47,44 @@ def _gen_code128_image(text: str) -> BytesIO:
     out.seek(0)
     return out
 
+def _code128_modules(text: str) -> str:
+    """
+    Secuencia de módulos ('1' = barra, '0' = espacio) del mismo Code128 que
+    genera el raster: mismo saneo y mismo codificador de python-barcode.
+    """
+    payload = _sanitize_barcode_text(text)
+    return "".join(Code128(payload).build())
+
+def _draw_code128(c, text: str, x: float, y: float, w: float, h: float, backend: str | None = None):
+    """
+    Dibuja el código de barras centrado en la caja (x, y, w, h).
+    En modo vector cada racha de barras es un rectángulo relleno, sin
+    imagen intermedia; el PDF queda más liviano y nítido a cualquier escala.
+    """
+    if (backend or BARCODE_BACKEND) == "raster":
+        img = ImageReader(_gen_code128_image(text))
+        c.drawImage(img, x, y, width=w, height=h, preserveAspectRatio=True, mask="auto")
+        return
+
+    modules = _code128_modules(text)
+    mw = min(w / (len(modules) + 2 * BARCODE_QUIET_MODULES), BARCODE_MODULE_MAX_W)
+    x0 = x + (w - len(modules) * mw) / 2.0
+
+    path = c.beginPath()
+    for m in re.finditer(r"1+", modules):
+        path.rect(x0 + m.start() * mw, y, (m.end() - m.start()) * mw, h)
+    c.saveState()
+    c.setFillColor(colors.black)
+    c.drawPath(path, stroke=0, fill=1)
+    c.restoreState()
+
 def _wrap_text(c, text: str, max_w: float, font: str = "Helvetica", size: float = 10.0) -> list[str]:
     """
     Divide `text` en varias líneas para que ninguna supere `max_w`
-    con la fuente/tamaño dados.
+    con la fuente/tamaño dados. `c` puede ser None: el ancho sale de las
+    métricas de la fuente, igual que en canvas.stringWidth.
     """
+    string_width = c.stringWidth if c is not None else pdfmetrics.stringWidth
     text = str(text or "")
     words = text.split()
     if not words:
@@ -52,7 +93,7 @@ def _wrap_text(c, text: str, max_w: float, font: str = "Helvetica", size: float
     current = words[0]
     for w in words[1:]:
         test = current + " " + w
-        if c.stringWidth(test, font, size) <= max_w:
+        if string_width(test, font, size) <= max_w:
             current = test
         else:
             lines.append(current)
@@ -63,7 +104,7 @@ def _wrap_text(c, text: str, max_w: float, font: str = "Helvetica", size: float
 
 # ---------- A4 (documento) ----------
 
-def generar_hoja_despacho(d: dict) -> BytesIO:
+def generar_hoja_despacho(d: dict, barcode_backend: str | None = None) -> BytesIO:
     """
     Documento A4 con detalle + código de barras grande.
     d = {
@@ -73,6 +114,14 @@ def generar_hoja_despacho(d: dict) -> BytesIO:
     """
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=A4)
+    _draw_hoja_despacho(c, d, barcode_backend)
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+def _draw_hoja_despacho(c, d: dict, barcode_backend: str | None = None):
+    """Dibuja el A4 en `c` desde una página nueva (más páginas si el detalle no cabe)."""
+    c.setPageSize(A4)
     W, H = A4
     M = 18 * mm
     y_top = H - M
@@ -83,9 +132,9 @@ def generar_hoja_despacho(d: dict) -> BytesIO:
     header_used_h = 0
     drew_logo = False
 
-    if LOGO_PATH.exists():
+    logo_img = get_print_assets().logo
+    if logo_img is not None:
         try:
-            logo_img = ImageReader(str(LOGO_PATH))
             y_logo = y_top - logo_h + 1 * mm  # leve ajuste
             c.drawImage(logo_img, M, y_logo, width=logo_w, height=logo_h, mask="auto")
             drew_logo = True
@@ -172,12 +221,10 @@ def generar_hoja_despacho(d: dict) -> BytesIO:
 
     barcode_text = d.get("codigo_barras", "")
     try:
-        barcode_img_buf = _gen_code128_image(barcode_text)
-        img = ImageReader(barcode_img_buf)
         bw = 130 * mm
         bh = 28 * mm
         x = (W - bw) / 2.0
-        c.drawImage(img, x, y, width=bw, height=bh, preserveAspectRatio=True, mask="auto")
+        _draw_code128(c, barcode_text, x, y, bw, bh, barcode_backend)
     except Exception:
         c.setFont("Helvetica-Oblique", 10)
         c.setFillColor(colors.red)
@@ -191,29 +238,41 @@ def generar_hoja_despacho(d: dict) -> BytesIO:
     c.setFillColor(colors.black)
 
     c.showPage()
-    c.save()
-    buffer.seek(0)
-    return buffer
 
 # ---------- Etiqueta 4x6 in (térmica) ----------
 
-def _page_size_from_label(size: str):
-    size = (size or "").lower().strip()
-    # 100 mm x 150 mm (vertical)
-    if size in ("4x6", "4×6", "4in x 6in", "4 in x 6 in", "100x150", "100mm x 150mm"):
-        return (100 * mm, 150 * mm)
+def normalize_label_size(size: str) -> str:
+    """
+    Tamaño canónico de etiqueta ("4x6" o "6x4"). Todo alias o valor
+    desconocido da el mismo PDF que su canónico, así que la cache y el
+    ETag se arman con este valor y no con el ?size= recibido.
+    """
+    size = str(size or "").lower().strip()
     if size in ("6x4", "6×4"):
-        return (150 * mm, 100 * mm)  # horizontal, 150 x 100 mm
-    # por defecto también 100 x 150 mm
+        return "6x4"  # horizontal, 150 x 100 mm
+    # "4x6", "4×6", "100x150", ... y por defecto: 100 mm x 150 mm (vertical)
+    return "4x6"
+
+def _page_size_from_label(size: str):
+    if normalize_label_size(size) == "6x4":
+        return (150 * mm, 100 * mm)
     return (100 * mm, 150 * mm)
 
-def generar_etiqueta_despacho(d: dict, size: str = "4x6") -> BytesIO:
+def generar_etiqueta_despacho(d: dict, size: str = "4x6", barcode_backend: str | None = None) -> BytesIO:
     """
     Etiqueta 4x6 con campos nuevos.
     """
     buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=_page_size_from_label(size))
+    _draw_etiqueta_despacho(c, d, size, barcode_backend)
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+def _draw_etiqueta_despacho(c, d: dict, size: str = "4x6", barcode_backend: str | None = None):
+    """Dibuja la etiqueta en `c` como una página nueva."""
     PAGE_W, PAGE_H = _page_size_from_label(size)
-    c = canvas.Canvas(buffer, pagesize=(PAGE_W, PAGE_H))
+    c.setPageSize((PAGE_W, PAGE_H))
     Mx = 6 * mm
     My = 8 * mm
     y_top = PAGE_H - My
@@ -223,9 +282,9 @@ def generar_etiqueta_despacho(d: dict, size: str = "4x6") -> BytesIO:
     header_used_h = 0
     drew_logo = False
 
-    if LOGO_PATH.exists():
+    logo_img = get_print_assets().logo
+    if logo_img is not None:
         try:
-            logo_img = ImageReader(str(LOGO_PATH))
             y_logo = y_top - logo_h + 1 * mm
             c.drawImage(logo_img, Mx, y_logo, width=logo_w, height=logo_h, mask="auto")
             drew_logo = True
@@ -266,7 +325,7 @@ def generar_etiqueta_despacho(d: dict, size: str = "4x6") -> BytesIO:
         return (text + ell) if text else ""
 
     def _draw_label_value(x, width, label, value):
-        lbl_w = c.stringWidth(label, "Helvetica", 10.5)
+        lbl_w = get_print_assets().label_width(label)
         max_val_w = max(0, width - lbl_w - 2)
         val_fitted = _fit(value, max_val_w)
         c.drawString(x, y, label)
@@ -376,132 +435,85 @@ def generar_etiqueta_despacho(d: dict, size: str = "4x6") -> BytesIO:
     # Código de barras centrado (tamaño fijo)
     try:
         barcode_text = d.get("codigo_barras", "")
-        barcode_img_buf = _gen_code128_image(barcode_text)
-        img = ImageReader(barcode_img_buf)
-
         bw = min(PAGE_W - 2 * Mx, 90 * mm)
         bh = 28 * mm
         x = (PAGE_W - bw) / 2.0
         y_bar = max(y - bh, 10 * mm)
-        c.drawImage(img, x, y_bar, width=bw, height=bh, preserveAspectRatio=True, mask="auto")
+        _draw_code128(c, barcode_text, x, y_bar, bw, bh, barcode_backend)
     except Exception:
         c.setFont("Helvetica-Oblique", 9)
         c.setFillColor(colors.red)
         c.drawString(Mx, y, "No se pudo generar el código de barras.")
         c.setFillColor(colors.black)
 
-    c.save()
-    buffer.seek(0)
-    return buffer
+    c.showPage()
 
 
 # --- POS 80 mm (ticket con largo variable) -------------------------------
 
-def _measure_ticket_pos80_height(c, d: dict) -> float:
-    W = 80 * mm
-    Mx = 4 * mm
-    My = 4 * mm
-    line_w = W - 2 * Mx
+POS80_W = 80 * mm
+POS80_MARGIN = 4 * mm
+POS80_MIN_H = 120 * mm
 
-    logo_h = 12 * mm if LOGO_PATH.exists() else 0
-    header_h = max(logo_h, 14 * mm) + 3 * mm  # bloque superior
 
-    body = 0
-    row_h = 11
+class _Pos80Layout:
+    """
+    Ticket POS80 ya diagramado: cada elemento con su distancia desde el
+    borde superior (dy) y el alto total de la página. Se arma en una sola
+    pasada (cada texto se envuelve una vez) y el render solo lo recorre,
+    así el alto medido y lo dibujado no pueden desalinearse.
+    """
 
-    # Común: Fecha y Registrado por
-    body += row_h  # Fecha
-    body += row_h  # Registrado por
+    def __init__(self):
+        self.items = []
+        self.dy = POS80_MARGIN
 
-    # Específicos por tipo
-    if "chofer" in d:  # Es un despacho
-        body += row_h  # Chofer
-        body += row_h  # Centro de Costo
-        body += 9      # raya + aire
-        body += 12     # Orden
-        if d.get("paquete_numero"):
-            body += 12
-        if d.get("factura_numero"):
-            body += 12
-    elif "credit_note_number" in d:  # NUEVO: Nota de Crédito
-        body += row_h  # Centro de Costo
-        body += row_h  # Orden
-        body += row_h  # Factura N°
-        body += row_h  # Nota de Crédito N°
-        body += row_h  # Motivo
-        body += 9      # raya + aire
-    else:  # Es un consumo interno
-        body += row_h  # Nombre quien retira
-        body += row_h  # Área
-        body += row_h  # Motivo
-        body += 9      # raya + aire
+    def text(self, x: float, s: str, font: str = "Helvetica", size: float = 10.5,
+             dy: float | None = None, right: bool = False):
+        self.items.append(("text", x, self.dy if dy is None else dy, (s, font, size, right)))
 
-    # Productos común
-    productos = d.get("productos", []) or []
-    if productos:
-        body += 11  # título
-        line_h = 11
-        c.setFont("Helvetica", 10)
-        for idx, item in enumerate(productos, start=1):
-            prefix = f"{idx}. "
-            pref_w = c.stringWidth(prefix, "Helvetica", 10)
-            max_w_text = max(0, line_w - pref_w)
-            lines = _wrap_text(c, str(item), max_w_text, "Helvetica", 10)
-            body += line_h * max(1, len(lines))
+    def wrapped(self, x: float, s: str, max_w: float, font: str = "Helvetica",
+                size: float = 10.5, line_h: float = 11):
+        for line in _wrap_text(None, s, max_w, font, size):
+            self.text(x, line, font, size)
+            self.dy += line_h
 
-    body += 10      # separador antes del código (solo si hay código)
-    if "codigo_barras" in d:  # Solo para despachos
-        bh = 28 * mm    # alto del código
-        body += bh
+    def rule(self, x1: float, x2: float, width: float):
+        self.items.append(("rule", x1, self.dy, (x2, width)))
 
-    total = My + max(header_h, 0) + body + My
-    return max(total, 120 * mm)
+    def box(self, kind: str, x: float, w: float, h: float, *args):
+        """Logo o código de barras; dy es el borde inferior de la caja."""
+        self.items.append((kind, x, self.dy + h, (w, h) + args))
 
+    @property
+    def height(self) -> float:
+        return max(self.dy + POS80_MARGIN, POS80_MIN_H)
 
-def generar_ticket_pos80(d: dict) -> BytesIO:
-    buffer = BytesIO()
 
-    W = 80 * mm
-    Mx = 4 * mm
-    My = 4 * mm
+def _layout_ticket_pos80(d: dict) -> _Pos80Layout:
+    W = POS80_W
+    Mx = POS80_MARGIN
     line_w = W - 2 * Mx
-
-    # Calculamos la altura necesaria
-    _c_measure = canvas.Canvas(BytesIO(), pagesize=(W, 500 * mm))
-    H = _measure_ticket_pos80_height(_c_measure, d)
-
-    c = canvas.Canvas(buffer, pagesize=(W, H))
-    y = H - My
+    L = _Pos80Layout()
 
     # Header: logo + empresa en una línea (logo un poco más arriba)
-    title_fs = 14
     logo_w, logo_h = (12 * mm, 12 * mm)
-    drew_logo = False
-    if LOGO_PATH.exists():
-        try:
-            logo_img = ImageReader(str(LOGO_PATH))
-            y_logo = y - logo_h + 3 * mm  # subir logo
-            c.drawImage(logo_img, Mx, y_logo, width=logo_w, height=logo_h, mask="auto")
-            drew_logo = True
-        except Exception:
-            drew_logo = False
-
-    c.setFont("Helvetica-Bold", title_fs)
-    if drew_logo:
-        c.drawString(Mx + logo_w + 6 * mm, y - 4 * mm, d.get("empresa", ""))
+    if get_print_assets().logo is not None:
+        L.dy -= 3 * mm  # subir logo
+        L.box("logo", Mx, logo_w, logo_h)
+        L.dy += 3 * mm
+        L.text(Mx + logo_w + 6 * mm, d.get("empresa", ""), "Helvetica-Bold", 14, dy=L.dy + 4 * mm)
         used_h = logo_h
     else:
-        c.drawString(Mx, y - 5 * mm, d.get("empresa", ""))
+        L.text(Mx, d.get("empresa", ""), "Helvetica-Bold", 14, dy=L.dy + 5 * mm)
         used_h = 14 * mm
 
     # Folio (gris)
-    c.setFont("Helvetica", 9.5)
-    c.drawRightString(W - Mx, y - 10 * mm, f"Folio: {d.get('folio','')}")
+    L.text(W - Mx, f"Folio: {d.get('folio','')}", "Helvetica", 9.5, dy=L.dy + 10 * mm, right=True)
 
-    y -= used_h + 3 * mm
+    L.dy += used_h + 3 * mm
 
     # ---- Campos comunes y específicos ----
-    c.setFont("Helvetica", 10.5)
     w_left = (W - 2 * Mx) * 0.55
     w_right = (W - 2 * Mx) * 0.45
     x_left = Mx
@@ -509,122 +521,149 @@ def generar_ticket_pos80(d: dict) -> BytesIO:
     line_h = 11
 
     # Fecha (izq) y Registrado por (der)
-    fecha_lines = _wrap_text(c, f"Fecha: {d.get('fecha','')}", w_left, "Helvetica", 10.5)
-    auxiliar_lines = _wrap_text(c, f"Despachado por: {d.get('auxiliar','')}", w_right, "Helvetica", 10.5)
+    fecha_lines = _wrap_text(None, f"Fecha: {d.get('fecha','')}", w_left, "Helvetica", 10.5)
+    auxiliar_lines = _wrap_text(None, f"Despachado por: {d.get('auxiliar','')}", w_right, "Helvetica", 10.5)
     for i in range(max(len(fecha_lines), len(auxiliar_lines))):
         if i < len(fecha_lines):
-            c.drawString(x_left, y, fecha_lines[i])
+            L.text(x_left, fecha_lines[i])
         if i < len(auxiliar_lines):
-            c.drawString(x_right, y, auxiliar_lines[i])
-        y -= line_h
+            L.text(x_right, auxiliar_lines[i])
+        L.dy += line_h
 
     # Específicos por tipo
     if "chofer" in d:  # Despacho
-        chofer_lines = _wrap_text(c, f"Chofer: {d.get('chofer','')}", w_right, "Helvetica", 10.5)
-        for line in chofer_lines:
-            c.drawString(Mx, y, line)
-            y -= line_h
-        cliente_lines = _wrap_text(c, f"Centro de Costo: {d.get('cliente','')}", line_w, "Helvetica", 10.5)
-        for line in cliente_lines:
-            c.drawString(Mx, y, line)
-            y -= line_h
+        L.wrapped(Mx, f"Chofer: {d.get('chofer','')}", w_right)
+        L.wrapped(Mx, f"Centro de Costo: {d.get('cliente','')}", line_w)
         # Línea separadora
-        c.setLineWidth(0.5)
-        c.line(Mx, y, W - Mx, y)
-        y -= 12
-        c.drawString(Mx, y, f"Orden: {d.get('orden','')}")
-        y -= 12
+        L.rule(Mx, W - Mx, 0.5)
+        L.dy += 12
+        L.text(Mx, f"Orden: {d.get('orden','')}")
+        L.dy += 12
         if d.get("paquete_numero"):
-            c.drawString(Mx, y, f"Paquete N°: {d.get('paquete_numero')}")
-            y -= 12
+            L.text(Mx, f"Paquete N°: {d.get('paquete_numero')}")
+            L.dy += 12
         if d.get("factura_numero"):
-            c.drawString(Mx, y, f"Factura N°: {d.get('factura_numero')}")
-            y -= 12
-    elif "credit_note_number" in d:  # NUEVO: Nota de Crédito
-        cliente_lines = _wrap_text(c, f"Centro de Costo: {d.get('cliente','')}", line_w, "Helvetica", 10.5)
-        for line in cliente_lines:
-            c.drawString(Mx, y, line)
-            y -= line_h
-        orden_lines = _wrap_text(c, f"Orden: {d.get('orden','')}", line_w, "Helvetica", 10.5)
-        for line in orden_lines:
-            c.drawString(Mx, y, line)
-            y -= line_h
-        factura_lines = _wrap_text(c, f"Factura N°: {d.get('factura_numero','')}", line_w, "Helvetica", 10.5)
-        for line in factura_lines:
-            c.drawString(Mx, y, line)
-            y -= line_h
-        credit_note_lines = _wrap_text(c, f"Nota de Crédito N°: {d.get('credit_note_number','')}", line_w, "Helvetica", 10.5)
-        for line in credit_note_lines:
-            c.drawString(Mx, y, line)
-            y -= line_h
-        motivo_lines = _wrap_text(c, f"Motivo: {d.get('motivo','')}", line_w, "Helvetica", 10.5)
-        for line in motivo_lines:
-            c.drawString(Mx, y, line)
-            y -= line_h
+            L.text(Mx, f"Factura N°: {d.get('factura_numero')}")
+            L.dy += 12
+    elif "credit_note_number" in d:  # Nota de Crédito
+        L.wrapped(Mx, f"Centro de Costo: {d.get('cliente','')}", line_w)
+        L.wrapped(Mx, f"Orden: {d.get('orden','')}", line_w)
+        L.wrapped(Mx, f"Factura N°: {d.get('factura_numero','')}", line_w)
+        L.wrapped(Mx, f"Nota de Crédito N°: {d.get('credit_note_number','')}", line_w)
+        L.wrapped(Mx, f"Motivo: {d.get('motivo','')}", line_w)
         # Línea separadora
-        c.setLineWidth(0.5)
-        c.line(Mx, y, W - Mx, y)
-        y -= 12
+        L.rule(Mx, W - Mx, 0.5)
+        L.dy += 12
     else:  # Consumo interno
-        nombre_lines = _wrap_text(c, f"Nombre quien retira: {d.get('nombre_retira','')}", line_w, "Helvetica", 10.5)
-        for line in nombre_lines:
-            c.drawString(Mx, y, line)
-            y -= line_h
-        area_lines = _wrap_text(c, f"Área: {d.get('area','')}", line_w, "Helvetica", 10.5)
-        for line in area_lines:
-            c.drawString(Mx, y, line)
-            y -= line_h
-        motivo_lines = _wrap_text(c, f"Motivo: {d.get('motivo','')}", line_w, "Helvetica", 10.5)
-        for line in motivo_lines:
-            c.drawString(Mx, y, line)
-            y -= line_h
+        L.wrapped(Mx, f"Nombre quien retira: {d.get('nombre_retira','')}", line_w)
+        L.wrapped(Mx, f"Área: {d.get('area','')}", line_w)
+        L.wrapped(Mx, f"Motivo: {d.get('motivo','')}", line_w)
         # Línea separadora
-        c.setLineWidth(0.5)
-        c.line(Mx, y, W - Mx, y)
-        y -= 12
+        L.rule(Mx, W - Mx, 0.5)
+        L.dy += 12
 
     # Productos común
     productos = d.get("productos", []) or []
     if productos:
-        c.setFont("Helvetica-Bold", 10.5)
-        c.drawString(Mx, y, "Productos:")
-        y -= 11
+        L.text(Mx, "Productos:", "Helvetica-Bold", 10.5)
+        L.dy += 11
 
-        c.setFont("Helvetica", 10)
         for idx, item in enumerate(productos, start=1):
             prefix = f"{idx}. "
-            pref_w = c.stringWidth(prefix, "Helvetica", 10)
+            pref_w = pdfmetrics.stringWidth(prefix, "Helvetica", 10)
             max_w_text = max(0, line_w - pref_w)
-            lines = _wrap_text(c, str(item), max_w_text, "Helvetica", 10)
+            lines = _wrap_text(None, str(item), max_w_text, "Helvetica", 10)
             for j, ln in enumerate(lines):
                 if j == 0:
-                    c.drawString(Mx, y, prefix + ln)
+                    L.text(Mx, prefix + ln, "Helvetica", 10)
                 else:
-                    c.drawString(Mx + pref_w, y, ln)
-                y -= line_h
+                    L.text(Mx + pref_w, ln, "Helvetica", 10)
+                L.dy += line_h
 
-    # Separador antes del código (solo si hay código)
+    # Separador y código de barras (solo despachos)
     if "codigo_barras" in d:
-        y -= 4
-        c.setLineWidth(0.4)
-        c.line(Mx, y, W - Mx, y)
-        y -= 6
+        L.dy += 4
+        L.rule(Mx, W - Mx, 0.4)
+        L.dy += 6
+
+        bw = min(line_w, 58 * mm)
+        bh = 28 * mm
+        L.box("barcode", (W - bw) / 2.0, bw, bh, d.get("codigo_barras", ""))
+        L.dy += bh
+
+    return L
+
+
+def generar_ticket_pos80(d: dict, barcode_backend: str | None = None) -> BytesIO:
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(POS80_W, POS80_MIN_H))
+    _draw_ticket_pos80(c, d, barcode_backend)
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+
+def _draw_ticket_pos80(c, d: dict, barcode_backend: str | None = None):
+    """Dibuja el ticket en `c` como una página nueva, del alto que necesite."""
+    layout = _layout_ticket_pos80(d)
+    H = layout.height
+
+    c.setPageSize((POS80_W, H))
+    current_font = None
+    for kind, x, dy, args in layout.items:
+        y = H - dy
+        if kind == "text":
+            s, font, size, right = args
+            if (font, size) != current_font:
+                c.setFont(font, size)
+                current_font = (font, size)
+            if right:
+                c.drawRightString(x, y, s)
+            else:
+                c.drawString(x, y, s)
+        elif kind == "rule":
+            x2, width = args
+            c.setLineWidth(width)
+            c.line(x, y, x2, y)
+        elif kind == "logo":
+            w, h = args
+            try:
+                c.drawImage(get_print_assets().logo, x, y, width=w, height=h, mask="auto")
+            except Exception:
+                pass
+        elif kind == "barcode":
+            w, h, text = args
+            try:
+                _draw_code128(c, text, x, y, w, h, barcode_backend)
+            except Exception:
+                c.setFont("Helvetica-Oblique", 9)
+                c.setFillColor(colors.red)
+                c.drawString(POS80_MARGIN, y + h, "No se pudo generar el código de barras.")
+                c.setFillColor(colors.black)
+                current_font = ("Helvetica-Oblique", 9)
+
+    c.showPage()
 
-        # Código de barras
-        try:
-            barcode_img_buf = _gen_code128_image(d.get("codigo_barras", ""))
-            img = ImageReader(barcode_img_buf)
-            bw = min(line_w, 58 * mm)
-            bh = 28 * mm
-            x = (W - bw) / 2.0
-            c.drawImage(img, x, y - bh, width=bw, height=bh, preserveAspectRatio=True, mask="auto")
-            y -= bh
-        except Exception:
-            c.setFont("Helvetica-Oblique", 9)
-            c.setFillColor(colors.red)
-            c.drawString(Mx, y, "No se pudo generar el código de barras.")
-            c.setFillColor(colors.black)
 
+# ---------- Lote: varios despachos en un solo PDF ----------
+
+def generar_lote_despachos(docs: list[dict], fmt: str = "a4", size: str = "4x6",
+                           barcode_backend: str | None = None) -> BytesIO:
+    """
+    Un PDF con una página por despacho (un A4 largo puede ocupar más) en
+    el formato pedido: "label", "pos80" o "a4". Cada `d` tiene la misma
+    forma que en los generadores individuales; el logo se incrusta una
+    sola vez para todo el documento.
+    """
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer)
+    for d in docs:
+        if fmt == "pos80":
+            _draw_ticket_pos80(c, d, barcode_backend)
+        elif fmt == "label":
+            _draw_etiqueta_despacho(c, d, size, barcode_backend)
+        else:
+            _draw_hoja_despacho(c, d, barcode_backend)
     c.save()
     buffer.seek(0)
-    return buffer
\ No newline at end of file
+    return buffer
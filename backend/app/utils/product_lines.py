@@ -0,0 +1,127 @@
+from collections import defaultdict
+from sqlalchemy import func, select
+from app import db
+from app.models.product_model import Product
+from app.models.dispatch_model import DispatchProduct
+from app.models.receipt_model import ReceiptProduct
+from app.models.production_model import ProductionProduct
+from app.models.credit_note_model import CreditNoteProduct
+from app.models.internal_consumption_model import InternalConsumptionProduct
+from app.routes.product_routes import normalize_product_name
+from app.utils.dispatch_sync import record_dispatch_changes
+from app.utils.dispatch_view import touch_dispatch_views
+
+# Tablas de líneas que referencian productos (nombre + product_id)
+LINE_MODELS = (
+    DispatchProduct,
+    ReceiptProduct,
+    ProductionProduct,
+    CreditNoteProduct,
+    InternalConsumptionProduct,
+)
+
+
+class ProductCatalog:
+    """
+    Resuelve nombres de líneas a Product con normalize_product_name (sin
+    acentos ni espacios), creando el producto en "Otros" si no existe, como
+    hacían las rutas. El catálogo completo se carga una sola vez y solo si
+    hace falta buscar por nombre; las líneas enlazadas van por product_id.
+    """
+
+    def __init__(self):
+        self._by_key = None
+        self._by_id = {}
+
+    def _load_all(self):
+        if self._by_key is None:
+            self._by_key = {}
+            for p in Product.query.all():
+                self._by_key.setdefault(normalize_product_name(p.name), p)
+                self._by_id[p.id] = p
+
+    def preload_ids(self, ids):
+        faltan = {i for i in ids if i is not None and i not in self._by_id}
+        if faltan:
+            for p in Product.query.filter(Product.id.in_(faltan)).all():
+                self._by_id[p.id] = p
+
+    def find(self, nombre: str):
+        self._load_all()
+        return self._by_key.get(normalize_product_name(nombre or ""))
+
+    def resolve(self, nombre: str, created_by):
+        """Producto para `nombre`; lo crea (categoría "Otros", stock 0) si falta."""
+        prod = self.find(nombre)
+        if prod is None:
+            prod = Product(name=nombre, category="Otros", created_by=created_by, stock=0.0)
+            db.session.add(prod)
+            db.session.flush()
+            self._by_key[normalize_product_name(nombre)] = prod
+            self._by_id[prod.id] = prod
+        return prod
+
+    def for_line(self, line):
+        """Producto de una línea existente: por product_id, o por nombre si es una línea antigua sin enlazar."""
+        if line.product_id is not None:
+            self.preload_ids([line.product_id])
+            return self._by_id.get(line.product_id)
+        return self.find(line.nombre)
+
+
+def qty_by_product(lines, catalog: ProductCatalog):
+    """Suma cantidades por producto ({Product: cantidad}); ignora líneas sin producto."""
+    lines = list(lines)
+    catalog.preload_ids([line.product_id for line in lines])
+    totales = defaultdict(float)
+    for line in lines:
+        prod = catalog.for_line(line)
+        if prod is not None:
+            totales[prod] += float(line.cantidad or 0)
+    return totales
+
+
+def _update_lines(condition_for, values_for):
+    """
+    UPDATE masivo en las tablas de líneas. No pasa por el flush del ORM, así
+    que los despachos afectados se registran a mano (se leen antes del
+    UPDATE, que puede cambiar la condición) para el sync de choferes y
+    para rearmar su snapshot de dispatch_view.
+    """
+    dispatch_ids = set(db.session.execute(
+        select(DispatchProduct.dispatch_id).where(condition_for(DispatchProduct)).distinct()
+    ).scalars())
+    for model in LINE_MODELS:
+        db.session.query(model).filter(condition_for(model)).update(
+            values_for(model), synchronize_session=False
+        )
+    record_dispatch_changes(dispatch_ids)
+    touch_dispatch_views(dispatch_ids)
+    return dispatch_ids
+
+
+def link_orphan_lines(product: Product):
+    """
+    Enlaza al producto las líneas antiguas sin product_id que tengan su
+    nombre (p. ej. producto borrado y vuelto a crear).
+    """
+    return _update_lines(
+        lambda model: (model.product_id.is_(None)) & (func.lower(model.nombre) == product.name.lower()),
+        lambda model: {model.product_id: product.id},
+    )
+
+
+def rename_product_lines(product: Product):
+    """Propaga el nombre del producto a sus líneas (copia para mostrar), por product_id."""
+    return _update_lines(
+        lambda model: model.product_id == product.id,
+        lambda model: {model.nombre: product.name},
+    )
+
+
+def unlink_product_lines(product: Product):
+    """Deja sin product_id las líneas del producto (antes de borrarlo)."""
+    return _update_lines(
+        lambda model: model.product_id == product.id,
+        lambda model: {model.product_id: None},
+    )
@@ -0,0 +1,25 @@
+from sqlalchemy import func, select, update
+from app import db
+from app.models.product_model import Product
+from app.models.dispatch_model import DispatchProduct
+from app.utils.catalog_cache import bump_catalog_versions
+
+
+def rebuild_product_usage() -> int:
+    """
+    Recalcula Product.usage desde todo el histórico de DispatchProduct
+    (líneas enlazadas por product_id).
+    Un solo UPDATE con subconsulta correlacionada. Devuelve filas afectadas.
+    No pasa por el flush: la versión del catálogo se sube a mano.
+    """
+    total = (
+        select(func.coalesce(func.sum(DispatchProduct.cantidad), 0.0))
+        .where(DispatchProduct.product_id == Product.id)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(Product).values(usage=total).execution_options(synchronize_session=False)
+    )
+    bump_catalog_versions({"products"})
+    db.session.commit()
+    return result.rowcount
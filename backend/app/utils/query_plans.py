@@ -0,0 +1,259 @@
+import json
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import select, text
+from app import db
+from app.models.dispatch_model import Dispatch, DispatchProduct, DispatchImage
+from app.models.dispatch_edit_model import DispatchEditLog
+from app.models.production_model import Production, ProductionProduct
+from app.models.operator_activity_model import OperatorActivity
+from app.models.receipt_model import Receipt, ReceiptProduct
+from app.models.credit_note_model import CreditNote, CreditNoteProduct
+from app.models.internal_consumption_model import InternalConsumption, InternalConsumptionProduct
+from app.models.product_model import Product
+from app.utils.pending_dispatches import pending_filter, PENDING_ALERT_DAYS
+from app.utils.stock_rules import low_stock_condition
+from app.utils.month_range import month_filter, month_utc_bounds
+from app.utils.timezone import to_local
+
+# SQLite: "SCAN dispatch" (o "SCAN TABLE dispatch" en versiones viejas) sin
+# "USING ... INDEX" es un recorrido completo de la tabla
+_SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+
+# ---------- Valores de muestra ----------
+
+def _first(stmt, default=None):
+    value = db.session.execute(stmt).scalar()
+    return default if value is None else value
+
+
+def sample_params():
+    """
+    Valores reales del dataset para armar las consultas (un chofer, un
+    usuario, una orden, el último mes con movimientos, una página de ids...),
+    para que el plan sea el de una consulta que la app sí haría.
+    """
+    ultimo = db.session.execute(
+        select(Dispatch).order_by(Dispatch.fecha.desc()).limit(1)
+    ).scalar()
+    ref = to_local(ultimo.fecha if ultimo else datetime.utcnow())
+    desde, hasta = month_utc_bounds(ref.year, ref.month)
+
+    def ids(model):
+        return [i for (i,) in db.session.execute(
+            select(model.id).order_by(model.id.desc()).limit(50)
+        )] or [0]
+
+    production = db.session.execute(
+        select(Production).order_by(Production.fecha.desc()).limit(1)
+    ).scalar()
+    activity = db.session.execute(
+        select(OperatorActivity).order_by(OperatorActivity.fecha.desc()).limit(1)
+    ).scalar()
+    credit = db.session.execute(select(CreditNote).limit(1)).scalar()
+
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "chofer_id": (ultimo.chofer_id if ultimo else None) or 1,
+        "created_by": ultimo.created_by if ultimo else "1",
+        "orden": ultimo.orden if ultimo else "0",
+        "factura": (ultimo.factura_numero if ultimo else None) or "0",
+        "dispatch_ids": ids(Dispatch),
+        "operator_id": (production.operator_id if production else None) or 1,
+        "production_ids": ids(Production),
+        "activity_operator_id": activity.operator_id if activity else 1,
+        "activity_fecha": activity.fecha if activity else ref.date(),
+        "activity_year": activity.fecha.year if activity else ref.year,
+        "activity_month": activity.fecha.month if activity else ref.month,
+        "receipt_orden": _first(select(Receipt.orden).limit(1), "0"),
+        "receipt_ids": ids(Receipt),
+        "order_number": credit.order_number if credit else "0",
+        "invoice_number": credit.invoice_number if credit else "0",
+        "credit_note_number": credit.credit_note_number if credit else "0",
+        "credit_note_ids": ids(CreditNote),
+        "consumption_ids": ids(InternalConsumption),
+    }
+
+
+# ---------- Consultas calientes ----------
+
+# (nombre, tablas que no deben recorrerse enteras, constructor(params) -> Select)
+HOT_QUERIES = [
+    # dispatch_routes.get_dispatches con filtro de fechas
+    ("dispatch.listado_rango", ["dispatch"], lambda p: (
+        select(Dispatch.id).where(Dispatch.fecha >= p["desde"], Dispatch.fecha < p["hasta"])
+        .order_by(Dispatch.fecha.asc())
+    )),
+    # pending_dispatches / ?pending=1
+    ("dispatch.pendientes", ["dispatch"], lambda p: (
+        select(Dispatch.id).where(
+            pending_filter(), Dispatch.fecha < datetime.utcnow() - timedelta(days=PENDING_ALERT_DAYS)
+        ).order_by(Dispatch.fecha)
+    )),
+    # driver_performance: despachos del chofer en el mes
+    ("dispatch.chofer_mes", ["dispatch"], lambda p: (
+        select(Dispatch.id).where(
+            Dispatch.chofer_id == p["chofer_id"],
+            Dispatch.fecha >= p["desde"], Dispatch.fecha < p["hasta"],
+        )
+    )),
+    # user_performance / estadísticas diarias del creador
+    ("dispatch.usuario_mes", ["dispatch"], lambda p: (
+        select(Dispatch.id).where(
+            Dispatch.created_by == p["created_by"],
+            Dispatch.fecha >= p["desde"], Dispatch.fecha < p["hasta"],
+        )
+    )),
+    # Chequeos de duplicado al crear / editar / importar
+    ("dispatch.duplicado_orden", ["dispatch"], lambda p: (
+        select(Dispatch.id).where(Dispatch.orden == p["orden"]).limit(1)
+    )),
+    ("dispatch.duplicado_factura", ["dispatch"], lambda p: (
+        select(Dispatch.id).where(Dispatch.factura_numero == p["factura"]).limit(1)
+    )),
+    # selectinload de productos e imágenes para una página del listado
+    ("dispatch_product.por_despachos", ["dispatch_product"], lambda p: (
+        select(DispatchProduct.id).where(DispatchProduct.dispatch_id.in_(p["dispatch_ids"]))
+    )),
+    ("dispatch_image.por_despachos", ["dispatch_image"], lambda p: (
+        select(DispatchImage.id).where(DispatchImage.dispatch_id.in_(p["dispatch_ids"]))
+    )),
+    # user_performance: correcciones de los despachos del mes
+    ("dispatch_edit_log.por_despachos", ["dispatch_edit_log"], lambda p: (
+        select(DispatchEditLog.id).where(DispatchEditLog.dispatch_id.in_(p["dispatch_ids"]))
+    )),
+    # performance: producción del operador en el mes
+    ("production.operador_mes", ["production"], lambda p: (
+        select(Production.id).where(
+            Production.operator_id == p["operator_id"],
+            Production.fecha >= p["desde"], Production.fecha < p["hasta"],
+        )
+    )),
+    ("production.listado_rango", ["production"], lambda p: (
+        select(Production.id).where(Production.fecha >= p["desde"], Production.fecha < p["hasta"])
+        .order_by(Production.fecha.desc())
+    )),
+    ("production_product.por_producciones", ["production_product"], lambda p: (
+        select(ProductionProduct.id).where(ProductionProduct.production_id.in_(p["production_ids"]))
+    )),
+    # production_routes: actividad del operador en un día
+    ("operator_activity.operador_dia", ["operator_activity"], lambda p: (
+        select(OperatorActivity.id).where(
+            OperatorActivity.operator_id == p["activity_operator_id"],
+            OperatorActivity.fecha == p["activity_fecha"],
+        )
+    )),
+    # performance.OperatorMonthData / detalle y listado mensual de actividades
+    ("operator_activity.operador_mes", ["operator_activity"], lambda p: (
+        select(OperatorActivity.id).where(
+            OperatorActivity.operator_id == p["activity_operator_id"],
+            month_filter(OperatorActivity.fecha, p["activity_year"], p["activity_month"]),
+        ).order_by(OperatorActivity.fecha.asc())
+    )),
+    ("receipt.duplicado_orden", ["receipt"], lambda p: (
+        select(Receipt.id).where(Receipt.orden == p["receipt_orden"]).limit(1)
+    )),
+    ("receipt.listado_rango", ["receipt"], lambda p: (
+        select(Receipt.id).where(Receipt.fecha >= p["desde"], Receipt.fecha < p["hasta"])
+        .order_by(Receipt.fecha.desc())
+    )),
+    ("receipt_product.por_recepciones", ["receipt_product"], lambda p: (
+        select(ReceiptProduct.id).where(ReceiptProduct.receipt_id.in_(p["receipt_ids"]))
+    )),
+    ("credit_note.duplicado_orden", ["credit_note"], lambda p: (
+        select(CreditNote.id).where(CreditNote.order_number == p["order_number"]).limit(1)
+    )),
+    ("credit_note.duplicado_factura", ["credit_note"], lambda p: (
+        select(CreditNote.id).where(CreditNote.invoice_number == p["invoice_number"]).limit(1)
+    )),
+    ("credit_note.duplicado_numero", ["credit_note"], lambda p: (
+        select(CreditNote.id).where(CreditNote.credit_note_number == p["credit_note_number"]).limit(1)
+    )),
+    ("credit_note.listado_rango", ["credit_note"], lambda p: (
+        select(CreditNote.id).where(CreditNote.fecha >= p["desde"], CreditNote.fecha < p["hasta"])
+        .order_by(CreditNote.fecha.desc())
+    )),
+    ("credit_note_product.por_notas", ["credit_note_product"], lambda p: (
+        select(CreditNoteProduct.id).where(CreditNoteProduct.credit_note_id.in_(p["credit_note_ids"]))
+    )),
+    ("internal_consumption.listado_rango", ["internal_consumption"], lambda p: (
+        select(InternalConsumption.id).where(
+            InternalConsumption.fecha >= p["desde"], InternalConsumption.fecha < p["hasta"]
+        ).order_by(InternalConsumption.fecha.desc())
+    )),
+    ("internal_consumption_product.por_consumos", ["internal_consumption_product"], lambda p: (
+        select(InternalConsumptionProduct.id).where(
+            InternalConsumptionProduct.internal_consumption_id.in_(p["consumption_ids"])
+        )
+    )),
+    # Reporte de stock bajo
+    ("product.stock_bajo", ["product"], lambda p: (
+        select(Product.id).where(low_stock_condition())
+    )),
+]
+
+
+# ---------- EXPLAIN ----------
+
+def explain(stmt):
+    """
+    Plan de `stmt` en la BD actual. Devuelve (líneas legibles, tablas
+    recorridas enteras).
+    """
+    dialect = db.engine.dialect
+    sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+    if dialect.name == "sqlite":
+        rows = db.session.execute(text("EXPLAIN QUERY PLAN " + sql)).fetchall()
+        lines = [row[-1] for row in rows]
+        scans = set()
+        for detail in lines:
+            m = _SQLITE_SCAN.match(detail.strip())
+            if m:
+                scans.add(m.group(1))
+        return lines, scans
+
+    if dialect.name == "postgresql":
+        raw = db.session.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()
+        plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+        lines, scans = [], set()
+
+        def walk(node, depth=0):
+            relation = node.get("Relation Name")
+            index = node.get("Index Name")
+            lines.append("  " * depth + node["Node Type"]
+                         + (f" on {relation}" if relation else "")
+                         + (f" using {index}" if index else ""))
+            if node["Node Type"] == "Seq Scan" and relation:
+                scans.add(relation)
+            for child in node.get("Plans", []):
+                walk(child, depth + 1)
+
+        walk(plan)
+        return lines, scans
+
+    raise RuntimeError(f"EXPLAIN no soportado para {dialect.name}")
+
+
+def check_query_plans(only=(), log=print):
+    """
+    Corre EXPLAIN sobre cada consulta caliente y devuelve la lista de las
+    que recorren entera alguna de sus tablas (vacía = todo usa índices).
+    Pensado para correr sobre un dataset sembrado (flask bench seed):
+    con tablas casi vacías PostgreSQL prefiere el Seq Scan igual.
+    """
+    params = sample_params()
+    fallas = []
+    for name, tables, build in HOT_QUERIES:
+        if only and not any(o in name for o in only):
+            continue
+        lines, scans = explain(build(params))
+        malas = sorted(scans & set(tables))
+        log(f"{'FALLA' if malas else 'ok   '} {name}")
+        for line in lines:
+            log(f"        {line}")
+        if malas:
+            fallas.append(f"{name}: recorrido completo de {', '.join(malas)}")
+    return fallas
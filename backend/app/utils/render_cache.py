@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from flask import current_app, request, send_file, make_response
+from sqlalchemy import event
+from app import db
+from app.models.dispatch_model import Dispatch, DispatchProduct
+from app.models.internal_consumption_model import InternalConsumption, InternalConsumptionProduct
+from app.models.credit_note_model import CreditNote, CreditNoteProduct
+from app.utils.print_utils import BARCODE_BACKEND
+
+# Subir cuando cambie el layout de algún documento: invalida todo lo guardado
+RENDER_REVISION = 1
+# PDFs en memoria por proceso (~10 KB cada uno)
+PRINT_CACHE_MEMORY_ITEMS = 256
+# Antigüedad máxima de los PDFs en disco (limpieza diaria)
+PRINT_CACHE_MAX_AGE_DAYS = 14
+# Segundos que un request espera un pre-render en curso del mismo documento
+PRINT_CACHE_PENDING_WAIT = 10
+
+# Modelo -> (tipo de documento, atributo con el id del documento)
+DOCUMENT_ENTITIES = {
+    Dispatch: ("despacho", "id"),
+    DispatchProduct: ("despacho", "dispatch_id"),
+    InternalConsumption: ("consumo_interno", "id"),
+    InternalConsumptionProduct: ("consumo_interno", "internal_consumption_id"),
+    CreditNote: ("nota_credito", "id"),
+    CreditNoteProduct: ("nota_credito", "credit_note_id"),
+}
+
+
+def content_version(data: dict) -> str:
+    """
+    Versión del contenido: hash del dict que recibe el generador (más la
+    revisión de layout y el backend de código de barras). Cualquier cambio
+    visible en el documento (también un cliente o chofer renombrado) da
+    otra versión, así que nunca se sirve un PDF desactualizado.
+    """
+    raw = json.dumps(data, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(f"{RENDER_REVISION}|{BARCODE_BACKEND}|{raw}".encode("utf-8")).hexdigest()[:16]
+
+
+def _clean(part) -> str:
+    return re.sub(r"[^A-Za-z0-9x-]", "", str(part or "")) or "-"
+
+
+class RenderCache:
+    """
+    PDFs ya generados, por (tipo, id, formato, tamaño, versión): LRU en
+    memoria del proceso + copia en disco compartida entre workers, en
+    <directorio>/<tipo>/<id>/<formato>_<tamaño>_<versión>.pdf. Invalidar un
+    documento borra su carpeta completa.
+    """
+
+    def __init__(self, directory=None, max_items=PRINT_CACHE_MEMORY_ITEMS):
+        self.directory = Path(directory) if directory else None
+        self.max_items = max_items
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        # Pre-renders en segundo plano: (tipo, id, formato, tamaño) -> Event
+        self._pending = {}
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _doc_dir(self, doc_type, doc_id) -> Path:
+        return self.directory / _clean(doc_type) / _clean(doc_id)
+
+    def _path(self, key) -> Path:
+        doc_type, doc_id, fmt, size, version = key
+        return self._doc_dir(doc_type, doc_id) / f"{_clean(fmt)}_{_clean(size)}_{_clean(version)}.pdf"
+
+    def get(self, key):
+        with self._lock:
+            pdf = self._mem.get(key)
+            if pdf is not None:
+                self._mem.move_to_end(key)
+                return pdf
+        if self.directory:
+            try:
+                pdf = self._path(key).read_bytes()
+            except OSError:
+                return None
+            self._remember(key, pdf)
+            return pdf
+        return None
+
+    def put(self, key, pdf: bytes):
+        self._remember(key, pdf)
+        if self.directory:
+            path = self._path(key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp.write_bytes(pdf)
+                os.replace(tmp, path)
+            except OSError as e:
+                current_app.logger.warning(f"[PRINT CACHE] No se pudo escribir {path}: {e}")
+
+    def _remember(self, key, pdf: bytes):
+        with self._lock:
+            self._mem[key] = pdf
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+
+    def begin_pending(self, slot):
+        with self._lock:
+            self._pending.setdefault(slot, threading.Event())
+
+    def end_pending(self, slot):
+        with self._lock:
+            done = self._pending.pop(slot, None)
+        if done is not None:
+            done.set()
+
+    def wait_pending(self, slot, timeout=PRINT_CACHE_PENDING_WAIT) -> bool:
+        """Espera un pre-render en curso de `slot`. False si no había ninguno."""
+        with self._lock:
+            pending = self._pending.get(slot)
+        return pending is not None and pending.wait(timeout)
+
+    def invalidate(self, doc_type, doc_id):
+        with self._lock:
+            for key in [k for k in self._mem if k[0] == doc_type and k[1] == doc_id]:
+                del self._mem[key]
+        if self.directory:
+            shutil.rmtree(self._doc_dir(doc_type, doc_id), ignore_errors=True)
+
+    def prune(self, max_age_days=PRINT_CACHE_MAX_AGE_DAYS) -> int:
+        """Borra del disco los PDFs más viejos que `max_age_days`. Devuelve cuántos."""
+        if not self.directory:
+            return 0
+        limite = time.time() - max_age_days * 86400
+        borrados = 0
+        for path in self.directory.glob("*/*/*.pdf"):
+            try:
+                if path.stat().st_mtime < limite:
+                    path.unlink()
+                    borrados += 1
+            except OSError:
+                pass
+        return borrados
+
+
+def get_render_cache(app=None) -> RenderCache:
+    """
+    Cache del proceso (una por app). PRINT_CACHE_DIR (config o env) define
+    la carpeta en disco; por defecto <instance>/print_cache, vacío = solo
+    memoria. PRINT_CACHE_MEMORY_ITEMS limita la LRU en memoria.
+    """
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get("render_cache")
+    if cache is None:
+        directory = app.config.get(
+            "PRINT_CACHE_DIR",
+            os.getenv("PRINT_CACHE_DIR", os.path.join(app.instance_path, "print_cache")),
+        )
+        cache = app.extensions.setdefault("render_cache", RenderCache(
+            directory or None,
+            max_items=int(app.config.get("PRINT_CACHE_MEMORY_ITEMS",
+                                         os.getenv("PRINT_CACHE_MEMORY_ITEMS", PRINT_CACHE_MEMORY_ITEMS))),
+        ))
+    return cache
+
+
+def cache_key(doc_type, doc_id, data: dict, fmt="a4", size="-") -> tuple:
+    return (doc_type, doc_id, fmt, size, content_version(data))
+
+
+def send_cached_pdf(doc_type, doc_id, data: dict, render, download_name: str, fmt="a4", size="-"):
+    """
+    Respuesta de impresión con cache: ETag = versión del contenido (304 si
+    el navegador ya tiene esa versión); si no, el PDF sale de la cache o se
+    genera con `render()` (-> bytes) y se guarda.
+    """
+    key = cache_key(doc_type, doc_id, data, fmt, size)
+    etag = f"{doc_type}-{doc_id}-{_clean(fmt)}-{_clean(size)}-{key[-1]}"
+
+    if request.if_none_match.contains(etag):
+        resp = make_response("", 304)
+    else:
+        cache = get_render_cache()
+        pdf = cache.get(key)
+        # Recién creado/editado: el pre-render puede estar generándolo ahora mismo
+        if pdf is None and cache.wait_pending(key[:4]):
+            pdf = cache.get(key)
+        if pdf is None:
+            pdf = render()
+            cache.put(key, pdf)
+        inline = request.args.get("inline", "0") == "1"
+        resp = send_file(
+            BytesIO(pdf),
+            as_attachment=not inline,
+            download_name=download_name,
+            mimetype="application/pdf",
+            max_age=0,
+        )
+    resp.set_etag(etag)
+    # El navegador guarda el PDF pero revalida siempre
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+# ---------- Invalidación al escribir ----------
+
+def _after_flush(session, flush_context):
+    stale = session.info.setdefault("render_cache_stale", set())
+    for obj in session.deleted:
+        entry = DOCUMENT_ENTITIES.get(type(obj))
+        if entry:
+            stale.add((entry[0], getattr(obj, entry[1])))
+    for obj in session.dirty:
+        entry = DOCUMENT_ENTITIES.get(type(obj))
+        if entry and session.is_modified(obj):
+            stale.add((entry[0], getattr(obj, entry[1])))
+    # Líneas nuevas en un documento existente (edición de productos)
+    for obj in session.new:
+        entry = DOCUMENT_ENTITIES.get(type(obj))
+        if entry and entry[1] != "id":
+            stale.add((entry[0], getattr(obj, entry[1])))
+    if not stale:
+        session.info.pop("render_cache_stale", None)
+
+
+def _after_commit(session):
+    stale = session.info.pop("render_cache_stale", None)
+    if not stale:
+        return
+    try:
+        cache = get_render_cache()
+        for doc_type, doc_id in stale:
+            if doc_id is not None:
+                cache.invalidate(doc_type, doc_id)
+    except Exception as e:
+        current_app.logger.error(f"[PRINT CACHE] No se pudo invalidar: {e}")
+
+
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop("render_cache_stale", None)
+
+
+def register_render_cache_invalidation():
+    """
+    Descarta los PDFs guardados de un despacho, consumo interno o nota de
+    crédito cuando se confirma una edición o borrado (una sola vez).
+    """
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("after_commit", _after_commit),
+        ("after_soft_rollback", _after_soft_rollback),
+    ):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event, inspect, select, insert, update, func, bindparam
+from app import db
+from app.models.product_model import Product
+from app.models.stock_alert_model import StockAlertState
+from app.models.stock_threshold_rule_model import StockThresholdRule
+
+# Espera tras el último cruce antes de enviar la alerta inmediata, para
+# juntar en un correo los cruces de una misma tanda de trabajo ...
+STOCK_ALERT_DEBOUNCE_SECONDS = 120
+# ... pero sin postergarla indefinidamente si siguen llegando cambios
+STOCK_ALERT_MAX_WAIT_SECONDS = 600
+
+
+# ---------- Detección de cruces ----------
+
+def sync_alert_states(product_ids=None, connection=None) -> int:
+    """
+    Compara stock <= reorder_point con el estado guardado de cada producto
+    (todos, o solo `product_ids`) y registra los cruces. Un producto sin
+    estado cuenta como "no bajo". Devuelve la cantidad de cruces.
+    """
+    conn = connection if connection is not None else db.session.connection()
+    p, s = Product.__table__, StockAlertState.__table__
+    q = select(p.c.id, p.c.stock, p.c.reorder_point, s.c.is_low).select_from(
+        p.outerjoin(s, s.c.product_id == p.c.id)
+    )
+    if product_ids is not None:
+        ids = [i for i in set(product_ids) if i is not None]
+        if not ids:
+            return 0
+        q = q.where(p.c.id.in_(ids))
+
+    ahora = datetime.utcnow()
+    nuevos, cambios = [], []
+    for row in conn.execute(q):
+        stock, rp = float(row.stock or 0), float(row.reorder_point or 0)
+        low = stock <= rp
+        if low == bool(row.is_low):
+            continue
+        valores = {"pid": row.id, "low": low, "st": stock, "rp": rp, "at": ahora}
+        (nuevos if row.is_low is None else cambios).append(valores)
+
+    if nuevos:
+        conn.execute(insert(s), [
+            {"product_id": v["pid"], "is_low": v["low"], "stock": v["st"],
+             "reorder_point": v["rp"], "changed_at": v["at"]}
+            for v in nuevos
+        ])
+    if cambios:
+        conn.execute(
+            update(s).where(s.c.product_id == bindparam("pid")).values(
+                is_low=bindparam("low"), stock=bindparam("st"),
+                reorder_point=bindparam("rp"), changed_at=bindparam("at"),
+            ),
+            cambios,
+        )
+    return len(nuevos) + len(cambios)
+
+
+def _after_flush(session, flush_context):
+    # Corre después del listener de stock_rules: reorder_point ya está al día
+    if any(isinstance(obj, StockThresholdRule)
+           for obj in list(session.new) + list(session.deleted) + list(session.dirty)):
+        ids = None
+    else:
+        ids = [obj.id for obj in session.new if isinstance(obj, Product)]
+        for obj in session.dirty:
+            if isinstance(obj, Product):
+                attrs = inspect(obj).attrs
+                if (attrs.stock.history.has_changes()
+                        or attrs.name.history.has_changes()
+                        or attrs.category.history.has_changes()):
+                    ids.append(obj.id)
+        if not ids:
+            return
+    if sync_alert_states(ids, connection=session.connection()):
+        session.info["stock_alerts_pending"] = True
+
+
+def _after_commit(session):
+    if session.info.pop("stock_alerts_pending", False):
+        try:
+            get_notifier().poke()
+        except Exception as e:
+            current_app.logger.error(f"[STOCK ALERTS] No se pudo programar la alerta: {e}")
+
+
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop("stock_alerts_pending", None)
+
+
+def register_stock_alert_tracking():
+    """
+    Engancha la detección de cruces a la sesión (una sola vez). Registrar
+    después de register_reorder_point_tracking.
+    """
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("after_commit", _after_commit),
+        ("after_soft_rollback", _after_soft_rollback),
+    ):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
+
+
+# ---------- Lectura para los avisos ----------
+
+_AVISOS = {
+    "notified": (StockAlertState.notified_low, "notified_low", "notified_at"),
+    "digested": (StockAlertState.digested_low, "digested_low", "digested_at"),
+}
+
+
+def claim_pending_alerts(kind: str):
+    """
+    Productos cuyo estado cambió desde el último aviso de tipo `kind`
+    ('notified' = alerta inmediata, 'digested' = resumen diario); los marca
+    como avisados y confirma. Con varios workers, SKIP LOCKED evita que dos
+    procesos avisen lo mismo.
+
+    El commit es inmediato: sync_alert_states actualiza estas mismas filas
+    en cada movimiento de stock, que no debe esperar al envío de correos.
+    Devuelve (rows, claim): rows = [(StockAlertState, Product)] ya fuera de
+    la sesión; si el envío falla, release_alerts(claim) deshace la marca.
+    """
+    col, low_attr, at_attr = _AVISOS[kind]
+    rows = (
+        db.session.query(StockAlertState, Product)
+        .join(Product, Product.id == StockAlertState.product_id)
+        .filter(StockAlertState.is_low != func.coalesce(col, False))
+        .order_by(Product.category, Product.name)
+        .with_for_update(of=StockAlertState, skip_locked=True)
+        .all()
+    )
+    ahora = datetime.utcnow()
+    previos = []
+    for state, _ in rows:
+        previos.append({"pid": state.product_id, "low": getattr(state, low_attr), "at": getattr(state, at_attr)})
+        setattr(state, low_attr, state.is_low)
+        setattr(state, at_attr, ahora)
+    db.session.flush()
+    # Fuera de la sesión el commit no los expira: el correo muestra lo reclamado
+    for state, product in rows:
+        db.session.expunge(state)
+        db.session.expunge(product)
+    db.session.commit()
+    return rows, ({"kind": kind, "at": ahora, "previous": previos} if rows else None)
+
+
+def release_alerts(claim):
+    """
+    Devuelve a pendientes los productos de un claim cuyo aviso no se envió.
+    Solo los que siguen marcados por ese claim (otro posterior no se pisa).
+    """
+    if not claim:
+        return
+    _, low_attr, at_attr = _AVISOS[claim["kind"]]
+    s = StockAlertState.__table__
+    db.session.execute(
+        update(s)
+        .where(s.c.product_id == bindparam("pid"), s.c[at_attr] == claim["at"])
+        .values({low_attr: bindparam("low"), at_attr: bindparam("at")}),
+        claim["previous"],
+    )
+    db.session.commit()
+
+
+def count_low_products() -> int:
+    return db.session.query(func.count(StockAlertState.product_id)).filter(StockAlertState.is_low == True).scalar() or 0
+
+
+# ---------- Aviso inmediato con debounce ----------
+
+class StockAlertNotifier:
+    """
+    Junta los cruces de stock y envía un solo correo cuando pasan
+    `debounce` segundos sin cruces nuevos (o `max_wait` desde el primero).
+    El contenido sale de la tabla de estados al momento de enviar, así que
+    varios cruces del mismo producto se resumen en su estado final.
+    """
+
+    def __init__(self, app, debounce=STOCK_ALERT_DEBOUNCE_SECONDS, max_wait=STOCK_ALERT_MAX_WAIT_SECONDS):
+        self.app = app
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._timer = None
+        self._first = None
+
+    def poke(self):
+        if self.debounce <= 0:
+            return  # solo resumen diario
+        with self._lock:
+            ahora = time.monotonic()
+            if self._first is None:
+                self._first = ahora
+            if self._timer is not None:
+                self._timer.cancel()
+            espera = max(0.0, min(self.debounce, self._first + self.max_wait - ahora))
+            self._timer = threading.Timer(espera, self._fire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _fire(self):
+        with self._lock:
+            self._timer = None
+            self._first = None
+        from app.models.notifications import notify_stock_crossings
+        with self.app.app_context():
+            try:
+                notify_stock_crossings(self.app)
+            finally:
+                db.session.remove()
+
+
+def get_notifier(app=None):
+    """
+    Notificador del proceso (uno por app). STOCK_ALERT_DEBOUNCE_SECONDS /
+    STOCK_ALERT_MAX_WAIT_SECONDS (config o env); debounce 0 = solo resumen diario.
+    """
+    app = app or current_app._get_current_object()
+    notifier = app.extensions.get("stock_alerts")
+    if notifier is None:
+        notifier = app.extensions.setdefault("stock_alerts", StockAlertNotifier(
+            app,
+            debounce=float(app.config.get("STOCK_ALERT_DEBOUNCE_SECONDS",
+                                          os.getenv("STOCK_ALERT_DEBOUNCE_SECONDS", STOCK_ALERT_DEBOUNCE_SECONDS))),
+            max_wait=float(app.config.get("STOCK_ALERT_MAX_WAIT_SECONDS",
+                                          os.getenv("STOCK_ALERT_MAX_WAIT_SECONDS", STOCK_ALERT_MAX_WAIT_SECONDS))),
+        ))
+    return notifier
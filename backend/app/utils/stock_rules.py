@@ -0,0 +1,190 @@
+from sqlalchemy import event, inspect, select, update, case, func, literal, true, and_
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from app.models.product_model import Product
+from app.models.stock_threshold_rule_model import StockThresholdRule, RULE_MATCH_TYPES
+
+# Reglas que antes estaban fijas en notifications.is_low_stock.
+# (category, match, pattern, threshold, priority); category None = global.
+DEFAULT_STOCK_RULES = [
+    ("Bolsas de Basura Negras", "any", None, 400, 100),
+    ("Bolsas Transparente Recuperada", "any", None, 400, 100),
+    ("Bolsas Camisetas", "any", None, 10, 100),
+    ("Bolsas PEAD de Alta Densidad", "any", None, 300, 100),
+    ("Bolsas Recuperada de Color", "any", None, 200, 100),
+    ("Bolsas con Impresión", "any", None, 500, 100),
+    ("Bolsas de Lavandería", "any", None, 500, 100),
+    ("Bolsas de Cubierto", "any", None, 30, 100),
+    ("Bolsas de Papel Kraft o Blancas", "any", None, 5, 100),
+    ("Productos de limpieza, aseo, cocina y higiene", "any", None, 20, 100),
+    ("Vasos plásticos", "any", None, 2000, 100),
+    ("Vasos de Poli-papel", "any", None, 5, 100),
+    ("Vasos Espumados", "any", None, 3, 100),
+    ("Vasos PET", "any", None, 3, 100),
+    ("Tapas", "any", None, 3, 100),
+    ("Envases Bowl de Alimento", "any", None, 4, 100),
+    ("Porta-colaciones o envases Plumavit", "any", None, 4, 100),
+    ("Film", "any", None, 8, 100),
+    ("Prepicados", "any", None, 10, 100),
+    ("Brochetas", "any", None, 60, 100),
+    ("Pocillos de Degustación", "any", None, 4, 100),
+    ("Gorros y Cofias", "any", None, 30, 100),
+    ("Productos de Protección y seguridad", "any", None, 10, 100),
+    ("Envases contenedores de aluminio", "any", None, 4, 100),
+    ("Blondas redondas, rectangulares y capsulas", "any", None, 8, 100),
+    ("Servilletas", "any", None, 5, 100),
+    ("Otros", "any", None, 10, 100),
+    # Por unidad de venta al final del nombre; sin sufijo, solo stock <= 0
+    ("Bolsas Virgen Transparente", "suffix", "und", 500, 10),
+    ("Bolsas Virgen Transparente", "suffix", "un", 500, 10),
+    ("Bolsas Virgen Transparente", "suffix", "kg", 25, 20),
+    ("Bolsas Virgen Transparente", "suffix", "k", 25, 20),
+    ("Bolsas Virgen Transparente", "any", None, 0, 100),
+    ("Bolsas de Polipropileno", "suffix", "und", 1000, 10),
+    ("Bolsas de Polipropileno", "suffix", "un", 1000, 10),
+    ("Bolsas de Polipropileno", "suffix", "kg", 15, 20),
+    ("Bolsas de Polipropileno", "suffix", "k", 15, 20),
+    ("Bolsas de Polipropileno", "any", None, 0, 100),
+    ("Guantes", "contains", "nitrilo negro", 10, 10),
+    ("Guantes", "contains", "nitrilo azul", 10, 10),
+    ("Guantes", "contains", "vinilo", 10, 10),
+    ("Guantes", "contains", "latex", 10, 10),
+    ("Guantes", "contains", "jaspe rosado", 10, 10),
+    ("Guantes", "contains", "aloe vera", 10, 10),
+    ("Guantes", "contains", "domésticos", 50, 20),
+    ("Guantes", "contains", "nitrilo verde industrial", 50, 20),
+    ("Guantes", "contains", "guante anticorte", 1, 30),
+    ("Guantes", "any", None, 10, 100),
+    ("Utensilios y platos", "exact", "cuchara plástica", 20, 10),
+    ("Utensilios y platos", "exact", "cuchara plástica/postre", 20, 10),
+    ("Utensilios y platos", "exact", "tenedor plástico", 20, 10),
+    ("Utensilios y platos", "exact", "cuchillo plástico", 20, 10),
+    ("Utensilios y platos", "any", None, 5, 100),
+    # Categoría no reconocida
+    (None, "any", None, 10, 100),
+]
+
+
+def seed_default_rules() -> int:
+    """Carga DEFAULT_STOCK_RULES si la tabla está vacía. Devuelve reglas creadas."""
+    if db.session.query(StockThresholdRule.id).first() is not None:
+        return 0
+    db.session.add_all([
+        StockThresholdRule(category=c, match=m, pattern=p, threshold=t, priority=pr)
+        for c, m, p, t, pr in DEFAULT_STOCK_RULES
+    ])
+    db.session.flush()
+    return len(DEFAULT_STOCK_RULES)
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _rule_condition(rule, name_col, category_col):
+    conds = []
+    if rule.category is not None:
+        conds.append(category_col == rule.category)
+    pattern = (rule.pattern or "").lower()
+    if rule.match == "suffix":
+        conds.append(name_col.like(f"%{_like_escape(pattern)}", escape="\\"))
+    elif rule.match == "contains":
+        conds.append(name_col.like(f"%{_like_escape(pattern)}%", escape="\\"))
+    elif rule.match == "exact":
+        conds.append(name_col == pattern)
+    if not conds:
+        return true()
+    return conds[0] if len(conds) == 1 else and_(*conds)
+
+
+def _load_rules(connection):
+    t = StockThresholdRule.__table__
+    return connection.execute(select(t).order_by(t.c.priority, t.c.id)).all()
+
+
+def reorder_point_expr(rules, table=None):
+    """
+    Compila las reglas a un CASE sobre la tabla product: primero las de
+    categoría y luego las globales, en orden de prioridad.
+    """
+    t = table if table is not None else Product.__table__
+    name_col = func.lower(t.c.name)
+    por_categoria = [r for r in rules if r.category is not None]
+    globales = [r for r in rules if r.category is None]
+    whens = [
+        (_rule_condition(r, name_col, t.c.category), literal(float(r.threshold)))
+        for r in por_categoria + globales
+        if r.match in RULE_MATCH_TYPES
+    ]
+    if not whens:
+        return literal(0.0)
+    return case(*whens, else_=literal(0.0))
+
+
+def refresh_reorder_points(product_ids=None, connection=None) -> int:
+    """
+    Recalcula Product.reorder_point con un solo UPDATE (todos los
+    productos, o solo `product_ids`). Devuelve filas afectadas.
+    """
+    conn = connection if connection is not None else db.session.connection()
+    t = Product.__table__
+    stmt = update(t).values(reorder_point=reorder_point_expr(_load_rules(conn), t))
+    if product_ids is not None:
+        ids = [i for i in set(product_ids) if i is not None]
+        if not ids:
+            return 0
+        stmt = stmt.where(t.c.id.in_(ids))
+    return conn.execute(stmt).rowcount
+
+
+def low_stock_condition():
+    """Predicado del reporte de stock bajo (coincide con ix_product_stock_margin)."""
+    return (Product.stock - Product.reorder_point) <= 0
+
+
+def get_low_stock_products():
+    return (
+        Product.query.filter(low_stock_condition())
+        .order_by(Product.category, Product.name)
+        .all()
+    )
+
+
+# ---------- Mantener reorder_point al escribir ----------
+
+def _after_flush(session, flush_context):
+    rules_changed = any(
+        isinstance(obj, StockThresholdRule)
+        for obj in list(session.new) + list(session.deleted) + list(session.dirty)
+    )
+    if rules_changed:
+        # Cambió una regla: recalcular todo el catálogo (un UPDATE)
+        conn = session.connection()
+        refresh_reorder_points(connection=conn)
+        products = [obj for obj in session.identity_map.values() if isinstance(obj, Product)]
+    else:
+        products = [obj for obj in session.new if isinstance(obj, Product)]
+        for obj in session.dirty:
+            if isinstance(obj, Product):
+                attrs = inspect(obj).attrs
+                if attrs.name.history.has_changes() or attrs.category.history.has_changes():
+                    products.append(obj)
+        if not products:
+            return
+        conn = session.connection()
+        refresh_reorder_points([p.id for p in products], connection=conn)
+
+    # Las instancias cargadas ven el valor recalculado sin otra consulta
+    if not products:
+        return
+    ids = [p.id for p in products]
+    t = Product.__table__
+    valores = dict(conn.execute(select(t.c.id, t.c.reorder_point).where(t.c.id.in_(ids))).all())
+    for p in products:
+        set_committed_value(p, "reorder_point", valores.get(p.id, 0.0))
+
+
+def register_reorder_point_tracking():
+    """Engancha el recálculo de reorder_point al flush de la sesión (una sola vez)."""
+    if not event.contains(db.session, "after_flush", _after_flush):
+        event.listen(db.session, "after_flush", _after_flush)
@@ -0,0 +1,205 @@
+import textwrap
+from reportlab.lib.units import mm
+from app.utils.print_utils import _page_size_from_label, _sanitize_barcode_text
+
+# Salida nativa para impresoras térmicas: la impresora dibuja el texto y el
+# Code128 con sus fuentes, sin PDF ni rasterizado en el navegador. Reciben
+# los mismos dicts que los generadores de print_utils.
+
+# ---------- ZPL II (etiqueta 4x6, Zebra y compatibles) ----------
+
+ZPL_DOTS_PER_MM = 8          # 203 dpi
+ZPL_FONT_H = 26              # alto de la fuente 0 (dots) en los campos
+ZPL_LINE_H = 32
+ZPL_CHAR_W = 0.55            # ancho medio de un carácter de la fuente 0 / alto
+
+
+def _zpl_text(text) -> str:
+    """Escapa ^ ~ y _ para usarse con ^FH (indicador '_' + hex)."""
+    text = str(text if text is not None else "")
+    return text.replace("_", "_5F").replace("^", "_5E").replace("~", "_7E")
+
+
+def _zpl_fit(text, max_w: int, font_h: int = ZPL_FONT_H) -> str:
+    """Recorta a lo que cabe en `max_w` dots (la impresora no corta: encima la última línea)."""
+    text = str(text if text is not None else "")
+    max_chars = max(1, int(max_w / (font_h * ZPL_CHAR_W)))
+    return text if len(text) <= max_chars else text[: max_chars - 3].rstrip() + "..."
+
+
+def _zpl_field(x: int, y: int, text, font_h: int = ZPL_FONT_H, max_w: int | None = None,
+               align: str = "L") -> str:
+    block = f"^FB{max_w},1,0,{align},0" if max_w else ""
+    value = _zpl_fit(text, max_w, font_h) if max_w else str(text if text is not None else "")
+    return f"^FO{x},{y}^A0N,{font_h},{font_h}{block}^FH_^FD{_zpl_text(value)}^FS"
+
+
+def generar_etiqueta_zpl(d: dict, size: str = "4x6") -> bytes:
+    """
+    Etiqueta de despacho en ZPL II con los mismos campos que
+    generar_etiqueta_despacho. El código de barras es ^BC (Code128) nativo.
+    """
+    page_w, page_h = _page_size_from_label(size)
+    W = round(page_w / mm * ZPL_DOTS_PER_MM)
+    H = round(page_h / mm * ZPL_DOTS_PER_MM)
+    Mx = 6 * ZPL_DOTS_PER_MM
+    My = 8 * ZPL_DOTS_PER_MM
+    line_w = W - 2 * Mx
+    bar_h = 28 * ZPL_DOTS_PER_MM
+
+    out = ["^XA", "^CI28", f"^PW{W}", f"^LL{H}", "^LH0,0"]
+    y = My
+
+    # Título y folio
+    out.append(_zpl_field(Mx, y, d.get("empresa", ""), 36, line_w))
+    out.append(_zpl_field(Mx, y + 44, f"Folio: {d.get('folio','')}", 24, line_w, "R"))
+    y += 84
+
+    # Fecha (55%) | Chofer (45%), Centro de Costo
+    w_fecha = int(line_w * 0.55)
+    out.append(_zpl_field(Mx, y, f"Fecha: {d.get('fecha','')}", max_w=w_fecha))
+    out.append(_zpl_field(Mx + w_fecha, y, f"Chofer: {d.get('chofer','')}", max_w=line_w - w_fecha))
+    y += ZPL_LINE_H
+    out.append(_zpl_field(Mx, y, f"Centro de Costo: {d.get('cliente','')}", max_w=line_w))
+    y += ZPL_LINE_H
+
+    out.append(f"^FO{Mx},{y}^GB{line_w},2,2^FS")
+    y += 16
+
+    out.append(_zpl_field(Mx, y, f"Orden: {d.get('orden','')}", max_w=line_w))
+    y += ZPL_LINE_H
+    if d.get("paquete_numero"):
+        out.append(_zpl_field(Mx, y, f"Paquete N°: {d.get('paquete_numero')}", max_w=line_w))
+        y += ZPL_LINE_H
+    if d.get("factura_numero"):
+        out.append(_zpl_field(Mx, y, f"Factura N°: {d.get('factura_numero')}", max_w=line_w))
+        y += ZPL_LINE_H
+    out.append(_zpl_field(Mx, y, f"Despachado por: {d.get('auxiliar','')}", max_w=line_w))
+    y += ZPL_LINE_H
+
+    # Productos: una línea por ítem, hasta donde empieza el código
+    productos = d.get("productos", []) or []
+    if productos:
+        out.append(_zpl_field(Mx, y, "Productos:", 28))
+        y += ZPL_LINE_H
+        min_y = H - My - bar_h - 24 - ZPL_LINE_H
+        for idx, item in enumerate(productos, start=1):
+            if y + ZPL_LINE_H > min_y and idx < len(productos):
+                out.append(_zpl_field(Mx, y, f"... y {len(productos) - idx + 1} más", max_w=line_w))
+                y += ZPL_LINE_H
+                break
+            out.append(_zpl_field(Mx, y, f"{idx}. {item}", 24, line_w))
+            y += ZPL_LINE_H
+
+    # Separador y Code128 centrado (ancho de barra según el largo del payload)
+    y = max(y + 4, H - My - bar_h - 24)
+    out.append(f"^FO{Mx},{y}^GB{line_w},2,2^FS")
+    y += 16
+    barcode = _sanitize_barcode_text(d.get("codigo_barras", ""))
+    if barcode:
+        modules = 11 * (len(barcode) + 3) + 2
+        module_w = max(1, min(4, line_w // modules))
+        x = Mx + max(0, (line_w - modules * module_w) // 2)
+        out.append(f"^FO{x},{y}^BY{module_w}^BCN,{bar_h},N,N,N^FD{barcode}^FS")
+
+    out.append("^XZ")
+    return "\n".join(out).encode("utf-8")
+
+
+# ---------- ESC/POS (ticket 80 mm) ----------
+
+ESC = b"\x1b"
+GS = b"\x1d"
+ESCPOS_COLUMNS = 48          # fuente A en 80 mm (576 dots / 12)
+ESCPOS_CODEPAGE = (19, "cp858")  # ESC t 19 = CP858 (latín + €)
+# Tipografía que CP858 no tiene (p. ej. el "—" de las líneas de producto)
+ESCPOS_REPLACE = str.maketrans({"—": "-", "–": "-", "“": '"', "”": '"', "‘": "'", "’": "'", "…": "..."})
+
+
+def _escpos_lines(text, width: int = ESCPOS_COLUMNS, indent: int = 0) -> list[str]:
+    """Envuelve por columnas; las líneas siguientes van con sangría `indent`."""
+    return textwrap.wrap(
+        str(text if text is not None else ""), width=width,
+        subsequent_indent=" " * indent, break_long_words=True,
+    ) or [""]
+
+
+def generar_ticket_escpos(d: dict) -> bytes:
+    """
+    Ticket POS80 en ESC/POS con los mismos bloques que generar_ticket_pos80
+    (despacho, nota de crédito o consumo interno según las claves de `d`).
+    El Code128 lo imprime la impresora (GS k) y el papel se corta al final.
+    """
+    code, encoding = ESCPOS_CODEPAGE
+    lines = []
+
+    def text(s=""):
+        lines.append(str(s).translate(ESCPOS_REPLACE).encode(encoding, errors="replace") + b"\n")
+
+    def raw(b: bytes):
+        lines.append(b)
+
+    def wrapped(s):
+        for ln in _escpos_lines(s):
+            text(ln)
+
+    rule = "-" * ESCPOS_COLUMNS
+
+    raw(ESC + b"@" + ESC + b"t" + bytes([code]))
+
+    # Header centrado: empresa en doble alto/ancho y folio
+    raw(ESC + b"a\x01" + ESC + b"!\x30")
+    for ln in _escpos_lines(d.get("empresa", ""), ESCPOS_COLUMNS // 2):
+        text(ln)
+    raw(ESC + b"!\x00")
+    text(f"Folio: {d.get('folio','')}")
+    raw(ESC + b"a\x00")
+    text(rule)
+
+    wrapped(f"Fecha: {d.get('fecha','')}")
+    wrapped(f"Despachado por: {d.get('auxiliar','')}")
+
+    if "chofer" in d:  # Despacho
+        wrapped(f"Chofer: {d.get('chofer','')}")
+        wrapped(f"Centro de Costo: {d.get('cliente','')}")
+        text(rule)
+        wrapped(f"Orden: {d.get('orden','')}")
+        if d.get("paquete_numero"):
+            wrapped(f"Paquete N°: {d.get('paquete_numero')}")
+        if d.get("factura_numero"):
+            wrapped(f"Factura N°: {d.get('factura_numero')}")
+    elif "credit_note_number" in d:  # Nota de Crédito
+        wrapped(f"Centro de Costo: {d.get('cliente','')}")
+        wrapped(f"Orden: {d.get('orden','')}")
+        wrapped(f"Factura N°: {d.get('factura_numero','')}")
+        wrapped(f"Nota de Crédito N°: {d.get('credit_note_number','')}")
+        wrapped(f"Motivo: {d.get('motivo','')}")
+        text(rule)
+    else:  # Consumo interno
+        wrapped(f"Nombre quien retira: {d.get('nombre_retira','')}")
+        wrapped(f"Área: {d.get('area','')}")
+        wrapped(f"Motivo: {d.get('motivo','')}")
+        text(rule)
+
+    productos = d.get("productos", []) or []
+    if productos:
+        raw(ESC + b"E\x01")
+        text("Productos:")
+        raw(ESC + b"E\x00")
+        for idx, item in enumerate(productos, start=1):
+            prefix = f"{idx}. "
+            for ln in _escpos_lines(prefix + str(item), indent=len(prefix)):
+                text(ln)
+
+    barcode = _sanitize_barcode_text(d.get("codigo_barras", "")) if "codigo_barras" in d else ""
+    if barcode:
+        text(rule)
+        data = b"{B" + barcode.encode("ascii")
+        raw(ESC + b"a\x01")
+        raw(GS + b"h" + bytes([160]) + GS + b"w\x02" + GS + b"H\x00")
+        raw(GS + b"k" + bytes([73, len(data)]) + data + b"\n")
+        raw(ESC + b"a\x00")
+
+    # Avance y corte parcial
+    raw(GS + b"V" + bytes([66, 0]))
+    return b"".join(lines)
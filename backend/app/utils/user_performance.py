@@ -1,10 +1,10 @@
-from datetime import date, datetime, timedelta
-from calendar import monthrange
+from datetime import date
 from collections import defaultdict
 from app.models.dispatch_model import Dispatch
 from app.models.dispatch_edit_model import DispatchEditLog
 from app.models.user_model import User
-from app.utils.timezone import to_utc_naive, to_local, CL_TZ
+from app.utils.timezone import to_local
+from app.utils.month_range import month_utc_bounds
 
 MOTIVO_LABELS = {
     "orden": "Orden de compra incorrecta",
@@ -13,13 +13,6 @@ MOTIVO_LABELS = {
 }
 
 
-def _month_utc_bounds(year: int, month: int):
-    first_local = datetime(year, month, 1, 0, 0, 0, tzinfo=CL_TZ)
-    last_day = monthrange(year, month)[1]
-    next_month_local = datetime(year, month, last_day, 0, 0, 0, tzinfo=CL_TZ) + timedelta(days=1)
-    return to_utc_naive(first_local), to_utc_naive(next_month_local)
-
-
 UMBRALES = [
     (1.15, "muy_alta"),
     (1.00, "alta"),
@@ -48,7 +41,7 @@ def evaluar_usuarios_logistica(year: int, month: int):
       - Precisión: proporción de sus despachos que tuvo que ser corregida
         después. Más errores = menor puntaje, aunque el volumen sea alto.
     """
-    start_utc, end_utc = _month_utc_bounds(year, month)
+    start_utc, end_utc = month_utc_bounds(year, month)
     dispatches = (
         Dispatch.query
         .filter(Dispatch.fecha >= start_utc, Dispatch.fecha < end_utc)
@@ -141,7 +134,7 @@ def daily_detail_for_user(user_id: str, year: int, month: int):
     mostrar los picos de despachos por fecha, distinguiendo correctos de
     editados.
     """
-    start_utc, end_utc = _month_utc_bounds(year, month)
+    start_utc, end_utc = month_utc_bounds(year, month)
     dispatches = (
         Dispatch.query
         .filter(Dispatch.created_by == str(user_id))
@@ -0,0 +1,70 @@
+"""product_id en las líneas de despachos, recepciones, producciones, notas de crédito y consumos
+
+Revision ID: a3d8e6f1c072
+Revises: f7a3c1e9b250
+Create Date: 2026-10-19 15:02:41.118204
+
+"""
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d8e6f1c072'
+down_revision = 'f7a3c1e9b250'
+branch_labels = None
+depends_on = None
+
+
+LINE_TABLES = (
+    'dispatch_product',
+    'receipt_product',
+    'production_product',
+    'credit_note_product',
+    'internal_consumption_product',
+)
+
+
+def _product_key(name):
+    # Copia de normalize_product_name (la migración no importa la app)
+    nfkd = unicodedata.normalize("NFKD", name or "")
+    no_accents = "".join(c for c in nfkd if not unicodedata.combining(c))
+    return "".join(no_accents.split()).lower()
+
+
+def upgrade():
+    for table in LINE_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('product_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(f'fk_{table}_product_id', 'product', ['product_id'], ['id'], ondelete='SET NULL')
+            batch_op.create_index(f'ix_{table}_product_id', ['product_id'])
+
+    # Enlazar las líneas existentes por nombre (mismo criterio que las rutas)
+    conn = op.get_bind()
+    product = sa.table('product', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    by_key = {}
+    for r in conn.execute(sa.select(product.c.id, product.c.name).order_by(product.c.id)):
+        by_key.setdefault(_product_key(r.name), r.id)
+
+    for table in LINE_TABLES:
+        line = sa.table(table, sa.column('nombre', sa.String), sa.column('product_id', sa.Integer))
+        nombres = conn.execute(sa.select(line.c.nombre).distinct()).scalars().all()
+        params = [
+            {"n": n, "pid": by_key[_product_key(n)]}
+            for n in nombres
+            if n is not None and _product_key(n) in by_key
+        ]
+        if params:
+            conn.execute(
+                line.update().where(line.c.nombre == sa.bindparam('n')).values(product_id=sa.bindparam('pid')),
+                params,
+            )
+
+
+def downgrade():
+    for table in LINE_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_product_id')
+            batch_op.drop_constraint(f'fk_{table}_product_id', type_='foreignkey')
+            batch_op.drop_column('product_id')
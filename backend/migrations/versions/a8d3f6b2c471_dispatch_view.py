@@ -0,0 +1,32 @@
+"""dispatch_view: snapshot JSON de lectura de cada despacho
+
+Revision ID: a8d3f6b2c471
+Revises: e4a1c7b3d582
+Create Date: 2026-10-19 21:12:48.204519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3f6b2c471'
+down_revision = 'e4a1c7b3d582'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Se llena al escribir cada despacho; los existentes se arman en la
+    # primera lectura o con `flask dispatch rebuild-views`.
+    op.create_table('dispatch_view',
+        sa.Column('dispatch_id', sa.Integer(), nullable=False),
+        sa.Column('snapshot', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['dispatch_id'], ['dispatch.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('dispatch_id')
+    )
+
+
+def downgrade():
+    op.drop_table('dispatch_view')
@@ -0,0 +1,39 @@
+"""idempotency_key: respuestas guardadas de POST con Idempotency-Key
+
+Revision ID: b5e9c2d7a614
+Revises: a8d3f6b2c471
+Create Date: 2026-10-19 22:03:27.518340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e9c2d7a614'
+down_revision = 'a8d3f6b2c471'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('idempotency_key',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.String(length=50), nullable=False),
+        sa.Column('endpoint', sa.String(length=200), nullable=False),
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('request_hash', sa.String(length=64), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('response_body', sa.Text(), nullable=True),
+        sa.Column('mimetype', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'endpoint', 'key', name='uq_idempotency_key_user_endpoint_key')
+    )
+    op.create_index('ix_idempotency_key_expires_at', 'idempotency_key', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_key_expires_at', table_name='idempotency_key')
+    op.drop_table('idempotency_key')
@@ -0,0 +1,145 @@
+"""stock_threshold_rule + product.reorder_point precalculado
+
+Revision ID: b6f2d9c4e813
+Revises: a3d8e6f1c072
+Create Date: 2026-10-19 16:20:07.481932
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6f2d9c4e813'
+down_revision = 'a3d8e6f1c072'
+branch_labels = None
+depends_on = None
+
+
+# Copia de DEFAULT_STOCK_RULES (la migración no importa la app):
+# los umbrales que estaban fijos en notifications.is_low_stock.
+_SIMPLE = [
+    ("Bolsas de Basura Negras", 400),
+    ("Bolsas Transparente Recuperada", 400),
+    ("Bolsas Camisetas", 10),
+    ("Bolsas PEAD de Alta Densidad", 300),
+    ("Bolsas Recuperada de Color", 200),
+    ("Bolsas con Impresión", 500),
+    ("Bolsas de Lavandería", 500),
+    ("Bolsas de Cubierto", 30),
+    ("Bolsas de Papel Kraft o Blancas", 5),
+    ("Productos de limpieza, aseo, cocina y higiene", 20),
+    ("Vasos plásticos", 2000),
+    ("Vasos de Poli-papel", 5),
+    ("Vasos Espumados", 3),
+    ("Vasos PET", 3),
+    ("Tapas", 3),
+    ("Envases Bowl de Alimento", 4),
+    ("Porta-colaciones o envases Plumavit", 4),
+    ("Film", 8),
+    ("Prepicados", 10),
+    ("Brochetas", 60),
+    ("Pocillos de Degustación", 4),
+    ("Gorros y Cofias", 30),
+    ("Productos de Protección y seguridad", 10),
+    ("Envases contenedores de aluminio", 4),
+    ("Blondas redondas, rectangulares y capsulas", 8),
+    ("Servilletas", 5),
+    ("Otros", 10),
+]
+
+RULES = [(c, "any", None, t, 100) for c, t in _SIMPLE] + [
+    ("Bolsas Virgen Transparente", "suffix", "und", 500, 10),
+    ("Bolsas Virgen Transparente", "suffix", "un", 500, 10),
+    ("Bolsas Virgen Transparente", "suffix", "kg", 25, 20),
+    ("Bolsas Virgen Transparente", "suffix", "k", 25, 20),
+    ("Bolsas Virgen Transparente", "any", None, 0, 100),
+    ("Bolsas de Polipropileno", "suffix", "und", 1000, 10),
+    ("Bolsas de Polipropileno", "suffix", "un", 1000, 10),
+    ("Bolsas de Polipropileno", "suffix", "kg", 15, 20),
+    ("Bolsas de Polipropileno", "suffix", "k", 15, 20),
+    ("Bolsas de Polipropileno", "any", None, 0, 100),
+    ("Guantes", "contains", "nitrilo negro", 10, 10),
+    ("Guantes", "contains", "nitrilo azul", 10, 10),
+    ("Guantes", "contains", "vinilo", 10, 10),
+    ("Guantes", "contains", "latex", 10, 10),
+    ("Guantes", "contains", "jaspe rosado", 10, 10),
+    ("Guantes", "contains", "aloe vera", 10, 10),
+    ("Guantes", "contains", "domésticos", 50, 20),
+    ("Guantes", "contains", "nitrilo verde industrial", 50, 20),
+    ("Guantes", "contains", "guante anticorte", 1, 30),
+    ("Guantes", "any", None, 10, 100),
+    ("Utensilios y platos", "exact", "cuchara plástica", 20, 10),
+    ("Utensilios y platos", "exact", "cuchara plástica/postre", 20, 10),
+    ("Utensilios y platos", "exact", "tenedor plástico", 20, 10),
+    ("Utensilios y platos", "exact", "cuchillo plástico", 20, 10),
+    ("Utensilios y platos", "any", None, 5, 100),
+    (None, "any", None, 10, 100),
+]
+
+
+def _matches(rule, name_lower, category):
+    cat, match, pattern, _, _ = rule
+    if cat is not None and cat != category:
+        return False
+    if match == "suffix":
+        return name_lower.endswith(pattern)
+    if match == "contains":
+        return pattern in name_lower
+    if match == "exact":
+        return name_lower == pattern
+    return True
+
+
+def _reorder_point(name, category):
+    name_lower = (name or "").lower()
+    ordenadas = sorted(enumerate(RULES), key=lambda ir: (ir[1][0] is None, ir[1][4], ir[0]))
+    for _, rule in ordenadas:
+        if _matches(rule, name_lower, category):
+            return float(rule[3])
+    return 0.0
+
+
+def upgrade():
+    rule_table = op.create_table('stock_threshold_rule',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(length=100), nullable=True),
+        sa.Column('match', sa.String(length=10), nullable=False),
+        sa.Column('pattern', sa.String(length=100), nullable=True),
+        sa.Column('threshold', sa.Float(), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stock_threshold_rule_category', 'stock_threshold_rule', ['category'])
+    op.bulk_insert(rule_table, [
+        {"category": c, "match": m, "pattern": p, "threshold": t, "priority": pr}
+        for c, m, p, t, pr in RULES
+    ])
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reorder_point', sa.Float(), nullable=False, server_default='0'))
+
+    conn = op.get_bind()
+    product = sa.table('product',
+        sa.column('id', sa.Integer), sa.column('name', sa.String),
+        sa.column('category', sa.String), sa.column('reorder_point', sa.Float),
+    )
+    rows = conn.execute(sa.select(product.c.id, product.c.name, product.c.category)).fetchall()
+    params = [{"pid": r.id, "rp": _reorder_point(r.name, r.category)} for r in rows]
+    params = [p for p in params if p["rp"]]
+    if params:
+        conn.execute(
+            product.update().where(product.c.id == sa.bindparam('pid')).values(reorder_point=sa.bindparam('rp')),
+            params,
+        )
+
+    # Reporte de stock bajo: WHERE stock - reorder_point <= 0
+    op.create_index('ix_product_stock_margin', 'product', [sa.text('(stock - reorder_point)')])
+
+
+def downgrade():
+    op.drop_index('ix_product_stock_margin', table_name='product')
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('reorder_point')
+    op.drop_index('ix_stock_threshold_rule_category', table_name='stock_threshold_rule')
+    op.drop_table('stock_threshold_rule')
@@ -0,0 +1,55 @@
+"""stock_alert_state: cruces de umbral de stock bajo
+
+Revision ID: c3e7a5d0f924
+Revises: b6f2d9c4e813
+Create Date: 2026-10-19 17:05:33.902114
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e7a5d0f924'
+down_revision = 'b6f2d9c4e813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    state = op.create_table('stock_alert_state',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('is_low', sa.Boolean(), nullable=False),
+        sa.Column('stock', sa.Float(), nullable=False),
+        sa.Column('reorder_point', sa.Float(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.Column('notified_low', sa.Boolean(), nullable=True),
+        sa.Column('notified_at', sa.DateTime(), nullable=True),
+        sa.Column('digested_low', sa.Boolean(), nullable=True),
+        sa.Column('digested_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['product.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+
+    # Estado inicial: los productos hoy bajo el umbral. No disparan la alerta
+    # inmediata (notified_low = true) pero sí salen en el primer resumen.
+    conn = op.get_bind()
+    product = sa.table('product',
+        sa.column('id', sa.Integer), sa.column('stock', sa.Float), sa.column('reorder_point', sa.Float),
+    )
+    rows = conn.execute(
+        sa.select(product.c.id, product.c.stock, product.c.reorder_point)
+        .where(product.c.stock - product.c.reorder_point <= 0)
+    ).fetchall()
+    if rows:
+        ahora = datetime.utcnow()
+        op.bulk_insert(state, [
+            {"product_id": r.id, "is_low": True, "stock": r.stock, "reorder_point": r.reorder_point,
+             "changed_at": ahora, "notified_low": True, "notified_at": ahora}
+            for r in rows
+        ])
+
+
+def downgrade():
+    op.drop_table('stock_alert_state')
@@ -0,0 +1,33 @@
+"""dispatch_change log para sync incremental
+
+Revision ID: c41f2a7d9e10
+Revises: b1316a52a862
+Create Date: 2026-10-19 10:12:44.201733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f2a7d9e10'
+down_revision = 'b1316a52a862'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "dispatch_change",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("dispatch_id", sa.Integer(), nullable=False),
+        sa.Column("chofer_id", sa.Integer(), nullable=True),
+        sa.Column("op", sa.String(length=10), nullable=False),
+        sa.Column("changed_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_dispatch_change_chofer_id", "dispatch_change", ["chofer_id"])
+
+
+def downgrade():
+    op.drop_index("ix_dispatch_change_chofer_id", table_name="dispatch_change")
+    op.drop_table("dispatch_change")
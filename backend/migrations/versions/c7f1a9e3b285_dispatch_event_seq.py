@@ -0,0 +1,27 @@
+"""dispatch_event_seq: seq global de los eventos de despachos (PostgreSQL)
+
+Revision ID: c7f1a9e3b285
+Revises: b5e9c2d7a614
+Create Date: 2026-10-20 10:14:52.637018
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7f1a9e3b285'
+down_revision = 'b5e9c2d7a614'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Solo el backend LISTEN/NOTIFY la usa; en SQLite los eventos se numeran en memoria
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE SEQUENCE IF NOT EXISTS dispatch_event_seq")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP SEQUENCE IF EXISTS dispatch_event_seq")
@@ -0,0 +1,32 @@
+"""catalog_version para ETag de catálogos
+
+Revision ID: d2b7e4a1f3c8
+Revises: c41f2a7d9e10
+Create Date: 2026-10-19 12:31:07.554120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b7e4a1f3c8'
+down_revision = 'c41f2a7d9e10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "catalog_version",
+        sa.Column("entity", sa.String(length=30), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        "INSERT INTO catalog_version (entity, version) VALUES "
+        "('products', 1), ('clients', 1), ('drivers', 1), ('operators', 1), ('suppliers', 1);"
+    )
+
+
+def downgrade():
+    op.drop_table("catalog_version")
@@ -0,0 +1,28 @@
+"""idempotency_key: claim_token y committed_at
+
+Revision ID: d4b8e2f6a193
+Revises: c7f1a9e3b285
+Create Date: 2026-10-20 16:41:09.203857
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8e2f6a193'
+down_revision = 'c7f1a9e3b285'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('idempotency_key', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claim_token', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('committed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('idempotency_key', schema=None) as batch_op:
+        batch_op.drop_column('committed_at')
+        batch_op.drop_column('claim_token')
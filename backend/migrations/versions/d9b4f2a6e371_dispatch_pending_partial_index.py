@@ -0,0 +1,29 @@
+"""índice parcial dispatch(fecha) WHERE delivered_client = false
+
+Revision ID: d9b4f2a6e371
+Revises: c3e7a5d0f924
+Create Date: 2026-10-19 17:48:12.550371
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9b4f2a6e371'
+down_revision = 'c3e7a5d0f924'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Solo las filas pendientes: el índice se mantiene chico aunque la tabla crezca
+    op.create_index(
+        'ix_dispatch_pending_fecha', 'dispatch', ['fecha'],
+        postgresql_where=sa.text('delivered_client = false'),
+        sqlite_where=sa.text('delivered_client = 0'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_dispatch_pending_fecha', table_name='dispatch')
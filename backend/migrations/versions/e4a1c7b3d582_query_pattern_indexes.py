@@ -0,0 +1,63 @@
+"""índices según los patrones de consulta de rutas y utils/*performance.py
+
+Revision ID: e4a1c7b3d582
+Revises: d9b4f2a6e371
+Create Date: 2026-10-19 18:42:16.530871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a1c7b3d582'
+down_revision = 'd9b4f2a6e371'
+branch_labels = None
+depends_on = None
+
+
+# (nombre, tabla, columnas) — mismos nombres que declaran los modelos
+INDEXES = [
+    # Listado por rango de fechas, rendimiento de usuarios (mes completo)
+    ('ix_dispatch_fecha', 'dispatch', ['fecha']),
+    # Rendimiento de choferes y sincronización por chofer
+    ('ix_dispatch_chofer_fecha', 'dispatch', ['chofer_id', 'fecha']),
+    # Rendimiento / estadísticas diarias del usuario creador
+    ('ix_dispatch_created_by_fecha', 'dispatch', ['created_by', 'fecha']),
+    # Chequeos de duplicado al crear / editar / importar
+    ('ix_dispatch_orden', 'dispatch', ['orden']),
+    ('ix_dispatch_factura_numero', 'dispatch', ['factura_numero']),
+    # Líneas, imágenes y correcciones de un despacho
+    ('ix_dispatch_product_dispatch_id', 'dispatch_product', ['dispatch_id']),
+    ('ix_dispatch_image_dispatch_id', 'dispatch_image', ['dispatch_id']),
+    ('ix_dispatch_edit_log_dispatch_id', 'dispatch_edit_log', ['dispatch_id']),
+
+    ('ix_production_operator_fecha', 'production', ['operator_id', 'fecha']),
+    ('ix_production_fecha', 'production', ['fecha']),
+    ('ix_production_product_production_id', 'production_product', ['production_id']),
+    ('ix_operator_activity_operator_fecha', 'operator_activity', ['operator_id', 'fecha']),
+
+    ('ix_receipt_orden', 'receipt', ['orden']),
+    ('ix_receipt_fecha', 'receipt', ['fecha']),
+    ('ix_receipt_product_receipt_id', 'receipt_product', ['receipt_id']),
+
+    ('ix_credit_note_order_number', 'credit_note', ['order_number']),
+    ('ix_credit_note_invoice_number', 'credit_note', ['invoice_number']),
+    ('ix_credit_note_credit_note_number', 'credit_note', ['credit_note_number']),
+    ('ix_credit_note_fecha', 'credit_note', ['fecha']),
+    ('ix_credit_note_product_credit_note_id', 'credit_note_product', ['credit_note_id']),
+
+    ('ix_internal_consumption_fecha', 'internal_consumption', ['fecha']),
+    ('ix_internal_consumption_product_internal_consumption_id',
+     'internal_consumption_product', ['internal_consumption_id']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,32 @@
+"""product.usage precalculado
+
+Revision ID: e5c9a0b2d417
+Revises: d2b7e4a1f3c8
+Create Date: 2026-10-19 13:05:52.918364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c9a0b2d417'
+down_revision = 'd2b7e4a1f3c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('usage', sa.Float(), nullable=False, server_default='0'))
+
+    op.execute(
+        "UPDATE product SET usage = COALESCE(("
+        "SELECT SUM(dp.cantidad) FROM dispatch_product dp "
+        "WHERE lower(dp.nombre) = lower(product.name)), 0);"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('usage')
@@ -0,0 +1,71 @@
+"""product.search_name + índices de búsqueda (prefijo y trigramas)
+
+Revision ID: f7a3c1e9b250
+Revises: e5c9a0b2d417
+Create Date: 2026-10-19 13:48:20.337015
+
+"""
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a3c1e9b250'
+down_revision = 'e5c9a0b2d417'
+branch_labels = None
+depends_on = None
+
+
+def _search_key(name):
+    # Copia de product_search_key (la migración no importa la app)
+    nfkd = unicodedata.normalize("NFKD", name or "")
+    no_accents = "".join(c for c in nfkd if not unicodedata.combining(c))
+    return " ".join(no_accents.split()).lower()
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('search_name', sa.String(length=120), nullable=True))
+
+    conn = op.get_bind()
+    product = sa.table('product', sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('search_name', sa.String))
+    rows = conn.execute(sa.select(product.c.id, product.c.name)).fetchall()
+    if rows:
+        conn.execute(
+            product.update().where(product.c.id == sa.bindparam('pid')).values(search_name=sa.bindparam('key')),
+            [{"pid": r.id, "key": _search_key(r.name)} for r in rows],
+        )
+
+    if conn.dialect.name == "postgresql":
+        # Prefijo: LIKE 'abc%' usa el btree con text_pattern_ops
+        op.execute("CREATE INDEX IF NOT EXISTS ix_product_search_name ON product (search_name text_pattern_ops);")
+        # Subcadena / similitud: GIN con pg_trgm, si la extensión se puede instalar
+        op.execute("""
+            DO $$
+            BEGIN
+                CREATE EXTENSION IF NOT EXISTS pg_trgm;
+            EXCEPTION WHEN insufficient_privilege THEN
+                RAISE NOTICE 'pg_trgm no disponible: búsqueda por subcadena sin índice';
+            END $$;
+        """)
+        op.execute("""
+            DO $$
+            BEGIN
+                IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+                    CREATE INDEX IF NOT EXISTS ix_product_search_name_trgm
+                        ON product USING gin (search_name gin_trgm_ops);
+                END IF;
+            END $$;
+        """)
+    else:
+        op.create_index('ix_product_search_name', 'product', ['search_name'])
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_product_search_name_trgm;")
+    op.drop_index('ix_product_search_name', table_name='product')
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('search_name')
@@ -1,9 +1,10 @@
 # start.py
 from app import create_app
 
-app = create_app()
-
+# Solo al ejecutar el script: los workers de impresión (spawn) re-importan
+# este archivo y no deben crear otra app ni otro scheduler
 if __name__ == "__main__":
+    app = create_app()
     app.run(
         host="0.0.0.0",
         port=5000,